@@ -0,0 +1,96 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+'''Benchmarks fluent and CPF lookups on synthetic domains of growing size.
+
+Usage:
+    python benchmarks/domain_index.py [size ...]
+'''
+
+from pyrddl.parser import RDDLParser
+
+import sys
+import time
+
+
+def synthetic_rddl(size: int) -> str:
+    '''Returns an RDDL with `size` state fluents and a chain of `size` intermediate fluents.'''
+    pvariables, cpfs = [], []
+    for i in range(size):
+        pvariables.append('s{0} : {{ state-fluent, real, default = 0.0 }};'.format(i))
+        pvariables.append('i{0} : {{ interm-fluent, real, level = {1} }};'.format(i, i + 1))
+        previous = 'i{}'.format(i - 1) if i > 0 else '0.0'
+        cpfs.append('i{0} = {1} + s{0};'.format(i, previous))
+        cpfs.append("s{0}' = i{1};".format(i, size - 1 - i))
+    pvariables.append('a : { action-fluent, real, default = 0.0 };')
+    return '''
+domain synthetic {{
+    requirements = {{ reward-deterministic }};
+    pvariables {{
+        {}
+    }};
+    cpfs {{
+        {}
+    }};
+    reward = s0 + a;
+}}
+
+non-fluents synthetic_nf {{
+    domain = synthetic;
+}}
+
+instance synthetic_inst {{
+    domain = synthetic;
+    non-fluents = synthetic_nf;
+    max-nondef-actions = 1;
+    horizon = 10;
+    discount = 1.0;
+}}
+'''.format('\n        '.join(pvariables), '\n        '.join(cpfs))
+
+
+def timeit(func) -> float:
+    '''Returns the wall-clock time of `func()` in seconds.'''
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    parser = RDDLParser()
+    parser.build()
+    print('{:>8} {:>12} {:>12} {:>14}'.format('size', 'build (s)', 'access (s)', 'depends (s)'))
+    for size in sizes:
+        rddl = parser.parse(synthetic_rddl(size))
+        domain = rddl.domain
+
+        build = timeit(rddl.build)
+
+        def access():
+            for _ in range(100):
+                domain.state_fluents
+                domain.interm_fluent_ordering
+                domain.intermediate_cpfs
+                domain.state_cpfs
+
+        def depends():
+            for cpf in domain.intermediate_cpfs + domain.state_cpfs:
+                rddl.get_dependencies(cpf.expr)
+
+        print('{:>8} {:>12.4f} {:>12.4f} {:>14.4f}'.format(size, build, timeit(access), timeit(depends)))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 200, 400])
@@ -0,0 +1,90 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+'''Benchmarks incremental CPF re-evaluation under single-entry perturbations.
+
+Each run builds a Reservoir instance with a chain of `size` reservoirs,
+evaluates a batch once, and then times the re-evaluation after changing
+a single outflow entry, either in one batch row or in every batch row,
+against a full re-evaluation. The rainfall CPF is random and resampled
+on every call, so the next water levels and the reward are recomputed
+over the whole batch; only the deterministic CPFs are recomputed
+incrementally.
+
+Usage:
+    python benchmarks/incremental.py [size ...]
+'''
+
+from pyrddl.incremental import IncrementalEvaluator
+from pyrddl.parser import RDDLParser
+
+import numpy as np
+import sys
+import tempfile
+import time
+
+BATCH_SIZE = 256
+REPEATS = 10
+
+
+def reservoir_chain(size: int) -> str:
+    '''Returns the Reservoir RDDL with a chain of `size` reservoirs.'''
+    with open('rddl/Reservoir.rddl', mode='r') as file:
+        text = file.read()
+    objects = ','.join('t{}'.format(i) for i in range(1, size + 1))
+    text = text.replace('res: {t1,t2,t3,t4,t5,t6,t7,t8};', 'res: {{{}}};'.format(objects))
+    chain = ''.join('\t\tDOWNSTREAM(t{},t{});\n'.format(i, i + 1) for i in range(9, size))
+    return text.replace('\t\tDOWNSTREAM(t7,t8);\n', '\t\tDOWNSTREAM(t7,t8);\n' + chain)
+
+
+def timeit(func) -> float:
+    '''Returns the mean wall-clock time of `func()` over REPEATS calls in seconds.'''
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - start) / REPEATS
+
+
+def main(sizes):
+    parser = RDDLParser()
+    parser.build()
+    cache_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    print('{:>8} {:>12} {:>14} {:>14}'.format('size', 'full (s)', 'one row (s)', 'all rows (s)'))
+    for size in sizes:
+        rddl = parser.parse(reservoir_chain(size))
+        rddl.build()
+        evaluator = IncrementalEvaluator(rddl, cache_dir=cache_dir)
+        state = { 'rlevel/1': np.full((BATCH_SIZE, size), 50.0) }
+        action = { 'outflow/1': np.zeros((BATCH_SIZE, size)) }
+        evaluator(state, action, rng)
+
+        def full():
+            evaluator.reset()
+            evaluator(state, action, rng)
+
+        def one_row():
+            action['outflow/1'][0, size // 2] += 1.0
+            evaluator(state, action, rng)
+
+        def all_rows():
+            action['outflow/1'][:, size // 2] += 1.0
+            evaluator(state, action, rng)
+
+        print('{:>8} {:>12.4f} {:>14.4f} {:>14.4f}'.format(size, timeit(full), timeit(one_row), timeit(all_rows)))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 400, 1600])
@@ -0,0 +1,241 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.preconditions import PreconditionChecker
+from pyrddl import packed
+from pyrddl import tensors
+
+import collections
+import numpy as np
+
+from typing import Dict, Iterator, Optional, Tuple
+
+Fluents = Dict[str, np.ndarray]
+
+
+def binomial_table(n: int, k: int) -> np.ndarray:
+    '''Returns the (n + 1, k + 1) table of binomial coefficients C(i, j).
+
+    Raises:
+        ValueError: If the number of subsets of at most k of n elements
+            does not fit in a 64-bit integer.
+    '''
+    rows = [[1] + [0] * k]
+    for i in range(1, n + 1):
+        prev = rows[-1]
+        rows.append([1] + [prev[j] + prev[j - 1] for j in range(1, k + 1)])
+    if sum(rows[n]) >= 2 ** 63:
+        raise ValueError('Binomial coefficients of ({}, {}) do not fit in 64 bits.'.format(n, k))
+    return np.array(rows, dtype=np.int64)
+
+
+class BooleanActionSpace(object):
+    '''Indexable space of the joint boolean actions of an RDDL model.
+
+    The ground boolean action fluents are numbered in canonical order, so
+    that a joint action is a boolean vector of `size` ground fluent values,
+    and a batch of joint actions is a (batch_size, size) boolean array.
+    Joint actions with at most `max_nondef` ground fluents set to a
+    non-default value are ranked by their number k of non-default fluents,
+    then by the colexicographic rank of the set of non-default positions
+    in the combinatorial number system. Any range of ranks is unranked
+    with k vectorized searches, without enumerating previous actions.
+
+    Non-boolean action fluents are not enumerated and are kept at their
+    defaults by :meth:`fluents`.
+
+    Args:
+        rddl: A built RDDL object.
+        max_nondef: The maximum number of non-default ground fluents.
+            Defaults to the instance's max-nondef-actions.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        names (List[str]): The boolean action fluents in canonical order.
+        size (int): The number of ground boolean action fluents.
+        max_nondef (int): The maximum number of non-default ground fluents.
+        default (np.ndarray): The default value of each ground fluent.
+    '''
+
+    def __init__(self, rddl, max_nondef: Optional[int] = None, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        self.cache_dir = cache_dir
+        domain = rddl.domain
+        fluents = domain.action_fluents
+
+        self.names, self._slices = [], {}
+        defaults = []
+        for name, shape in zip(domain.action_fluent_ordering, rddl.action_size):
+            if fluents[name].range != 'bool':
+                continue
+            start = sum(len(default) for default in defaults)
+            self.names.append(name)
+            self._slices[name] = slice(start, start + int(np.prod(shape, dtype=np.int64)))
+            defaults.append(np.full(self._slices[name].stop - start, bool(fluents[name].default)))
+        self.default = np.concatenate(defaults) if defaults else np.zeros(0, dtype=bool)
+        self.size = len(self.default)
+
+        if max_nondef is None:
+            max_nondef = getattr(rddl.instance, 'max_nondef_actions', self.size)
+        self.max_nondef = min(max_nondef, self.size) if isinstance(max_nondef, int) else self.size
+
+        self._binomial = binomial_table(self.size, self.max_nondef)
+        counts = self._binomial[self.size]
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._checker = None
+
+    def __len__(self) -> int:
+        '''Returns the number of joint actions.'''
+        return int(self._offsets[-1])
+
+    def count(self, k: int) -> int:
+        '''Returns the number of joint actions with exactly `k` non-default fluents.'''
+        return int(self._binomial[self.size, k])
+
+    def rank(self, actions: np.ndarray) -> np.ndarray:
+        '''Returns the rank of each joint action.
+
+        Args:
+            actions: A (batch_size, size) boolean array.
+
+        Returns:
+            np.ndarray: An int64 array of shape (batch_size,).
+
+        Raises:
+            ValueError: If an action has more than `max_nondef` non-default fluents.
+        '''
+        nondef = np.asarray(actions, dtype=bool).reshape(-1, self.size) != self.default
+        k = nondef.sum(axis=1)
+        if len(k) and k.max() > self.max_nondef:
+            raise ValueError('Actions with more than {} non-default fluents.'.format(self.max_nondef))
+        rows, positions = np.nonzero(nondef)
+        starts = np.cumsum(k) - k
+        order = np.arange(len(positions)) - starts[rows] + 1
+        terms = self._binomial[positions, order]
+        ranks = self._offsets[k].copy()
+        nonempty = np.flatnonzero(k)
+        if len(nonempty):
+            ranks[nonempty] += np.add.reduceat(terms, starts[nonempty])
+        return ranks
+
+    def unrank(self, ranks) -> np.ndarray:
+        '''Returns the joint action of each rank.
+
+        Args:
+            ranks: An array-like of integer ranks in [0, len(self)).
+
+        Returns:
+            np.ndarray: A (batch_size, size) boolean array.
+
+        Raises:
+            ValueError: If a rank is out of range.
+        '''
+        ranks = np.asarray(ranks, dtype=np.int64).reshape(-1)
+        if len(ranks) and (ranks.min() < 0 or ranks.max() >= len(self)):
+            raise ValueError('Action ranks out of range [0, {}).'.format(len(self)))
+        k = np.searchsorted(self._offsets, ranks, side='right') - 1
+        rest = ranks - self._offsets[k]
+        nondef = np.zeros((len(ranks), self.size), dtype=bool)
+        for i in range(self.max_nondef, 0, -1):
+            rows = np.flatnonzero(k >= i)
+            column = self._binomial[:self.size, i]
+            positions = np.searchsorted(column, rest[rows], side='right') - 1
+            nondef[rows, positions] = True
+            rest[rows] -= column[positions]
+        return nondef ^ self.default
+
+    def __getitem__(self, index) -> np.ndarray:
+        '''Returns the joint action of an integer rank, or the batch of a slice or array of ranks.'''
+        if isinstance(index, slice):
+            return self.unrank(np.arange(*index.indices(len(self))))
+        if np.ndim(index) == 0:
+            return self.unrank([index + len(self) if index < 0 else index])[0]
+        return self.unrank(index)
+
+    def batches(self,
+            batch_size: int = 65536,
+            state: Optional[Fluents] = None,
+            start: int = 0,
+            stop: Optional[int] = None,
+            packed: bool = False) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        '''Yields the joint actions of a range of ranks in batches.
+
+        If a `state` is given, actions violating the action preconditions
+        in that state are pruned with a compiled :class:`PreconditionChecker`,
+        which checks local preconditions first.
+
+        Args:
+            batch_size: The number of ranks unranked per batch.
+            state: Mapping from state fluent name to a tensor of shape (1,) + shape.
+            start: The first rank.
+            stop: The rank after the last one. Defaults to len(self).
+            packed: If True, yield actions bit-packed along the batch axis.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: The ranks of a batch of feasible
+            joint actions and their (n, size) boolean array, or its
+            (size, num_words(n)) uint64 words if `packed`.
+        '''
+        stop = len(self) if stop is None else min(stop, len(self))
+        for first in range(start, stop, batch_size):
+            ranks = np.arange(first, min(first + batch_size, stop), dtype=np.int64)
+            actions = self.unrank(ranks)
+            if state is not None:
+                feasible = self.checker(state, self.fluents(actions))
+                ranks, actions = ranks[feasible], actions[feasible]
+            if len(ranks):
+                yield ranks, self.pack(actions) if packed else actions
+
+    @property
+    def checker(self) -> PreconditionChecker:
+        '''Returns the precondition checker, compiled on first use.'''
+        if self._checker is None:
+            self._checker = PreconditionChecker(self.rddl, self.cache_dir)
+        return self._checker
+
+    def pack(self, actions: np.ndarray) -> np.ndarray:
+        '''Returns the (size, num_words(batch_size)) uint64 words of a batch of joint actions.'''
+        return packed.pack(np.asarray(actions, dtype=bool).reshape(-1, self.size))
+
+    def unpack(self, words: np.ndarray, batch_size: int) -> np.ndarray:
+        '''Returns the (batch_size, size) boolean array of packed joint actions.'''
+        return packed.unpack(words, batch_size)
+
+    def fluents(self, actions: np.ndarray) -> Fluents:
+        '''Returns the action fluent tensors of a batch of joint actions.
+
+        Boolean action fluents are views into `actions`; other action
+        fluents are filled with their defaults.
+
+        Args:
+            actions: A (batch_size, size) boolean array.
+
+        Returns:
+            Fluents: Mapping from action fluent name to a tensor of shape
+            (batch_size,) + shape.
+        '''
+        actions = np.asarray(actions, dtype=bool).reshape(-1, self.size)
+        batch_size = len(actions)
+        domain = self.rddl.domain
+        result = collections.OrderedDict()
+        for name, shape in zip(domain.action_fluent_ordering, self.rddl.action_size):
+            if name in self._slices:
+                result[name] = actions[:, self._slices[name]].reshape((batch_size,) + tuple(shape))
+            else:
+                pvar = domain.action_fluents[name]
+                dtype = tensors.range_dtype(pvar.range, self.rddl.object_table)
+                result[name] = np.full((batch_size,) + tuple(shape), pvar.default, dtype=dtype)
+        return result
@@ -0,0 +1,335 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.expr import Expression
+from pyrddl.packed import PackedFluents
+from pyrddl import codegen
+from pyrddl import packed
+from pyrddl import utils
+
+import collections
+import functools
+import numpy as np
+
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+Axes = Tuple[str, ...]
+Scope = Dict[str, str]
+Words = Callable[[Mapping[str, np.ndarray]], np.ndarray]
+
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+RELATIONAL_OPS = {
+    '==': packed.equivalent,
+    '~=': np.bitwise_xor
+}
+
+AGGREGATION_OPS = {
+    'forall': np.bitwise_and,
+    'exists': np.bitwise_or
+}
+
+
+class BitwiseCompiler(object):
+    '''Compiles purely boolean RDDL expressions into bit-parallel evaluators.
+
+    A purely boolean expression only reads boolean fluents and constants,
+    and combines them with the boolean connectives, `==` and `~=`,
+    if-then-else, KronDelta and the `forall_` and `exists_` aggregations.
+    Its evaluator maps packed fluent words (see :func:`pyrddl.packed.pack`)
+    to packed words, so that each bitwise operation evaluates 64 batch
+    elements at once, and aggregations are word-wise AND/OR reductions
+    over the groundings of the quantified variables.
+
+    Evaluators take a mapping from fluent name to its packed words, of
+    shape fluent_shape + (num_words,), and return an array whose leading
+    axes are the expression's free variables, in the order of the
+    returned axes, followed by the words axis.
+
+    Args:
+        rddl: A built RDDL object.
+    '''
+
+    def __init__(self, rddl) -> None:
+        self.rddl = rddl
+        non_fluents = rddl.non_fluent_tensors()
+        self._non_fluents = {
+            name: np.where(tensor, ALL_ONES, np.uint64(0))[..., np.newaxis]
+            for name, tensor in non_fluents.items()
+            if tensor.dtype == np.bool_
+        }
+
+    def supports(self, expr: Expression) -> bool:
+        '''Returns True if `expr` is purely boolean.'''
+        etype = expr.etype
+        if etype[0] == 'constant':
+            return isinstance(expr.value, bool)
+        elif etype[0] == 'pvar':
+            return self._pvariable(expr.name).range == 'bool' and all(
+                isinstance(param, str) or self._is_object(param) for param in expr.args[1] or [])
+        elif etype[0] == 'boolean':
+            return all(self.supports(arg) for arg in expr.args)
+        elif etype[0] == 'relational':
+            return etype[1] in RELATIONAL_OPS and all(self.supports(arg) for arg in expr.args)
+        elif etype[0] == 'aggregation':
+            return etype[1] in AGGREGATION_OPS and self.supports(expr.args[-1])
+        elif etype[0] == 'control':
+            return all(self.supports(arg) for arg in expr.args)
+        elif etype[0] == 'randomvar':
+            return etype[1] == 'KronDelta' and self.supports(expr.args[0])
+        return False
+
+    def compile_cpf(self, cpf, pvar) -> Callable[[Mapping[str, np.ndarray], int], np.ndarray]:
+        '''Returns the evaluator of a purely boolean `cpf` of fluent `pvar`.
+
+        The evaluator takes the mapping of packed fluent words and the
+        batch size, and returns the packed words of the full fluent tensor,
+        of shape fluent_shape + (num_words(batch_size),), with zero padding bits.
+        '''
+        _, (_, params) = cpf.pvar
+        params = tuple(params) if params is not None else ()
+        param_types = pvar.param_types if pvar.param_types is not None else []
+        scope = dict(zip(params, param_types))
+        dims = tuple(self.rddl._param_types_to_shape(pvar.param_types))
+        words, axes = self.compile_expression(cpf.expr, scope)
+        words = self._align(words, axes, params)
+
+        def evaluate(fluents, batch_size):
+            result = np.empty(dims + (packed.num_words(batch_size),), dtype=np.uint64)
+            np.copyto(result, words(fluents))
+            if batch_size % packed.WORD_BITS:
+                result[..., -1] &= np.uint64((1 << (batch_size % packed.WORD_BITS)) - 1)
+            return result
+
+        return evaluate
+
+    def compile_expression(self, expr: Expression, scope: Scope) -> Tuple[Words, Axes]:
+        '''Returns the evaluator of a purely boolean `expr` and its free variables.
+
+        Raises:
+            ValueError: If `expr` is not purely boolean.
+        '''
+        etype = expr.etype
+        if etype[0] == 'constant' and isinstance(expr.value, bool):
+            value = np.array([ALL_ONES if expr.value else 0], dtype=np.uint64)
+            return (lambda fluents: value), ()
+        elif etype[0] == 'pvar':
+            return self._compile_pvariable(expr, scope)
+        elif etype[0] == 'boolean':
+            args = [self.compile_expression(arg, scope) for arg in expr.args]
+            if etype[1] == '~':
+                words, axes = args[0]
+                return (lambda fluents: np.invert(words(fluents))), axes
+            return self._combine(packed.BOOLEAN_OPS[etype[1]], args)
+        elif etype[0] == 'relational' and etype[1] in RELATIONAL_OPS:
+            args = [self.compile_expression(arg, scope) for arg in expr.args]
+            return self._combine(RELATIONAL_OPS[etype[1]], args)
+        elif etype[0] == 'aggregation' and etype[1] in AGGREGATION_OPS:
+            return self._compile_aggregation(expr, scope)
+        elif etype[0] == 'control' and etype[1] == 'if':
+            args = [self.compile_expression(arg, scope) for arg in expr.args]
+            return self._combine(_select, args)
+        elif etype[0] == 'randomvar' and etype[1] == 'KronDelta':
+            return self.compile_expression(expr.args[0], scope)
+        raise ValueError('Expression is not purely boolean: {}'.format(etype))
+
+    def _compile_pvariable(self, expr: Expression, scope: Scope) -> Tuple[Words, Axes]:
+        '''Returns the evaluator of a boolean pvariable, indexed by its arguments.'''
+        name = expr.name
+        pvar = self._pvariable(name)
+        params = expr.args[1] or []
+
+        index = [slice(None)] * len(params)
+        axes = []
+        for i, (param, ptype) in enumerate(zip(params, pvar.param_types or [])):
+            if isinstance(param, str):
+                if param not in scope:
+                    raise ValueError('Unbound variable {} in {}'.format(param, name))
+                axes.append(param)
+            else:
+                index[i] = self.rddl.object_table[ptype]['idx'][param[1][0]]
+        index = tuple(index)
+
+        diagonals = []
+        for axis in sorted(set(axes), key=axes.index):
+            while axes.count(axis) > 1:
+                i = axes.index(axis)
+                j = axes.index(axis, i + 1)
+                diagonals.append((i, j))
+                axes = [a for k, a in enumerate(axes) if k not in (i, j)] + [axis]
+
+        if name in self._non_fluents:
+            tensor = self._non_fluents[name]
+            source = lambda fluents: tensor
+        else:
+            source = lambda fluents: fluents[name]
+
+        def words(fluents):
+            value = source(fluents)[index]
+            for i, j in diagonals:
+                value = np.moveaxis(np.diagonal(value, axis1=i, axis2=j), -1, -2)
+            return value
+
+        return words, tuple(axes)
+
+    def _compile_aggregation(self, expr: Expression, scope: Scope) -> Tuple[Words, Axes]:
+        '''Returns the evaluator of a `forall_` or `exists_` aggregation as a word-wise reduction.'''
+        reduce = AGGREGATION_OPS[expr.etype[1]].reduce
+        typed_vars, body = expr.args[:-1], expr.args[-1]
+        agg_scope = dict(scope)
+        for _, (var, vtype) in typed_vars:
+            agg_scope[var] = vtype
+        words, body_axes = self.compile_expression(body, agg_scope)
+
+        variables = [var for _, (var, _) in typed_vars if var in body_axes]
+        if not variables:
+            return words, body_axes
+        axis = tuple(body_axes.index(var) for var in variables)
+        axes = tuple(a for a in body_axes if a not in variables)
+        return (lambda fluents: reduce(words(fluents), axis=axis)), axes
+
+    def _combine(self, op, args) -> Tuple[Words, Axes]:
+        '''Returns the evaluator applying `op` to the aligned evaluators in `args`.'''
+        axes = []
+        for _, arg_axes in args:
+            axes += [axis for axis in arg_axes if axis not in axes]
+        axes = tuple(axes)
+        operands = [self._align(words, arg_axes, axes) for words, arg_axes in args]
+        if len(operands) == 2:
+            a, b = operands
+            return (lambda fluents: op(a(fluents), b(fluents))), axes
+        if len(operands) == 3:
+            a, b, c = operands
+            return (lambda fluents: op(a(fluents), b(fluents), c(fluents))), axes
+        return (lambda fluents: functools.reduce(op, [arg(fluents) for arg in operands])), axes
+
+    @classmethod
+    def _align(cls, words: Words, axes: Axes, target: Axes) -> Words:
+        '''Returns an evaluator of `words` broadcastable against the `target` axes.'''
+        if axes == target:
+            return words
+        present = [axis for axis in target if axis in axes]
+        perm = tuple(axes.index(axis) for axis in present) + (len(axes),)
+        index = tuple(slice(None) if axis in axes else np.newaxis for axis in target)
+
+        def aligned(fluents):
+            return np.transpose(words(fluents), perm)[index]
+
+        return aligned
+
+    def _pvariable(self, name: str):
+        '''Returns the PVariable of the (possibly next-state) fluent `name`.'''
+        functor = name[:name.index('/')]
+        if functor.endswith("'"):
+            name = utils.rename_next_state_fluent(name)
+        return self.rddl.fluent_table[name][0]
+
+    @classmethod
+    def _is_object(cls, param) -> bool:
+        '''Returns True if the pvariable argument `param` is an object constant.'''
+        return isinstance(param, tuple) and param[0] == 'pvar_expr' and param[1][1] is None
+
+
+def _select(condition: np.ndarray, then: np.ndarray, otherwise: np.ndarray) -> np.ndarray:
+    '''Returns the word-wise if-then-else of packed words.'''
+    return (condition & then) | (~condition & otherwise)
+
+
+class BitParallelStep(object):
+    '''Step function evaluating purely boolean CPFs on bit-packed fluents.
+
+    Each CPF is classified by :meth:`BitwiseCompiler.supports`. Purely
+    boolean CPFs are evaluated 64 batch elements at a time on packed
+    words; all other CPFs, and the reward, fall back to the functions of
+    :func:`pyrddl.codegen.compile_cpfs`, which read the fluents they need
+    unpacked. Boolean results are kept packed between CPFs.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        bitwise (List[str]): The CPFs evaluated on packed words.
+        general (List[str]): The CPFs evaluated by the general evaluator.
+    '''
+
+    def __init__(self, rddl, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        domain = rddl.domain
+        compiler = BitwiseCompiler(rddl)
+        module = codegen.compile_cpfs(rddl, cache_dir)
+        self._reward = module.reward
+
+        self.bitwise, self.general = [], []
+        self._cpfs = []
+        self._packed = set()
+        cpfs = [(cpf, domain.intermediate_fluents[cpf.name]) for cpf in domain.intermediate_cpfs]
+        for cpf in domain.state_cpfs:
+            cpfs.append((cpf, domain.state_fluents[utils.rename_next_state_fluent(cpf.name)]))
+        for cpf, pvar in cpfs:
+            if pvar.range == 'bool' and compiler.supports(cpf.expr):
+                self.bitwise.append(cpf.name)
+                self._cpfs.append((cpf.name, compiler.compile_cpf(cpf, pvar), True, True))
+            else:
+                self.general.append(cpf.name)
+                self._cpfs.append((cpf.name, module.CPFS[cpf.name], False, pvar.range == 'bool'))
+            if pvar.range == 'bool':
+                self._packed.add(cpf.name)
+
+    def __call__(self,
+            state: Mapping[str, np.ndarray],
+            action: Mapping[str, np.ndarray],
+            rng: np.random.Generator) -> Tuple[PackedFluents, PackedFluents, np.ndarray]:
+        '''Evaluates all CPFs and the reward of a batch of states and actions.
+
+        Args:
+            state: The batch of state fluents, packed or unpacked.
+            action: The batch of action fluents, packed or unpacked.
+            rng: The random number generator of the general evaluator.
+
+        Returns:
+            Tuple[PackedFluents, PackedFluents, np.ndarray]: The intermediate
+            fluents, the next state fluents, and the reward of shape (batch_size,).
+        '''
+        state = state if isinstance(state, PackedFluents) else PackedFluents.pack(state)
+        action = action if isinstance(action, PackedFluents) else PackedFluents.pack(action)
+        batch_size = state.batch_size
+
+        tensors = collections.OrderedDict()
+        for fluents in (state, action):
+            for name in fluents:
+                tensors[name] = fluents.words(name) if name in fluents.packed else fluents[name]
+        bits = state.packed | action.packed | self._packed
+
+        for name, function, bitwise, boolean in self._cpfs:
+            if bitwise:
+                tensors[name] = function(tensors, batch_size)
+            else:
+                tensor = function(PackedFluents(tensors, batch_size, bits), rng)
+                tensors[name] = packed.pack(tensor) if boolean else tensor
+
+        reward = self._reward(PackedFluents(tensors, batch_size, bits), rng)
+
+        domain = self.rddl.domain
+        interms = collections.OrderedDict((name, tensors[name]) for name in domain.interm_fluent_ordering)
+        next_state = collections.OrderedDict()
+        for name in domain.state_fluent_ordering:
+            next_state[name] = tensors[utils.rename_state_fluent(name)]
+        return (
+            PackedFluents(interms, batch_size, bits & set(interms)),
+            PackedFluents(next_state, batch_size, [name for name in next_state if utils.rename_state_fluent(name) in bits]),
+            reward
+        )
@@ -0,0 +1,190 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.domain import ActionBound
+from pyrddl.expr import Expression
+from pyrddl import codegen
+from pyrddl import tensors
+
+import collections
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+Fluents = Dict[str, np.ndarray]
+
+
+class ActionBounds(object):
+    '''Batched lower and upper bound tensors of the action fluents of an RDDL model.
+
+    The bounds extracted by :meth:`pyrddl.domain.Domain._build_action_bound_constraints_table`
+    are compiled into vectorized functions of the state. Each bound is
+    evaluated into a tensor of its action fluent's shape; bounds with
+    quantified variables other than the action parameters are reduced
+    over them (max for lower bounds, min for upper bounds), and several
+    bounds of the same kind are combined likewise. Bounds of integer
+    action fluents are rounded to the nearest feasible integers, so that
+    a strict bound `k < 3` gives the closed bound 2; strict bounds of real
+    action fluents are treated as closed bounds.
+
+    Bounds on actions whose parameters are not distinct variables, such
+    as `outflow(t1) <= 5`, have no tensor form and are listed in
+    `unsupported`.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        bounded (List[str]): The action fluents with at least one bound.
+        unsupported (List[Tuple[str, ActionBound]]): The bounds without a tensor form.
+    '''
+
+    def __init__(self, rddl, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        domain = rddl.domain
+
+        self._shapes = collections.OrderedDict(zip(domain.action_fluent_ordering, rddl.action_size))
+        self._dtypes = { name: codegen.NUMPY_DTYPES.get(domain.action_fluents[name].range, np.int64) for name in self._shapes }
+        self._bounds = collections.OrderedDict()
+        self._action_bounds = set()
+        self._strict = []
+        self.unsupported = []
+
+        items = []
+        for name in self._shapes:
+            pvar = domain.action_fluents[name]
+            indices = ([], [])
+            for kind, table in enumerate([domain.action_lower_bounds, domain.action_upper_bounds]):
+                for bound in table.get(name, []):
+                    item = _bound_item(bound, pvar.param_types or [], 'max' if kind == 0 else 'min')
+                    if item is None:
+                        self.unsupported.append((name, bound))
+                        continue
+                    if item[0].scope & set(domain.action_fluents):
+                        self._action_bounds.add(name)
+                    indices[kind].append(len(items))
+                    items.append(item)
+                    self._strict.append(bound.strict)
+            if indices[0] or indices[1]:
+                self._bounds[name] = indices
+        self.bounded = list(self._bounds)
+
+        self._functions = codegen.compile_tensors(rddl, 'bounds', items, cache_dir).TENSORS
+
+    def __call__(self, state: Fluents, action: Optional[Fluents] = None) -> Tuple[Fluents, Fluents]:
+        '''Returns the lower and upper bounds of each action fluent.
+
+        Args:
+            state: Mapping from state fluent name to a tensor of shape
+                (batch_size,) + shape.
+            action: Mapping from action fluent name to a tensor of shape
+                (batch_size,) + shape. Required if some bound reads an
+                action fluent.
+
+        Returns:
+            Tuple[Fluents, Fluents]: The lower and upper bound tensors of
+            each action fluent, of shape (batch_size,) + shape and dtype
+            float64, with integer values for integer action fluents.
+            Missing bounds are -inf and +inf.
+
+        Raises:
+            ValueError: If some bound reads an action fluent and `action` is not given.
+        '''
+        if action is None and self._action_bounds:
+            raise ValueError('Bounds of {} read action fluents, but no action was given.'.format(
+                ', '.join(sorted(self._action_bounds))))
+        fluents = dict(state)
+        if action is not None:
+            fluents.update(action)
+        batch_size = tensors.batch_size(fluents)
+        lower, upper = collections.OrderedDict(), collections.OrderedDict()
+        for name, shape in self._shapes.items():
+            bounds = self._bounds.get(name, ([], []))
+            integer = np.issubdtype(self._dtypes[name], np.integer)
+            lower[name] = self._combine(fluents, bounds[0], np.maximum, -np.inf, (batch_size,) + shape, integer)
+            upper[name] = self._combine(fluents, bounds[1], np.minimum, np.inf, (batch_size,) + shape, integer)
+        return lower, upper
+
+    def clip(self, state: Fluents, action: Fluents) -> Fluents:
+        '''Returns the projection of a batch of actions onto their bounds.
+
+        Integer actions are projected onto the integers within bounds,
+        excluding the bounds of strict inequalities.
+
+        Args:
+            state: Mapping from state fluent name to a batched tensor.
+            action: Mapping from action fluent name to a batched tensor.
+
+        Returns:
+            Fluents: Mapping from action fluent name to the clipped tensor.
+        '''
+        lower, upper = self(state, action)
+        clipped = collections.OrderedDict()
+        for name, tensor in action.items():
+            if name not in self._bounds:
+                clipped[name] = tensor
+                continue
+            clipped[name] = np.clip(tensor, lower[name], upper[name]).astype(np.asarray(tensor).dtype, copy=False)
+        return clipped
+
+    def _combine(self,
+            fluents: Fluents,
+            indices: List[int],
+            ufunc,
+            default: float,
+            shape: Tuple[int, ...],
+            integer: bool) -> np.ndarray:
+        '''Returns the elementwise combination by `ufunc` of the bounds at `indices`.
+
+        If `integer`, each bound is first rounded inwards to the nearest
+        integer satisfying it.
+        '''
+        if not indices:
+            return np.full(shape, default)
+        result = None
+        for i in indices:
+            bound = np.array(self._functions[i](fluents), dtype=np.float64)
+            if integer:
+                bound = self._round(bound, lower=ufunc is np.maximum, strict=self._strict[i])
+            if result is None:
+                result = bound
+            else:
+                ufunc(result, bound, out=result)
+        return result
+
+    @classmethod
+    def _round(cls, bound: np.ndarray, lower: bool, strict: bool) -> np.ndarray:
+        '''Returns the nearest integers satisfying the lower or upper `bound`.'''
+        if lower:
+            return np.floor(bound) + 1 if strict else np.ceil(bound)
+        return np.ceil(bound) - 1 if strict else np.floor(bound)
+
+
+def _bound_item(bound: ActionBound, param_types: List[str], reduction: str):
+    '''Returns the (expr, scope, axes, kind) tensor item of `bound`, or None if it has no tensor form.'''
+    params = bound.params
+    variables = [param for param in params if isinstance(param, str) and param.startswith('?')]
+    if len(variables) != len(params) or len(set(variables)) != len(variables):
+        return None
+    scope = dict(bound.scope)
+    scope.update(zip(params, param_types))
+    expr = bound.expr
+    free = sorted(var for var in bound.scope if var not in params)
+    if free:
+        typed_vars = [('typed_var', (var, scope[var])) for var in free]
+        expr = Expression((reduction, typed_vars + [expr]))
+    return (expr, scope, tuple(params), 'real')
@@ -0,0 +1,1686 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import sparse
+from pyrddl import tensors
+from pyrddl import utils
+from pyrddl.dependency import REWARD
+from pyrddl.expr import Expression
+
+import hashlib
+import importlib.util
+import math
+import os
+import re
+import tempfile
+import warnings
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+Axes = Tuple[str, ...]
+Scope = Dict[str, str]
+
+CODEGEN_VERSION = 12
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pyrddl')
+
+DTYPES = {
+    'bool': 'np.bool_',
+    'int': 'np.int64',
+    'real': 'np.float64'
+}
+
+NUMPY_DTYPES = tensors.NUMPY_DTYPES
+
+ARITHMETIC_UFUNCS = {
+    '+': 'add',
+    '-': 'subtract',
+    '*': 'multiply',
+    '/': 'true_divide'
+}
+
+RELATIONAL_UFUNCS = {
+    '==': 'equal',
+    '~=': 'not_equal',
+    '<': 'less',
+    '<=': 'less_equal',
+    '>': 'greater',
+    '>=': 'greater_equal'
+}
+
+BOOLEAN_UFUNCS = {
+    '^': 'logical_and',
+    '&': 'logical_and',
+    '|': 'logical_or',
+    '~': 'logical_not',
+    '<=>': 'equal'
+}
+
+FUNCTION_UFUNCS = {
+    'abs': 'absolute',
+    'sgn': 'sign',
+    'max': 'maximum',
+    'min': 'minimum',
+    'exp': 'exp',
+    'log': 'log',
+    'sqrt': 'sqrt',
+    'pow': 'power',
+    'floor': 'floor',
+    'ceil': 'ceil',
+    'sin': 'sin',
+    'cos': 'cos',
+    'tan': 'tan',
+    'asin': 'arcsin',
+    'acos': 'arccos',
+    'atan': 'arctan',
+    'sinh': 'sinh',
+    'cosh': 'cosh',
+    'tanh': 'tanh'
+}
+
+AGGREGATION_REDUCTIONS = {
+    'sum': 'sum',
+    'prod': 'prod',
+    'avg': 'mean',
+    'maximum': 'max',
+    'minimum': 'min',
+    'forall': 'all',
+    'exists': 'any'
+}
+
+SEGMENT_OPS = {'segment_sum', 'segment_any', 'segment_all'}
+
+EINSUM_LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+EINSUM_OPTIMIZE_SIZE = 1 << 15
+
+RANDOM_KINDS = {
+    'Bernoulli': 'bool',
+    'Poisson': 'int',
+    'Normal': 'real',
+    'Uniform': 'real',
+    'Gamma': 'real',
+    'Exponential': 'real',
+    'Weibull': 'real'
+}
+
+
+class Value(object):
+    '''Compile-time descriptor of a tensor in the generated code.
+
+    Every non-constant tensor has a leading batch axis followed by one axis
+    per typed variable in `axes`. Tensors that do not depend on the state,
+    action or a random variable have a leading axis of size 1.
+
+    Args:
+        code: Python source code evaluating to the tensor.
+        axes: Typed variables indexing the non-batch axes.
+        dims: Size of each typed variable axis.
+        batched: True if the leading axis is the batch axis.
+        kind: Range kind of the tensor (bool, int or real).
+        base: Name of the temporary referenced by `code`, if any.
+        value: Python value of a constant tensor.
+    '''
+
+    def __init__(self,
+            code: str,
+            axes: Axes = (),
+            dims: Tuple[int, ...] = (),
+            batched: bool = False,
+            kind: str = 'real',
+            base: Optional[str] = None,
+            value=None) -> None:
+        self.code = code
+        self.axes = axes
+        self.dims = dims
+        self.batched = batched
+        self.kind = kind
+        self.base = base
+        self.value = value
+
+    @classmethod
+    def constant(cls, value) -> 'Value':
+        '''Returns a constant Value for the given Python `value`.'''
+        if isinstance(value, (bool, np.bool_)):
+            value, kind = bool(value), 'bool'
+        elif isinstance(value, (int, np.integer)):
+            value, kind = int(value), 'int'
+        else:
+            value, kind = float(value), 'real'
+        return cls(_literal(value), kind=kind, value=value)
+
+    @property
+    def is_constant(self) -> bool:
+        '''Returns True if the tensor is a compile-time constant.'''
+        return self.value is not None
+
+    def view(self, code: str, axes: Axes, dims: Tuple[int, ...]) -> 'Value':
+        '''Returns a view of this tensor with new `code`, `axes` and `dims`.'''
+        return Value(code, axes, dims, self.batched, self.kind, self.base)
+
+
+class Instr(object):
+    '''Straight-line instruction of the generated code.
+
+    Args:
+        out: The Value defined by the instruction.
+        op: The instruction opcode.
+        args: The operand Values.
+        attrs: Opcode-specific attributes.
+    '''
+
+    def __init__(self, out: Value, op: str, args: Sequence[Value], attrs: Optional[Dict] = None) -> None:
+        self.out = out
+        self.op = op
+        self.args = tuple(args)
+        self.attrs = attrs or {}
+
+    def __repr__(self) -> str:
+        '''Returns the source code of the instruction.'''
+        return emit_instr(self)
+
+
+class CodeGenerator(object):
+    '''Generates straight-line NumPy source code from RDDL expressions.
+
+    Note:
+        The generated code follows the same canonical orderings used by
+        :obj:`pyrddl.rddl.RDDL`. Fluent tensors are indexed by the fluent
+        name (e.g., 'rlevel/1') and have shape (batch_size, *fluent_shape).
+
+    Args:
+        rddl: A built RDDL object.
+        sparse: Mapping from sparse non-fluent name to its number of non-zero
+            entries. Defaults to the non-fluents detected by :func:`sparse_non_fluents`.
+            Sums of products and quantifiers gated by a sparse non-fluent
+            are evaluated over its entries; other uses densify it with a
+            warning.
+    '''
+
+    def __init__(self, rddl, sparse: Optional[Dict[str, int]] = None) -> None:
+        self.rddl = rddl
+        self.sparse = sparse if sparse is not None else sparse_non_fluents(rddl)
+        self._counter = 0
+        self._temps = set()
+        self.reset()
+
+    def reset(self) -> None:
+        '''Starts the generation of a new function body.'''
+        self.instrs = []
+        self._sources = {}
+        self._env = {}
+
+    def add_source(self, name: str, code: str, batched: bool) -> None:
+        '''Declares the fluent `name` as an input loaded from `code`.'''
+        self._sources[name] = (code, batched)
+
+    def add_fluent(self, name: str, value: Value) -> None:
+        '''Defines the fluent `name` as the compiled tensor `value`.'''
+        self._env[name] = value
+
+    def compile_expression(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles `expr` into instructions and returns its result.
+
+        Args:
+            expr: The RDDL expression.
+            scope: Mapping from typed variable to its type.
+
+        Returns:
+            The Value holding the result of the expression.
+        '''
+        etype = expr.etype
+        if etype[0] == 'constant':
+            return Value.constant(expr.value)
+        elif etype[0] == 'pvar':
+            return self._compile_pvariable(expr, scope)
+        elif etype[0] == 'randomvar':
+            return self._compile_random_variable(expr, scope)
+        elif etype[0] == 'arithmetic':
+            return self._compile_arithmetic(expr, scope)
+        elif etype[0] == 'boolean':
+            return self._compile_boolean(expr, scope)
+        elif etype[0] == 'relational':
+            args = [self.compile_expression(arg, scope) for arg in expr.args]
+            return self._elementwise(RELATIONAL_UFUNCS[etype[1]], args, 'bool')
+        elif etype[0] == 'func':
+            return self._compile_function(expr, scope)
+        elif etype[0] == 'aggregation':
+            return self._compile_aggregation(expr, scope)
+        elif etype[0] == 'control' and etype[1] == 'if':
+            return self._compile_if(expr, scope)
+        raise NotImplementedError('Expression type not supported: {}'.format(etype))
+
+    def compile_cpf(self, cpf, pvar) -> Value:
+        '''Compiles the `cpf` of fluent `pvar` into a full fluent tensor.'''
+        _, (_, params) = cpf.pvar
+        params = tuple(params) if params is not None else ()
+        param_types = pvar.param_types if pvar.param_types is not None else []
+        scope = dict(zip(params, param_types))
+        dims = self.rddl._param_types_to_shape(pvar.param_types)
+        value = self.compile_expression(cpf.expr, scope)
+        return self.materialize(value, params, dims, self._range_kind(pvar))
+
+    def materialize(self, value: Value, axes: Axes, dims: Tuple[int, ...], kind: str) -> Value:
+        '''Returns a new batched tensor with exactly the given `axes` and `kind`.'''
+        missing = set(value.axes) - set(axes)
+        if missing:
+            raise ValueError('Free variables {} not in output scope {}'.format(sorted(missing), axes))
+        is_fresh = value.base in self._temps and value.code == value.base
+        if is_fresh and value.batched and value.axes == axes and value.kind == kind:
+            return value
+        aligned = self._align(value, axes, dims)
+        out = self._new_value(axes, dims, True, kind)
+        shape = _shape_code(True, dims)
+        self.instrs.append(Instr(out, 'output', [aligned], {'shape': shape, 'dtype': kind}))
+        return out
+
+    def _new_value(self, axes: Axes, dims: Tuple[int, ...], batched: bool, kind: str) -> Value:
+        '''Returns a new temporary Value.'''
+        name = 't{}'.format(self._counter)
+        self._counter += 1
+        self._temps.add(name)
+        return Value(name, axes, dims, batched, kind, base=name)
+
+    def _load(self, name: str) -> Value:
+        '''Returns the full tensor of the fluent with given `name`.'''
+        if name in self._env:
+            return self._env[name]
+        if name not in self._sources:
+            raise ValueError('Fluent {} is not available in this context.'.format(name))
+        code, batched = self._sources[name]
+        if name in self.sparse:
+            warnings.warn('Sparse non-fluent {} is densified in an expression that has no sparse form.'.format(name))
+        pvar = self._pvariable(name)
+        dims = self.rddl._param_types_to_shape(pvar.param_types)
+        axes = tuple('${}'.format(i) for i in range(len(dims)))
+        var = 'v{}'.format(self._counter)
+        self._counter += 1
+        value = Value(var, axes, dims, batched, self._range_kind(pvar), base=var)
+        self.instrs.append(Instr(value, 'load', [], {'code': code}))
+        self._env[name] = value
+        return value
+
+    def _pvariable(self, name: str):
+        '''Returns the PVariable of the (possibly next-state) fluent `name`.'''
+        fluent_name = name
+        functor = name[:name.index('/')]
+        if functor.endswith("'"):
+            fluent_name = utils.rename_next_state_fluent(name)
+        return self.rddl.fluent_table[fluent_name][0]
+
+    def _compile_pvariable(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles a pvariable expression into a view of the fluent tensor.'''
+        name = expr.name
+        fluent = self._load(name)
+        pvar = self._pvariable(name)
+        _, params = expr.args
+        params = params if params is not None else []
+
+        index = [':']
+        axes = []
+        for param, ptype in zip(params, pvar.param_types or []):
+            if isinstance(param, str) and param.startswith('?'):
+                if param not in scope:
+                    raise ValueError('Unbound variable {} in {}'.format(param, name))
+                index.append(':')
+                axes.append(param)
+            elif isinstance(param, tuple) and param[0] == 'pvar_expr' and param[1][1] is None:
+                index.append(str(self._object_index(ptype, param[1][0])))
+            else:
+                raise NotImplementedError('Parameter not supported: {}'.format(param))
+
+        code = fluent.code
+        if any(i != ':' for i in index):
+            code = '{}[{}]'.format(code, ', '.join(index))
+
+        for axis in sorted(set(axes), key=axes.index):
+            while axes.count(axis) > 1:
+                i = axes.index(axis)
+                j = axes.index(axis, i + 1)
+                code = 'np.diagonal({}, axis1={}, axis2={})'.format(code, i + 1, j + 1)
+                axes = [a for k, a in enumerate(axes) if k not in (i, j)] + [axis]
+
+        axes = tuple(axes)
+        dims = tuple(self._type_size(scope[axis]) for axis in axes)
+        return fluent.view(code, axes, dims)
+
+    def _compile_arithmetic(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles an arithmetic expression.'''
+        op = expr.etype[1]
+        args = [self.compile_expression(arg, scope) for arg in expr.args]
+        if len(args) == 1:
+            if op == '+':
+                return args[0]
+            kind = 'int' if args[0].kind == 'bool' else args[0].kind
+            return self._elementwise('negative', args, kind, dtype=True)
+        if op == '/' or any(arg.kind == 'real' for arg in args):
+            kind = 'real'
+        else:
+            kind = 'int'
+        return self._elementwise(ARITHMETIC_UFUNCS[op], args, kind, dtype=True)
+
+    def _compile_boolean(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles a boolean expression.'''
+        op = expr.etype[1]
+        args = [self.compile_expression(arg, scope) for arg in expr.args]
+        if op == '=>':
+            args[0] = self._elementwise('logical_not', args[:1], 'bool')
+            return self._elementwise('logical_or', args, 'bool')
+        return self._elementwise(BOOLEAN_UFUNCS[op], args, 'bool')
+
+    def _compile_function(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles a function expression.'''
+        name = expr.etype[1]
+        if name != 'round' and name not in FUNCTION_UFUNCS:
+            raise NotImplementedError('Function not supported: {}'.format(name))
+        args = [self.compile_expression(arg, scope) for arg in expr.args]
+        if name == 'round':
+            half = self._elementwise('copysign', [Value.constant(0.5), args[0]], 'real', dtype=True)
+            shifted = self._elementwise('add', [args[0], half], 'real', dtype=True)
+            return self._elementwise('trunc', [shifted], 'real', dtype=True)
+        if name in ('abs', 'sgn', 'max', 'min'):
+            kinds = {arg.kind for arg in args}
+            kind = 'real' if 'real' in kinds else 'int'
+        else:
+            kind = 'real'
+        return self._elementwise(FUNCTION_UFUNCS[name], args, kind, dtype=True)
+
+    def _compile_aggregation(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles an aggregation expression into a reduction.'''
+        op = expr.etype[1]
+        typed_vars, body = expr.args[:-1], expr.args[-1]
+        variables = [var for _, (var, _) in typed_vars]
+
+        agg_scope = dict(scope)
+        for _, (var, vtype) in typed_vars:
+            agg_scope[var] = vtype
+
+        if op in ('exists', 'forall'):
+            value = self._compile_sparse_quantifier(op, variables, body, agg_scope)
+            if value is not None:
+                return value
+
+        if op in ('sum', 'avg') and self._product_factors(body):
+            factors = self._product_factors(body)
+            sparse = [factor for factor in factors if self._is_sparse_factor(factor)][:1]
+            factors = [self.compile_expression(arg, agg_scope) for arg in factors if not (sparse and arg is sparse[0])]
+            if sparse or sum(not factor.is_constant for factor in factors) > 1:
+                sparse = sparse[0] if sparse else None
+                return self._compile_contraction(op, variables, factors, agg_scope, sparse)
+            body = factors[0]
+            for factor in factors[1:]:
+                kind = 'real' if 'real' in (body.kind, factor.kind) else 'int'
+                body = self._elementwise('multiply', [body, factor], kind, dtype=True)
+        else:
+            body = self.compile_expression(body, agg_scope)
+
+        missing = [var for var in variables if var not in body.axes]
+        if missing:
+            axes = body.axes + tuple(missing)
+            dims = body.dims + tuple(self._type_size(agg_scope[var]) for var in missing)
+            aligned = self._align(body, axes, dims)
+            code = 'np.broadcast_to({}, {})'.format(aligned.code, _shape_code(body.batched, dims))
+            body = Value(code, axes, dims, body.batched, body.kind, aligned.base)
+
+        axis = tuple(1 + body.axes.index(var) for var in variables)
+        axes = tuple(a for a in body.axes if a not in variables)
+        dims = tuple(d for a, d in zip(body.axes, body.dims) if a not in variables)
+
+        if op in ('sum', 'prod'):
+            kind = 'int' if body.kind == 'bool' else body.kind
+        elif op == 'avg':
+            kind = 'real'
+        elif op in ('forall', 'exists'):
+            kind = 'bool'
+        else:
+            kind = body.kind
+
+        out = self._new_value(axes, dims, body.batched, kind)
+        attrs = {'func': AGGREGATION_REDUCTIONS[op], 'axis': axis}
+        if op in ('sum', 'prod', 'avg'):
+            attrs['dtype'] = kind
+        self.instrs.append(Instr(out, 'reduce', [body], attrs))
+        return out
+
+    def _compile_contraction(self,
+            op: str,
+            variables: List[str],
+            factors: List[Value],
+            scope: Scope,
+            sparse: Optional[Expression] = None) -> Value:
+        '''Compiles the sum or average of a product of `factors` into an einsum.
+
+        The summed `variables` are contracted without materializing the
+        broadcast product, which turns matrix-vector aggregations into BLAS
+        calls when the contraction is large enough to amortize the search
+        for an optimized contraction path.
+
+        If a `sparse` non-fluent factor is given, the other factors are
+        gathered at its non-zero entries and contracted over them, and the
+        per-entry terms are then summed into the output axes it carries.
+        '''
+        tensors = [factor for factor in factors if not factor.is_constant]
+        scale = 1
+        for factor in factors:
+            if factor.is_constant:
+                scale *= factor.value
+
+        axes, dims = self._union_axes(tensors)
+        covered = set(axes)
+        if sparse is not None:
+            sparse_code, tensors, sparse_axes, kept = self._gather_sparse(sparse, variables, tensors, scope)
+            axes, dims = self._union_axes(tensors)
+            covered |= set(sparse_axes)
+        for var in variables:
+            if var not in covered:
+                scale *= self._type_size(scope[var])
+        summed = set(variables)
+        if sparse is not None and not kept:
+            summed.add('$nnz')
+        if len(axes) > len(EINSUM_LETTERS):
+            raise NotImplementedError('Too many typed variables in aggregation: {}'.format(axes))
+        letters = dict(zip(axes, EINSUM_LETTERS))
+
+        inputs = ['...' + ''.join(letters[axis] for axis in tensor.axes) for tensor in tensors]
+        out_axes = tuple(axis for axis in axes if axis not in summed)
+        out_dims = tuple(dim for axis, dim in zip(axes, dims) if axis not in summed)
+        subscripts = '{}->...{}'.format(','.join(inputs), ''.join(letters[axis] for axis in out_axes))
+
+        kinds = {tensor.kind for tensor in tensors}
+        kind = 'real' if 'real' in kinds or isinstance(scale, float) else 'int'
+        batched = any(tensor.batched for tensor in tensors)
+        work = int(np.prod(dims))
+        if batched:
+            optimize = 'batch_size * {} >= {}'.format(work, EINSUM_OPTIMIZE_SIZE)
+        else:
+            optimize = str(work >= EINSUM_OPTIMIZE_SIZE)
+
+        out = self._new_value(out_axes, out_dims, batched, kind)
+        attrs = {'subscripts': subscripts, 'dtype': kind, 'optimize': optimize}
+        self.instrs.append(Instr(out, 'einsum', tensors, attrs))
+
+        if sparse is not None and kept:
+            terms = out
+            axes = kept + terms.axes[1:]
+            dims = tuple(self._type_size(scope[var]) for var in kept) + terms.dims[1:]
+            out = self._new_value(axes, dims, batched, kind)
+            self.instrs.append(Instr(out, 'segment_sum', [terms], {'tensor': sparse_code}))
+
+        if op == 'avg':
+            count = int(np.prod([self._type_size(scope[var]) for var in variables]))
+            return self._elementwise('multiply', [out, Value.constant(scale / count)], 'real', dtype=True)
+        if scale != 1:
+            return self._elementwise('multiply', [out, Value.constant(scale)], kind, dtype=True)
+        return out
+
+    def _compile_sparse_quantifier(self,
+            op: str,
+            variables: List[str],
+            body: Expression,
+            scope: Scope) -> Optional[Value]:
+        '''Compiles a quantifier gated by a sparse non-fluent into a segment reduction.
+
+        The bodies `M ^ A` of `exists` and `M ^ A => C` of `forall`, where
+        the conjunct M is a sparse non-fluent carrying all quantified
+        variables, are only true, respectively only need to be checked, at
+        the stored entries of M. The other operands are gathered at those
+        entries, and the per-entry terms are reduced into the output axes
+        M carries, without materializing M.
+
+        Returns:
+            The Value of the quantifier, or None if `body` is not gated by
+            a sparse non-fluent.
+        '''
+        if op == 'exists':
+            antecedent, consequent = body, None
+        elif body.etype == ('boolean', '=>'):
+            antecedent, consequent = body.args
+        else:
+            return None
+        conjuncts = self._conjuncts(antecedent)
+        masks = [arg for arg in conjuncts if self._is_sparse_factor(arg) and set(variables) <= set(arg.args[1])]
+        if not masks:
+            return None
+        mask = masks[0]
+
+        operands = [self.compile_expression(arg, scope) for arg in conjuncts if arg is not mask]
+        if consequent is not None:
+            operands.append(self.compile_expression(consequent, scope))
+        tensor, operands, _, kept = self._gather_sparse(mask, variables, operands, scope)
+        values, operands = operands[0], operands[1:]
+
+        term = self._elementwise('not_equal', [values, Value.constant(0)], 'bool')
+        conditions = operands[:-1] if consequent is not None else operands
+        for operand in conditions:
+            term = self._elementwise('logical_and', [term, operand], 'bool')
+        if consequent is not None:
+            term = self._elementwise('logical_not', [term], 'bool')
+            term = self._elementwise('logical_or', [term, operands[-1]], 'bool')
+
+        rest = tuple(axis for axis in term.axes if axis != '$nnz')
+        axes = ('$nnz',) + rest
+        dims = tuple(term.dims[term.axes.index(axis)] for axis in axes)
+        term = self._align(term, axes, dims)
+        out_dims = tuple(self._type_size(scope[var]) for var in kept) + dims[1:]
+        out = self._new_value(kept + rest, out_dims, term.batched, 'bool')
+        self.instrs.append(Instr(out, 'segment_' + AGGREGATION_REDUCTIONS[op], [term], {'tensor': tensor}))
+        return out
+
+    @classmethod
+    def _conjuncts(cls, expr: Expression) -> List[Expression]:
+        '''Returns the conjuncts of `expr`, or [expr] if it is not a conjunction.'''
+        if expr.etype not in (('boolean', '^'), ('boolean', '&')):
+            return [expr]
+        conjuncts = []
+        for arg in expr.args:
+            conjuncts += cls._conjuncts(arg)
+        return conjuncts
+
+    def _is_sparse_factor(self, expr: Expression) -> bool:
+        '''Returns True if `expr` is a sparse non-fluent indexed by distinct variables.'''
+        if expr.etype[0] != 'pvar' or expr.name not in self.sparse:
+            return False
+        _, params = expr.args
+        params = params if params is not None else []
+        return all(isinstance(param, str) for param in params) and len(set(params)) == len(params)
+
+    def _gather_sparse(self,
+            expr: Expression,
+            variables: List[str],
+            tensors: List[Value],
+            scope: Scope) -> Tuple[str, List[Value], Axes, Axes]:
+        '''Returns the operands of a contraction over the entries of a sparse non-fluent.
+
+        Args:
+            expr: The sparse non-fluent factor.
+            variables: The summed variables.
+            tensors: The dense factors.
+            scope: The aggregation scope.
+
+        Returns:
+            The source code of the sorted SparseTensor, the operands indexed
+            by its entries, its axes and the output axes it carries.
+        '''
+        name = expr.name
+        _, params = expr.args
+        sparse_axes = tuple(params)
+        kept = tuple(axis for axis in sparse_axes if axis not in variables)
+        tensor = "_NF['{}'].sorted_by({})".format(name, tuple(sparse_axes.index(axis) for axis in kept))
+        nnz = self.sparse[name]
+
+        pvar = self._pvariable(name)
+        values = Value('{}.values'.format(tensor), ('$nnz',), (nnz,), False, self._range_kind(pvar))
+        operands = [values]
+        for value in tensors:
+            shared = [axis for axis in value.axes if axis in sparse_axes]
+            if not shared:
+                operands.append(value)
+                continue
+            rest = [axis for axis in value.axes if axis not in sparse_axes]
+            perm = [0] + [1 + value.axes.index(axis) for axis in shared + rest]
+            code = value.code
+            if perm != sorted(perm):
+                code = 'np.transpose({}, {})'.format(code, tuple(perm))
+            index = ['{}.coords[{}]'.format(tensor, sparse_axes.index(axis)) for axis in shared]
+            code = '{}[:, {}]'.format(code, ', '.join(index))
+            rest_dims = tuple(value.dims[value.axes.index(axis)] for axis in rest)
+            operands.append(value.view(code, ('$nnz',) + tuple(rest), (nnz,) + rest_dims))
+
+        return tensor, operands, sparse_axes, kept
+
+    @classmethod
+    def _product_factors(cls, expr: Expression) -> List[Expression]:
+        '''Returns the factors of `expr` if it is a product, or an empty list.'''
+        if expr.etype != ('arithmetic', '*') or len(expr.args) != 2:
+            return []
+        factors = []
+        for arg in expr.args:
+            factors += cls._product_factors(arg) or [arg]
+        return factors
+
+    def _compile_if(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles an if-then-else expression into a selection.'''
+        args = [self.compile_expression(arg, scope) for arg in expr.args]
+        kinds = {args[1].kind, args[2].kind}
+        kind = 'real' if 'real' in kinds else 'int' if 'int' in kinds else 'bool'
+        if all(arg.is_constant for arg in args):
+            return Value.constant(args[1].value if args[0].value else args[2].value)
+        axes, dims = self._union_axes(args)
+        batched = any(arg.batched for arg in args)
+        operands = [self._align(arg, axes, dims) for arg in args]
+        out = self._new_value(axes, dims, batched, kind)
+        self.instrs.append(Instr(out, 'where', operands, {'dtype': kind}))
+        return out
+
+    def _compile_random_variable(self, expr: Expression, scope: Scope) -> Value:
+        '''Compiles a random variable into a batched sampling instruction.'''
+        dist = expr.etype[1]
+        args = [self.compile_expression(arg, scope) for arg in expr.args]
+        if dist in ('KronDelta', 'DiracDelta'):
+            return args[0]
+        if dist not in RANDOM_KINDS:
+            raise NotImplementedError('Distribution not supported: {}'.format(dist))
+        axes, dims = self._union_axes(args)
+        operands = [self._align(arg, axes, dims) for arg in args]
+        out = self._new_value(axes, dims, True, RANDOM_KINDS[dist])
+        attrs = {'dist': dist, 'size': _shape_code(True, dims)}
+        self.instrs.append(Instr(out, 'random', operands, attrs))
+        return out
+
+    def _elementwise(self, ufunc: str, args: List[Value], kind: str, dtype: bool = False) -> Value:
+        '''Compiles the elementwise application of `ufunc` to `args`.'''
+        if all(arg.is_constant for arg in args):
+            kwargs = { 'dtype': NUMPY_DTYPES[kind] } if dtype else {}
+            return Value.constant(getattr(np, ufunc)(*[arg.value for arg in args], **kwargs).item())
+        axes, dims = self._union_axes(args)
+        batched = any(arg.batched for arg in args)
+        operands = [self._align(arg, axes, dims) for arg in args]
+        out = self._new_value(axes, dims, batched, kind)
+        attrs = {'ufunc': ufunc, 'dtype': kind if dtype else None}
+        self.instrs.append(Instr(out, 'ufunc', operands, attrs))
+        return out
+
+    def _union_axes(self, args: Sequence[Value]) -> Tuple[Axes, Tuple[int, ...]]:
+        '''Returns the union of the axes of `args` in order of appearance.'''
+        axes, dims = [], []
+        for arg in args:
+            for axis, dim in zip(arg.axes, arg.dims):
+                if axis not in axes:
+                    axes.append(axis)
+                    dims.append(dim)
+        return tuple(axes), tuple(dims)
+
+    def _align(self, value: Value, axes: Axes, dims: Tuple[int, ...]) -> Value:
+        '''Returns a view of `value` broadcastable against the given `axes`.'''
+        if value.is_constant or value.axes == axes:
+            return value
+        present = [axis for axis in axes if axis in value.axes]
+        perm = [0] + [1 + value.axes.index(axis) for axis in present]
+        code = value.code
+        if perm != sorted(perm):
+            code = 'np.transpose({}, {})'.format(code, tuple(perm))
+        if len(present) < len(axes):
+            index = [':'] + [':' if axis in value.axes else 'None' for axis in axes]
+            code = '{}[{}]'.format(code, ', '.join(index))
+        new_dims = tuple(d if a in value.axes else 1 for a, d in zip(axes, dims))
+        return value.view(code, axes, new_dims)
+
+    def _type_size(self, ptype: str) -> int:
+        '''Returns the number of objects of type `ptype`.'''
+        if ptype not in self.rddl.object_table:
+            raise ValueError('Type {} is not an object type.'.format(ptype))
+        return self.rddl.object_table[ptype]['size']
+
+    def _object_index(self, ptype: str, obj: str) -> int:
+        '''Returns the index of object `obj` of type `ptype`.'''
+        idx = self.rddl.object_table[ptype]['idx']
+        if obj not in idx:
+            raise ValueError('Object {} is not of type {}.'.format(obj, ptype))
+        return idx[obj]
+
+    @classmethod
+    def _range_kind(cls, pvar) -> str:
+        '''Returns the range kind of `pvar`.'''
+        if pvar.range not in DTYPES:
+            raise ValueError('Range {} of {} not supported.'.format(pvar.range, pvar))
+        return pvar.range
+
+    def generate_step(self) -> str:
+        '''Returns the source code of the step function module.
+
+        The module defines `step(state, action, rng)`, which evaluates all
+        intermediate CPFs in level order, all state CPFs and the reward,
+        and returns the tuple (interms, next_state, reward). It also defines
+        `make_step(batch_size, views=None)`, which returns an equivalent step
+        function evaluating into a preallocated buffer arena, optionally
+        writing intermediate and next state fluents into caller-owned views.
+
+        The module also defines `reward(state, action, rng)`, which only
+        evaluates the CPFs in the dependency cone of the reward, and returns
+        the reward. Random CPFs outside the cone draw no samples from `rng`.
+        '''
+        interms, next_state, reward = self._compile_step()
+        results = (dict(interms), dict(next_state), reward)
+
+        lines = self._module_header()
+        lines.append('def step(state, action, rng):')
+        lines += self._function_body()
+        lines.append('    return {}'.format(_results_code(results)))
+        lines += ['', '']
+        lines += self._arena_function('make_step', 'step', '(state, action, rng)', results)
+        lines += ['', '']
+
+        _, _, reward = self._compile_step(self.rddl.dependency_graph.ancestors(REWARD))
+        lines.append('def reward(state, action, rng):')
+        lines += self._function_body()
+        lines.append('    return {}'.format(reward.code))
+        return '\n'.join(lines) + '\n'
+
+    def generate_cpfs(self) -> str:
+        '''Returns the source code of a module with one function per CPF.
+
+        The module defines `cpf_<k>(fluents, rng)` for each intermediate
+        and state CPF and `reward(fluents, rng)`. Each function reads its
+        inputs from the dict `fluents`, keyed by fluent name (primed for
+        next state fluents), and returns its full fluent tensor, so that
+        CPFs can be evaluated in any order consistent with their data
+        dependencies. The dict `CPFS` maps each CPF name to its function.
+        '''
+        domain = self.rddl.domain
+        cpfs = [(cpf, domain.intermediate_fluents[cpf.name]) for cpf in domain.intermediate_cpfs]
+        for cpf in domain.state_cpfs:
+            cpfs.append((cpf, domain.state_fluents[utils.rename_next_state_fluent(cpf.name)]))
+
+        lines = self._module_header()
+        functions = []
+        for k, (cpf, pvar) in enumerate(cpfs):
+            self._declare_cpf_inputs()
+            value = self.compile_cpf(cpf, pvar)
+            functions.append((cpf.name, 'cpf_{}'.format(k)))
+            lines.append('def cpf_{}(fluents, rng):'.format(k))
+            lines += self._function_body('fluents')
+            lines.append('    return {}'.format(value.code))
+            lines += ['', '']
+
+        self._declare_cpf_inputs()
+        reward = self.compile_expression(domain.reward, {})
+        reward = self.materialize(reward, (), (), 'real')
+        lines.append('def reward(fluents, rng):')
+        lines += self._function_body('fluents')
+        lines.append('    return {}'.format(reward.code))
+        lines += ['', '']
+
+        lines.append('CPFS = {')
+        lines += ['    {!r}: {},'.format(name, function) for name, function in functions]
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def generate_constraints(self, constraints: Sequence[Expression]) -> str:
+        '''Returns the source code of a module with one function per boolean constraint.
+
+        The module defines `constraint_<k>(fluents)` for the k-th expression
+        in `constraints`. Each function reads non-fluents from the bound
+        tensors and state and action fluents from the dict `fluents`, and
+        returns a boolean tensor of shape (batch_size,). The list
+        `CONSTRAINTS` holds the functions in order.
+        '''
+        items = [(expr, {}, (), 'bool') for expr in constraints]
+        return self._generate_functions('constraint', 'CONSTRAINTS', items)
+
+    def generate_tensors(self, items: Sequence[Tuple[Expression, Scope, Axes, str]]) -> str:
+        '''Returns the source code of a module with one function per tensor expression.
+
+        The module defines `tensor_<k>(fluents)` for the k-th item
+        (expr, scope, axes, kind) of `items`, which returns the batched
+        tensor of `expr` with exactly the given `axes`, typed by `scope`,
+        and range `kind`. Inputs are read as in :meth:`generate_constraints`.
+        The list `TENSORS` holds the functions in order.
+        '''
+        return self._generate_functions('tensor', 'TENSORS', items)
+
+    def _generate_functions(self, prefix: str, table: str, items) -> str:
+        '''Returns the source code of a module with one function per (expr, scope, axes, kind) item.'''
+        lines = self._module_header()
+        for k, (expr, scope, axes, kind) in enumerate(items):
+            self.reset()
+            self._declare_inputs('fluents', 'fluents')
+            dims = tuple(self._type_size(scope[axis]) for axis in axes)
+            value = self.compile_expression(expr, scope)
+            value = self.materialize(value, tuple(axes), dims, kind)
+            lines.append('def {}_{}(fluents):'.format(prefix, k))
+            lines += self._function_body('fluents', self._operand_batch_size('fluents'))
+            lines.append('    return {}'.format(value.code))
+            lines += ['', '']
+
+        lines.append('{} = [{}]'.format(table, ', '.join('{}_{}'.format(prefix, k) for k in range(len(items)))))
+        return '\n'.join(lines) + '\n'
+
+    def _declare_cpf_inputs(self) -> None:
+        '''Starts a CPF function reading every fluent from the dict `fluents`.'''
+        domain = self.rddl.domain
+        self.reset()
+        self._declare_inputs('fluents', 'fluents')
+        for cpf in domain.intermediate_cpfs + domain.state_cpfs:
+            self.add_source(cpf.name, 'fluents[{!r}]'.format(cpf.name), True)
+
+    def _compile_step(self, cone: Optional[Set[str]] = None) -> Tuple[List[Tuple[str, Value]], List[Tuple[str, Value]], Value]:
+        '''Compiles the CPFs and the reward into the current function body.
+
+        Args:
+            cone: The names of the CPFs to compile. Defaults to all CPFs.
+        '''
+        domain = self.rddl.domain
+        self.reset()
+        self._declare_inputs()
+
+        interms = []
+        for cpf in domain.intermediate_cpfs:
+            if cone is not None and cpf.name not in cone:
+                continue
+            pvar = domain.intermediate_fluents[cpf.name]
+            value = self.compile_cpf(cpf, pvar)
+            self.add_fluent(cpf.name, value)
+            interms.append((cpf.name, value))
+
+        next_state = []
+        for cpf in domain.state_cpfs:
+            if cone is not None and cpf.name not in cone:
+                continue
+            name = utils.rename_next_state_fluent(cpf.name)
+            pvar = domain.state_fluents[name]
+            value = self.compile_cpf(cpf, pvar)
+            self.add_fluent(cpf.name, value)
+            next_state.append((name, value))
+
+        reward = self.compile_expression(domain.reward, {})
+        reward = self.materialize(reward, (), (), 'real')
+        return interms, next_state, reward
+
+    def _declare_inputs(self, state: str = 'state', action: str = 'action') -> None:
+        '''Declares non-fluent, state and action tensors as inputs.
+
+        Args:
+            state: Name of the dict of state tensors in the generated code.
+            action: Name of the dict of action tensors in the generated code.
+        '''
+        domain = self.rddl.domain
+        for name in domain.non_fluent_ordering:
+            if name in self.sparse:
+                self.add_source(name, "_NF['{}'].todense()".format(name), False)
+            else:
+                self.add_source(name, "_NF['{}']".format(name), False)
+        for name in domain.state_fluent_ordering:
+            self.add_source(name, "{}['{}']".format(state, name), True)
+        for name in domain.action_fluent_ordering:
+            self.add_source(name, "{}['{}']".format(action, name), True)
+
+    def _module_header(self) -> List[str]:
+        '''Returns the header lines of a generated module.'''
+        domain = self.rddl.domain
+        instance = self.rddl.instance
+        return [
+            "'''Generated by pyrddl.codegen for domain `{}` and instance `{}`. Do not edit.'''".format(domain.name, instance.name),
+            '',
+            'import numpy as np',
+            '',
+            'from pyrddl import sparse',
+            '',
+            '_NF = {}',
+            '',
+            '',
+            'def bind(non_fluents):',
+            '    _NF.clear()',
+            '    _NF.update(non_fluents)',
+            '',
+            ''
+        ]
+
+    def _function_body(self, state: str = 'state', batch_size: Optional[str] = None) -> List[str]:
+        '''Returns the indented lines of the current function body.
+
+        Args:
+            state: Name of the dict of state tensors in the generated code.
+            batch_size: The code of the batch size. Defaults to the leading
+                dimension of the first state fluent.
+        '''
+        if batch_size is None:
+            first = self.rddl.domain.state_fluent_ordering[0]
+            batch_size = "{}['{}'].shape[0]".format(state, first)
+        lines = ['    batch_size = {}'.format(batch_size)]
+        lines += ['    {}'.format(emit_instr(instr)) for instr in self.instrs]
+        return lines
+
+    def _operand_batch_size(self, fluents: str) -> str:
+        '''Returns the code of the largest leading dimension of the batched inputs read by the current function body.
+
+        Functions reading no batched input fall back to the largest leading
+        dimension of all tensors of the dict `fluents`.
+        '''
+        loads = [instr.attrs['code'] for instr in self.instrs if instr.op == 'load' and instr.out.batched]
+        if not loads:
+            return 'max((np.shape(tensor)[0] for tensor in {}.values()), default=0)'.format(fluents)
+        if len(loads) == 1:
+            return '{}.shape[0]'.format(loads[0])
+        return 'max({})'.format(', '.join('{}.shape[0]'.format(code) for code in loads))
+
+    def _arena_function(self,
+            factory: str,
+            name: str,
+            signature: str,
+            results: Tuple) -> List[str]:
+        '''Returns the lines of a factory of arena-backed functions.
+
+        The factory preallocates one buffer per live temporary of the current
+        function body, reusing buffers whose lifetimes do not overlap, and two
+        alternating sets of output buffers, so that the returned arrays stay
+        valid until the call after next. Elementwise subtrees are fused and
+        evaluated in cache-sized tiles of the batch.
+
+        The factory optionally takes a pair of dicts `views`, one per output
+        set, mapping fluent names of the results to caller-owned arrays of
+        the fluent's batched shape and dtype (e.g. views into a
+        :class:`pyrddl.layout.FluentLayout` buffer), which are used as
+        output buffers in place of new arrays. Outputs shared by several
+        fluents, or written by operations requiring contiguous arrays, are
+        copied into their views instead.
+        '''
+        outputs = _flatten_results(results)
+        instrs = fuse_elementwise(self.instrs, outputs)
+        plan = plan_buffers(instrs, outputs)
+
+        contiguous = set(plan.assignment[instr.out.code] for instr in instrs if _needs_contiguous_output(instr))
+        owners, shared = {}, []
+        for path, fluent, value in _named_results(results):
+            buf = plan.assignment[value.code]
+            if buf in owners or buf in contiguous:
+                shared.append((path, fluent, buf))
+            else:
+                owners[buf] = fluent
+
+        lines = ['def {}(batch_size, views=None):'.format(factory)]
+        for buf, shape, kind in plan.buffers:
+            lines.append('    {} = np.empty({}, dtype={})'.format(buf, shape, DTYPES[kind]))
+
+        def output_code(buf, shape, kind):
+            array = 'np.empty({}, dtype={})'.format(shape, DTYPES[kind])
+            if buf not in owners:
+                return array
+            return "out['{0}'] if '{0}' in out else {1}".format(owners[buf], array)
+
+        names = ', '.join(buf for buf, _, _ in plan.outputs) + ','
+        lines.append('    outputs = []')
+        lines.append('    for k in range(2):')
+        lines.append('        out = views[k] if views is not None else {}')
+        lines.append('        buffers = ({})'.format(', '.join(output_code(*output) for output in plan.outputs) + ','))
+        lines.append('        {} = buffers'.format(names))
+        lines.append('        results = {}'.format(_results_code(results, plan.assignment)))
+        lines.append('        copies = []')
+        for path, fluent, buf in shared:
+            lines.append("        if '{}' in out:".format(fluent))
+            lines.append("            copies.append((out['{}'], {}))".format(fluent, buf))
+            lines.append("            {}['{}'] = out['{}']".format(path, fluent, fluent))
+        lines.append('        outputs.append((buffers, results, copies))')
+        lines.append('    cursor = [0]')
+        lines.append('')
+        lines.append('    def {}{}:'.format(name, signature))
+        lines.append('        ({}), results, copies = outputs[cursor[0]]'.format(names))
+        lines.append('        cursor[0] ^= 1')
+        for instr in instrs:
+            for line in emit_instr_inplace(instr, plan):
+                lines.append('        {}'.format(line))
+        if shared:
+            lines.append('        for dst, src in copies:')
+            lines.append('            np.copyto(dst, src)')
+        lines.append('        return results')
+        lines.append('')
+        lines.append('    return {}'.format(name))
+        return lines
+
+
+class BufferPlan(object):
+    '''Assignment of temporaries to the buffers of an arena.
+
+    Args:
+        assignment: Mapping from temporary to buffer name.
+        scratch: Mapping from temporary to its scratch buffer name.
+        buffers: List of (name, shape, kind) of the shared buffers.
+        outputs: List of (name, shape, kind) of the output buffers.
+    '''
+
+    def __init__(self,
+            assignment: Dict[str, str],
+            scratch: Dict[str, str],
+            buffers: List[Tuple[str, str, str]],
+            outputs: List[Tuple[str, str, str]]) -> None:
+        self.assignment = assignment
+        self.scratch = scratch
+        self.buffers = buffers
+        self.outputs = outputs
+
+
+SCRATCH_DISTRIBUTIONS = {'Bernoulli', 'Normal', 'Uniform', 'Weibull'}
+
+
+def plan_buffers(instrs: Sequence[Instr], outputs: Sequence[Value]) -> BufferPlan:
+    '''Plans buffer lifetimes over the straight-line `instrs`.
+
+    Each temporary is assigned a buffer of its shape and kind when defined.
+    Its buffer returns to a free list after the last instruction reading it
+    (directly or through a view), and is reused by later temporaries.
+    Temporaries in `outputs` get dedicated output buffers.
+
+    Returns:
+        The BufferPlan of the instructions.
+    '''
+    last_use = {}
+    for i, instr in enumerate(instrs):
+        for arg in instr.args:
+            if arg.base is not None:
+                last_use[arg.base] = i
+
+    output_names = []
+    for value in outputs:
+        if value.code not in output_names:
+            output_names.append(value.code)
+
+    assignment, scratch = {}, {}
+    buffers, output_buffers = [], []
+    free, tiles = {}, {}
+
+    def allocate(shape, kind):
+        key = (shape, kind)
+        if free.get(key):
+            return free[key].pop()
+        buf = 'b{}'.format(sum(1 for name, _, _ in buffers if name[0] == 'b'))
+        buffers.append((buf, shape, kind))
+        return buf
+
+    def release(temp):
+        if temp in assignment and temp not in output_names:
+            shape, kind = shapes[temp]
+            free.setdefault((shape, kind), []).append(assignment[temp])
+
+    shapes = {}
+    for i, instr in enumerate(instrs):
+        if instr.op == 'load':
+            continue
+        out = instr.out
+        shape = _shape_code(out.batched, out.dims)
+        shapes[out.code] = (shape, out.kind)
+        if out.code in output_names:
+            buf = 'o{}'.format(output_names.index(out.code))
+            output_buffers.append((buf, shape, out.kind))
+        else:
+            buf = allocate(shape, out.kind)
+        assignment[out.code] = buf
+
+        if instr.op == 'fused':
+            counts = {}
+            for member in instr.attrs['instrs'][:-1]:
+                key = (_tile_shape_code(instr.attrs['rows'], member.out.dims), member.out.kind)
+                k = counts[key] = counts.get(key, 0) + 1
+                pool = tiles.setdefault(key, [])
+                if k > len(pool):
+                    pool.append('s{}'.format(sum(len(names) for names in tiles.values())))
+                    buffers.append((pool[-1], key[0], key[1]))
+                assignment[member.out.code] = pool[k - 1]
+
+        if instr.op == 'random' and instr.attrs['dist'] in SCRATCH_DISTRIBUTIONS:
+            scratch[out.code] = allocate(shape, 'real')
+            free.setdefault((shape, 'real'), []).append(scratch[out.code])
+
+        for arg in set(arg.base for arg in instr.args):
+            if last_use.get(arg) == i:
+                release(arg)
+        if out.code not in last_use:
+            release(out.code)
+
+    output_buffers = sorted(output_buffers, key=lambda b: int(b[0][1:]))
+    return BufferPlan(assignment, scratch, buffers, output_buffers)
+
+
+FUSIBLE_OPS = {'ufunc', 'where', 'reduce'}
+
+TILE_BYTES = 1 << 16
+
+
+def fuse_elementwise(instrs: Sequence[Instr], outputs: Sequence[Value]) -> List[Instr]:
+    '''Groups maximal elementwise subtrees of `instrs` into fused instructions.
+
+    Reductions over typed variables act row-wise on the batch and are fused
+    as well. A batched temporary read by a single fusible instruction, and
+    not in `outputs`, is internal to the subtree of its reader. Each
+    subtree with internal temporaries becomes one 'fused' instruction, which
+    is evaluated over tiles of the batch small enough to stay in cache, so
+    that internal temporaries never materialize over the whole batch.
+
+    Returns:
+        The new list of instructions.
+    '''
+    output_names = {value.code for value in outputs}
+
+    def is_fusible(instr):
+        return instr.op in FUSIBLE_OPS and instr.out.batched
+
+    readers = {}
+    for i, instr in enumerate(instrs):
+        for base in set(arg.base for arg in instr.args):
+            readers.setdefault(base, []).append(i)
+
+    producer = {}
+    internal = set()
+    for i, instr in enumerate(instrs):
+        name = instr.out.code
+        producer[name] = i
+        users = readers.get(name, [])
+        if is_fusible(instr) and name not in output_names and len(users) == 1 and is_fusible(instrs[users[0]]):
+            internal.add(name)
+
+    groups = {}
+    for i, instr in enumerate(instrs):
+        if not is_fusible(instr) or instr.out.code in internal:
+            continue
+        members, stack = set(), [i]
+        while stack:
+            j = stack.pop()
+            members.add(j)
+            stack.extend(producer[arg.base] for arg in instrs[j].args if arg.base in internal)
+        if len(members) > 1:
+            groups[i] = sorted(members)
+
+    absorbed = set(j for members in groups.values() for j in members)
+    fused = []
+    for i, instr in enumerate(instrs):
+        if i in groups:
+            members = [instrs[j] for j in groups[i]]
+            names = set(member.out.code for member in members)
+            args = {}
+            for member in members:
+                for arg in member.args:
+                    if arg.base is not None and arg.base not in names:
+                        args.setdefault(arg.base, arg)
+            row = max(int(np.prod(member.out.dims)) for member in members)
+            rows = max(1, TILE_BYTES // (8 * row))
+            attrs = {'instrs': members, 'rows': rows}
+            fused.append(Instr(instr.out, 'fused', list(args.values()), attrs))
+        elif i not in absorbed:
+            fused.append(instr)
+    return fused
+
+
+def emit_instr(instr: Instr) -> str:
+    '''Returns the Python statement implementing `instr`.'''
+    out = instr.out.code
+    args = [arg.code for arg in instr.args]
+    attrs = instr.attrs
+
+    if instr.op == 'load':
+        return '{} = {}'.format(out, attrs['code'])
+
+    if instr.op == 'ufunc':
+        if attrs.get('dtype') is not None:
+            args.append('dtype={}'.format(DTYPES[attrs['dtype']]))
+        return '{} = np.{}({})'.format(out, attrs['ufunc'], ', '.join(args))
+
+    if instr.op == 'reduce':
+        kwargs = ['axis={}'.format(attrs['axis'])]
+        if attrs.get('dtype') is not None:
+            kwargs.append('dtype={}'.format(DTYPES[attrs['dtype']]))
+        return '{} = np.{}({}, {})'.format(out, attrs['func'], args[0], ', '.join(kwargs))
+
+    if instr.op == 'where':
+        return '{} = np.where({}, {}, {})'.format(out, *args)
+
+    if instr.op == 'einsum':
+        return '{} = {}'.format(out, _einsum_code(instr, args))
+
+    if instr.op in SEGMENT_OPS:
+        return '{} = sparse.{}({}, {})'.format(out, instr.op, args[0], attrs['tensor'])
+
+    if instr.op == 'output':
+        return '{} = np.broadcast_to({}, {}).astype({})'.format(
+            out, args[0], attrs['shape'], DTYPES[attrs['dtype']])
+
+    if instr.op == 'random':
+        dist, size = attrs['dist'], attrs['size']
+        if dist == 'Bernoulli':
+            return '{} = rng.random(size={}) < {}'.format(out, size, args[0])
+        if dist == 'Normal':
+            return '{} = rng.standard_normal(size={}) * np.sqrt({}) + {}'.format(out, size, args[1], args[0])
+        if dist == 'Uniform':
+            return '{} = rng.random(size={}) * ({} - {}) + {}'.format(out, size, args[1], args[0], args[0])
+        if dist == 'Gamma':
+            return '{} = rng.standard_gamma({}, size={}) * {}'.format(out, args[0], size, args[1])
+        if dist == 'Exponential':
+            return '{} = rng.standard_exponential(size={}) / {}'.format(out, size, args[0])
+        if dist == 'Poisson':
+            return '{} = rng.poisson({}, size={})'.format(out, args[0], size)
+        if dist == 'Weibull':
+            return '{} = rng.standard_exponential(size={}) ** (1.0 / {}) * {}'.format(out, size, args[0], args[1])
+
+    raise ValueError('Unknown instruction: {}'.format(instr.op))
+
+
+def emit_instr_inplace(instr: Instr, plan: BufferPlan) -> List[str]:
+    '''Returns the Python statements implementing `instr` into its arena buffer.
+
+    The statements draw random numbers in the same order as :func:`emit_instr`,
+    so both implementations produce the same values for the same generator.
+    '''
+    if instr.op == 'load':
+        return [emit_instr(instr)]
+
+    out = instr.out.code
+    buf = plan.assignment[out]
+    args = [arg.code for arg in instr.args]
+    attrs = instr.attrs
+
+    if instr.op == 'ufunc':
+        return ['{} = {}'.format(out, _ufunc_code(instr, args, buf))]
+
+    if instr.op == 'fused':
+        rows = attrs['rows']
+        members = attrs['instrs']
+        names = set(member.out.code for member in members)
+
+        def body(tiled):
+            lines = []
+            for member in members:
+                if tiled:
+                    args = [_tile_code(arg, names) for arg in member.args]
+                    target = '{}[i:i + n]' if member is members[-1] else '{}[:n]'
+                else:
+                    args = [arg.code for arg in member.args]
+                    target = '{}'
+                target = target.format(buf if member is members[-1] else plan.assignment[member.out.code])
+                if member.op == 'ufunc':
+                    lines.append('{} = {}'.format(member.out.code, _ufunc_code(member, args, target)))
+                elif member.op == 'reduce':
+                    lines.append('{} = {}'.format(member.out.code, _reduce_code(member, args[0], target)))
+                else:
+                    lines.append("np.copyto({}, {}, casting='unsafe')".format(target, args[2]))
+                    lines.append("np.copyto({}, {}, casting='unsafe', where={})".format(target, args[1], args[0]))
+                    lines.append('{} = {}'.format(member.out.code, target))
+            return ['    ' + line for line in lines]
+
+        lines = ['if batch_size > {}:'.format(rows)]
+        lines.append('    for i in range(0, batch_size, {}):'.format(rows))
+        lines.append('        n = min({}, batch_size - i)'.format(rows))
+        lines += ['    ' + line for line in body(True)]
+        lines.append('else:')
+        lines += body(False)
+        lines.append('{} = {}'.format(out, buf))
+        return lines
+
+    if instr.op == 'einsum':
+        return ['{} = {}'.format(out, _einsum_code(instr, args, buf))]
+
+    if instr.op in SEGMENT_OPS:
+        return ['{} = sparse.{}({}, {}, out={})'.format(out, instr.op, args[0], attrs['tensor'], buf)]
+
+    if instr.op == 'reduce':
+        return ['{} = {}'.format(out, _reduce_code(instr, args[0], buf))]
+
+    if instr.op == 'where':
+        return [
+            "np.copyto({}, {}, casting='unsafe')".format(buf, args[2]),
+            "np.copyto({}, {}, casting='unsafe', where={})".format(buf, args[1], args[0]),
+            '{} = {}'.format(out, buf)
+        ]
+
+    if instr.op == 'output':
+        return [
+            "np.copyto({}, {}, casting='unsafe')".format(buf, args[0]),
+            '{} = {}'.format(out, buf)
+        ]
+
+    if instr.op == 'random':
+        dist, size = attrs['dist'], attrs['size']
+        tmp = plan.scratch.get(out)
+        if dist == 'Bernoulli':
+            return [
+                'rng.random(out={})'.format(tmp),
+                '{} = np.less({}, {}, out={})'.format(out, tmp, args[0], buf)
+            ]
+        if dist == 'Normal':
+            return [
+                'rng.standard_normal(out={})'.format(buf),
+                'np.sqrt({}, out={})'.format(args[1], tmp),
+                'np.multiply({}, {}, out={})'.format(buf, tmp, buf),
+                '{} = np.add({}, {}, out={})'.format(out, buf, args[0], buf)
+            ]
+        if dist == 'Uniform':
+            return [
+                'rng.random(out={})'.format(buf),
+                'np.subtract({}, {}, out={})'.format(args[1], args[0], tmp),
+                'np.multiply({}, {}, out={})'.format(buf, tmp, buf),
+                '{} = np.add({}, {}, out={})'.format(out, buf, args[0], buf)
+            ]
+        if dist == 'Gamma':
+            return [
+                'rng.standard_gamma({}, out={})'.format(args[0], buf),
+                '{} = np.multiply({}, {}, out={})'.format(out, buf, args[1], buf)
+            ]
+        if dist == 'Exponential':
+            return [
+                'rng.standard_exponential(out={})'.format(buf),
+                '{} = np.true_divide({}, {}, out={})'.format(out, buf, args[0], buf)
+            ]
+        if dist == 'Poisson':
+            return [
+                'np.copyto({}, rng.poisson({}, size={}))'.format(buf, args[0], size),
+                '{} = {}'.format(out, buf)
+            ]
+        if dist == 'Weibull':
+            return [
+                'rng.standard_exponential(out={})'.format(buf),
+                'np.true_divide(1.0, {}, out={})'.format(args[0], tmp),
+                'np.power({}, {}, out={})'.format(buf, tmp, buf),
+                '{} = np.multiply({}, {}, out={})'.format(out, buf, args[1], buf)
+            ]
+
+    raise ValueError('Unknown instruction: {}'.format(instr.op))
+
+
+CONTIGUOUS_DISTRIBUTIONS = {'Normal', 'Uniform', 'Gamma', 'Exponential', 'Weibull'}
+
+
+def _needs_contiguous_output(instr: Instr) -> bool:
+    '''Returns True if the arena implementation of `instr` requires a contiguous buffer.'''
+    if instr.op in SEGMENT_OPS:
+        return True
+    return instr.op == 'random' and instr.attrs['dist'] in CONTIGUOUS_DISTRIBUTIONS
+
+
+def fingerprint(rddl) -> str:
+    '''Returns a content hash of everything the generated code depends on.'''
+    domain = rddl.domain
+    h = hashlib.sha256()
+
+    def update(obj):
+        h.update(repr(obj).encode('utf-8'))
+        h.update(b'\0')
+
+    update(CODEGEN_VERSION)
+    update((domain.name, rddl.non_fluents.name, rddl.instance.name))
+    update(domain.types)
+    for name, otype in rddl.object_table.items():
+        update((name, otype.enum, otype.objects.tolist()))
+    for pvar in domain.pvariables:
+        update((pvar.name, pvar.fluent_type, pvar.range, pvar.param_types, pvar.default, pvar.level))
+    for cpf in domain.cpfs[1]:
+        update((cpf.pvar, str(cpf.expr)))
+    update(str(domain.reward))
+    update(getattr(rddl.non_fluents, 'init_non_fluent', []))
+    update(sorted(sparse_non_fluents(rddl).items()))
+    return h.hexdigest()[:20]
+
+
+def non_fluent_entries(rddl) -> Dict[str, Dict[Tuple[int, ...], object]]:
+    '''Returns the initialized entries of each non-fluent of `rddl` by index tuple.
+
+    Object names are converted to indices in bulk, one array per non-fluent.
+    '''
+    domain = rddl.domain
+    initializers = getattr(rddl.non_fluents, 'init_non_fluent', [])
+    groups = tensors.initializer_groups(initializers, domain.non_fluent_ordering)
+    entries = {}
+    for name, (params_list, values) in groups.items():
+        pvar = domain.non_fluents[name]
+        param_types = pvar.param_types or []
+        if param_types and params_list:
+            indices = rddl.object_table.names_to_indices(param_types, params_list)
+            entries[name] = dict(zip(map(tuple, indices.tolist()), values))
+        else:
+            entries[name] = { (): value for value in values }
+    return entries
+
+
+def sparse_non_fluents(rddl,
+        max_density: float = sparse.SPARSE_DENSITY,
+        min_size: int = sparse.SPARSE_MIN_SIZE) -> Dict[str, int]:
+    '''Returns the non-fluents of `rddl` to be stored as SparseTensors.
+
+    Args:
+        rddl: A built RDDL object.
+        max_density: Maximum fraction of non-default entries.
+        min_size: Minimum number of entries of the dense tensor.
+
+    Returns:
+        Mapping from non-fluent name to its number of non-zero entries.
+    '''
+    result = {}
+    for name, entries in non_fluent_entries(rddl).items():
+        pvar = rddl.domain.non_fluents[name]
+        size = int(np.prod(rddl._param_types_to_shape(pvar.param_types)))
+        nnz = sum(1 for value in entries.values() if value != 0)
+        if pvar.arity > 0 and sparse.is_sparse(size, nnz, pvar.default, max_density, min_size):
+            result[name] = nnz
+    return result
+
+
+def non_fluent_tensors(rddl, sparse_names: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    '''Returns the non-fluent tensors of `rddl` with a leading axis of size 1.
+
+    Args:
+        rddl: A built RDDL object.
+        sparse_names: Non-fluents to be returned as SparseTensors.
+            Defaults to the non-fluents detected by :func:`sparse_non_fluents`.
+
+    Returns:
+        Mapping from non-fluent name to a dense array or a SparseTensor.
+    '''
+    if sparse_names is None:
+        sparse_names = sparse_non_fluents(rddl)
+
+    domain = rddl.domain
+    initializers = getattr(rddl.non_fluents, 'init_non_fluent', [])
+    groups = tensors.initializer_groups(initializers, domain.non_fluent_ordering)
+    entries = non_fluent_entries(rddl) if sparse_names else {}
+    result = {}
+    for name, shape in zip(domain.non_fluent_ordering, rddl.non_fluent_size):
+        pvar = domain.non_fluents[name]
+        if name in sparse_names:
+            dtype = tensors.range_dtype(pvar.range, rddl.object_table)
+            result[name] = sparse.from_entries(entries[name], shape, dtype)
+        else:
+            result[name] = tensors.fluent_tensor(pvar, shape, rddl.object_table, groups[name])[np.newaxis]
+    return result
+
+
+def load_module(path: str, name: str):
+    '''Imports the generated module at `path`.'''
+    if path not in _MODULES:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _MODULES[path] = module
+    return _MODULES[path]
+
+
+def write_module(path: str, source: str) -> None:
+    '''Atomically writes the generated `source` to `path`.'''
+    dirname = os.path.dirname(path)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.py', dir=dirname)
+    with os.fdopen(fd, 'w') as file:
+        file.write(source)
+    os.replace(tmp, path)
+
+
+def compile_step(rddl, cache_dir: Optional[str] = None):
+    '''Returns the compiled step module of `rddl`.
+
+    The module source is cached on disk by the content hash of the domain,
+    non-fluents and instance, and is imported directly on later runs.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to DEFAULT_CACHE_DIR.
+
+    Returns:
+        The imported module, bound to the non-fluents of `rddl`.
+    '''
+    return _compile_module(rddl, 'step', CodeGenerator.generate_step, cache_dir)
+
+
+def compile_cpfs(rddl, cache_dir: Optional[str] = None):
+    '''Returns the compiled module of per-CPF functions of `rddl`.
+
+    The module is generated by :meth:`CodeGenerator.generate_cpfs` and
+    cached like :func:`compile_step`.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to DEFAULT_CACHE_DIR.
+
+    Returns:
+        The imported module, bound to the non-fluents of `rddl`.
+    '''
+    return _compile_module(rddl, 'cpfs', CodeGenerator.generate_cpfs, cache_dir)
+
+
+def compile_constraints(rddl,
+        kind: str,
+        constraints: Sequence[Expression],
+        cache_dir: Optional[str] = None):
+    '''Returns the compiled module of boolean `constraints` of `rddl`.
+
+    The module is generated by :meth:`CodeGenerator.generate_constraints`
+    and cached like :func:`compile_step`, by `kind` and the source of the
+    constraints.
+
+    Args:
+        rddl: A built RDDL object.
+        kind: A short identifier of the constraints (e.g., 'preconds').
+        constraints: The boolean expressions.
+        cache_dir: Directory of generated modules. Defaults to DEFAULT_CACHE_DIR.
+
+    Returns:
+        The imported module, bound to the non-fluents of `rddl`.
+    '''
+    kind = '{}_{}'.format(kind, _digest([str(expr) for expr in constraints]))
+    return _compile_module(rddl, kind, lambda generator: generator.generate_constraints(constraints), cache_dir)
+
+
+def compile_tensors(rddl,
+        kind: str,
+        items: Sequence[Tuple[Expression, Scope, Axes, str]],
+        cache_dir: Optional[str] = None):
+    '''Returns the compiled module of tensor expressions of `rddl`.
+
+    The module is generated by :meth:`CodeGenerator.generate_tensors`
+    and cached like :func:`compile_constraints`.
+
+    Args:
+        rddl: A built RDDL object.
+        kind: A short identifier of the tensors (e.g., 'bounds').
+        items: The (expr, scope, axes, kind) of each tensor.
+        cache_dir: Directory of generated modules. Defaults to DEFAULT_CACHE_DIR.
+
+    Returns:
+        The imported module, bound to the non-fluents of `rddl`.
+    '''
+    kind = '{}_{}'.format(kind, _digest([(str(expr), sorted(scope.items()), axes, range_kind) for expr, scope, axes, range_kind in items]))
+    return _compile_module(rddl, kind, lambda generator: generator.generate_tensors(items), cache_dir)
+
+
+def _digest(obj) -> str:
+    '''Returns a short content hash of the representation of `obj`.'''
+    return hashlib.sha256(repr(obj).encode('utf-8')).hexdigest()[:8]
+
+
+def _compile_module(rddl, kind: str, generate, cache_dir: Optional[str]):
+    '''Returns the cached module of given `kind` generated by `generate`.'''
+    cache_dir = cache_dir if cache_dir is not None else DEFAULT_CACHE_DIR
+    sparse_names = sparse_non_fluents(rddl)
+    name = 'pyrddl_{}_{}'.format(kind, fingerprint(rddl))
+    path = os.path.join(cache_dir, '{}.py'.format(name))
+    if not os.path.exists(path):
+        source = generate(CodeGenerator(rddl, sparse_names))
+        write_module(path, source)
+    module = load_module(path, name)
+    module.bind(non_fluent_tensors(rddl, sparse_names))
+    return module
+
+
+def _literal(value) -> str:
+    '''Returns the Python source code of a constant `value`.'''
+    if isinstance(value, float) and not math.isfinite(value):
+        return "float('{}')".format(value)
+    return repr(value)
+
+
+def _shape_code(batched: bool, dims: Tuple[int, ...]) -> str:
+    '''Returns the source code of a tensor shape.'''
+    lead = 'batch_size' if batched else '1'
+    return '({})'.format(', '.join([lead] + [str(d) for d in dims]) + (',' if not dims else ''))
+
+
+def _ufunc_code(instr: Instr, args: List[str], out: str) -> str:
+    '''Returns the source code of the ufunc `instr` writing into `out`.'''
+    args = list(args)
+    if instr.attrs.get('dtype') is not None:
+        args.append('dtype={}'.format(DTYPES[instr.attrs['dtype']]))
+    args.append('out={}'.format(out))
+    return 'np.{}({})'.format(instr.attrs['ufunc'], ', '.join(args))
+
+
+def _reduce_code(instr: Instr, arg: str, out: str) -> str:
+    '''Returns the source code of the reduction `instr` writing into `out`.'''
+    kwargs = ['axis={}'.format(instr.attrs['axis'])]
+    if instr.attrs.get('dtype') is not None:
+        kwargs.append('dtype={}'.format(DTYPES[instr.attrs['dtype']]))
+    kwargs.append('out={}'.format(out))
+    return 'np.{}({}, {})'.format(instr.attrs['func'], arg, ', '.join(kwargs))
+
+
+def _einsum_code(instr: Instr, args: List[str], out: Optional[str] = None) -> str:
+    '''Returns the source code of the contraction `instr`, writing into `out` if given.'''
+    kwargs = ['dtype={}'.format(DTYPES[instr.attrs['dtype']]), 'optimize={}'.format(instr.attrs['optimize'])]
+    if out is not None:
+        kwargs.append('out={}'.format(out))
+    return "np.einsum('{}', {}, {})".format(instr.attrs['subscripts'], ', '.join(args), ', '.join(kwargs))
+
+
+def _tile_code(value: Value, internal: set) -> str:
+    '''Returns the source code of `value` restricted to the current batch tile.'''
+    if value.is_constant or not value.batched:
+        return value.code
+    code = re.sub(r'\bbatch_size\b', 'n', value.code)
+    if value.base in internal:
+        return code
+    return re.sub(r'\b{}\b'.format(value.base), '{}[i:i + n]'.format(value.base), code)
+
+
+def _tile_shape_code(rows: int, dims: Tuple[int, ...]) -> str:
+    '''Returns the source code of the shape of a tile buffer.'''
+    return '({})'.format(', '.join(['min(batch_size, {})'.format(rows)] + [str(d) for d in dims]) + (',' if not dims else ''))
+
+
+def _results_code(results, rename: Optional[Dict[str, str]] = None) -> str:
+    '''Returns the source code of a nested structure of dicts and Values.'''
+    rename = rename if rename is not None else {}
+    if isinstance(results, Value):
+        return rename.get(results.code, results.code)
+    if isinstance(results, dict):
+        items = ("'{}': {}".format(name, _results_code(value, rename)) for name, value in results.items())
+        return '{{{}}}'.format(', '.join(items))
+    items = [_results_code(item, rename) for item in results]
+    return '({})'.format(', '.join(items) + (',' if len(items) == 1 else ''))
+
+
+def _named_results(results, path: str = 'results') -> List[Tuple[str, str, Value]]:
+    '''Returns the (dict path, name, Value) of each named Value in a nested structure of dicts and Values.'''
+    if isinstance(results, Value):
+        return []
+    if isinstance(results, dict):
+        return [(path, name, value) for name, value in results.items() if isinstance(value, Value)]
+    return [named for i, item in enumerate(results) for named in _named_results(item, '{}[{}]'.format(path, i))]
+
+
+def _flatten_results(results) -> List[Value]:
+    '''Returns the Values of a nested structure of dicts and Values.'''
+    if isinstance(results, Value):
+        return [results]
+    if isinstance(results, dict):
+        results = list(results.values())
+    return [value for item in results for value in _flatten_results(item)]
+
+
+_MODULES = {}
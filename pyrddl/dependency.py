@@ -0,0 +1,254 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.expr import Expression
+
+import numpy as np
+
+from typing import Dict, Iterable, Iterator, List, Sequence, Set
+
+REWARD = 'reward'
+
+
+class DependencyGraph(object):
+    '''Dependency graph of the fluents and expressions of an RDDL model.
+
+    Nodes are fluent names (e.g., 'rlevel/1'), next state fluent names
+    (e.g., "rlevel'/1"), the reward node 'reward' and one node per
+    precondition, invariant and state-action constraint (e.g.,
+    'preconds[0]'). There is an edge from `u` to `v` if the CPF or
+    expression of `v` reads `u`. State fluents and their next state
+    fluents are distinct nodes, so the graph of a well-formed domain
+    is acyclic.
+
+    Adjacency, ancestors and descendants are stored as integer bitsets
+    indexed by node position, and the transitive closure is computed
+    once on construction.
+
+    Note:
+        This class is intended to be built by :meth:`pyrddl.rddl.RDDL.build`.
+
+    Args:
+        nodes: The node names.
+        exprs: Mapping from node name to the expression defining it.
+
+    Attributes:
+        nodes (Tuple[str, ...]): The node names.
+        index (Dict[str, int]): Mapping from node name to its position.
+        exprs (Dict[str, :obj:`Expression`]): Mapping from node name to the expression defining it.
+    '''
+
+    def __init__(self, nodes: Sequence[str], exprs: Dict[str, Expression]) -> None:
+        self.nodes = tuple(nodes)
+        self.index = { name: i for i, name in enumerate(self.nodes) }
+        self.exprs = dict(exprs)
+
+        n = len(self.nodes)
+        self._pred = [0] * n
+        self._succ = [0] * n
+        for name, expr in self.exprs.items():
+            v = self.index[name]
+            for dep in expr.scope:
+                u = self.index.get(dep)
+                if u is not None:
+                    self._pred[v] |= 1 << u
+                    self._succ[u] |= 1 << v
+
+        self._build_components()
+        self._build_closure()
+
+    @classmethod
+    def from_rddl(cls, rddl) -> 'DependencyGraph':
+        '''Returns the dependency graph of a built `rddl`.'''
+        domain = rddl.domain
+        nodes = list(rddl.fluent_table)
+        exprs = {}
+        for cpf in domain.intermediate_cpfs + domain.state_cpfs:
+            if cpf.name not in rddl.fluent_table:
+                nodes.append(cpf.name)
+            exprs[cpf.name] = cpf.expr
+        nodes.append(REWARD)
+        exprs[REWARD] = domain.reward
+        for section in ['preconds', 'invariants', 'constraints']:
+            for i, expr in enumerate(getattr(domain, section)):
+                name = '{}[{}]'.format(section, i)
+                nodes.append(name)
+                exprs[name] = expr
+        return cls(nodes, exprs)
+
+    def _build_components(self) -> None:
+        '''Builds the strongly connected components in topological order (Tarjan).'''
+        n = len(self.nodes)
+        index, lowlink = [None] * n, [0] * n
+        on_stack = [False] * n
+        stack, components = [], []
+        counter = 0
+
+        for root in range(n):
+            if index[root] is not None:
+                continue
+            work = [(root, _bits(self._succ[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            while work:
+                v, children = work[-1]
+                w = next(children, None)
+                if w is not None:
+                    if index[w] is None:
+                        index[w] = lowlink[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, _bits(self._succ[w])))
+                    elif on_stack[w]:
+                        lowlink[v] = min(lowlink[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+                if lowlink[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(sorted(component))
+
+        components.reverse()
+        self._components = components
+        self._order = [v for component in components for v in component]
+
+    def _build_closure(self) -> None:
+        '''Builds the ancestor and descendant bitsets of every node.'''
+        n = len(self.nodes)
+        self._ancestors = [0] * n
+        self._descendants = [0] * n
+
+        for component in self._components:
+            mask = 0
+            for v in component:
+                mask |= 1 << v
+            ancestors = 0
+            for v in component:
+                for u in _bits(self._pred[v] & ~mask):
+                    ancestors |= self._ancestors[u] | (1 << u)
+            if len(component) > 1 or self._pred[component[0]] & mask:
+                ancestors |= mask
+            for v in component:
+                self._ancestors[v] = ancestors
+
+        for component in reversed(self._components):
+            mask = 0
+            for v in component:
+                mask |= 1 << v
+            descendants = 0
+            for v in component:
+                for w in _bits(self._succ[v] & ~mask):
+                    descendants |= self._descendants[w] | (1 << w)
+            if len(component) > 1 or self._succ[component[0]] & mask:
+                descendants |= mask
+            for v in component:
+                self._descendants[v] = descendants
+
+    def parents(self, name: str) -> Set[str]:
+        '''Returns the nodes read directly by the node `name`.'''
+        return self.names(self._pred[self.index[name]])
+
+    def children(self, name: str) -> Set[str]:
+        '''Returns the nodes reading the node `name` directly.'''
+        return self.names(self._succ[self.index[name]])
+
+    def ancestors(self, name: str) -> Set[str]:
+        '''Returns the nodes the node `name` transitively depends on.'''
+        return self.names(self._ancestors[self.index[name]])
+
+    def descendants(self, name: str) -> Set[str]:
+        '''Returns the nodes transitively depending on the node `name`.'''
+        return self.names(self._descendants[self.index[name]])
+
+    def depends_on(self, name: str, other: str) -> bool:
+        '''Returns True if the node `name` transitively depends on `other`.'''
+        return bool(self._ancestors[self.index[name]] >> self.index[other] & 1)
+
+    def ancestors_mask(self, names: Iterable[str]) -> int:
+        '''Returns the bitset of the union of `names` and their ancestors.'''
+        mask = 0
+        for name in names:
+            i = self.index[name]
+            mask |= self._ancestors[i] | (1 << i)
+        return mask
+
+    def descendants_mask(self, names: Iterable[str]) -> int:
+        '''Returns the bitset of the union of `names` and their descendants.'''
+        mask = 0
+        for name in names:
+            i = self.index[name]
+            mask |= self._descendants[i] | (1 << i)
+        return mask
+
+    def mask(self, names: Iterable[str]) -> int:
+        '''Returns the bitset of `names`.'''
+        mask = 0
+        for name in names:
+            mask |= 1 << self.index[name]
+        return mask
+
+    def indices(self, mask: int) -> List[int]:
+        '''Returns the positions of the nodes in bitset `mask`.'''
+        return list(_bits(mask))
+
+    def names(self, mask: int) -> Set[str]:
+        '''Returns the set of node names in bitset `mask`.'''
+        nodes = self.nodes
+        return { nodes[i] for i in _bits(mask) }
+
+    @property
+    def topological_order(self) -> List[str]:
+        '''Returns the node names such that every node follows the nodes it reads.
+
+        Nodes in the same strongly connected component are adjacent.
+        '''
+        return [self.nodes[v] for v in self._order]
+
+    @property
+    def strongly_connected_components(self) -> List[List[str]]:
+        '''Returns the strongly connected components in topological order.'''
+        return [[self.nodes[v] for v in component] for component in self._components]
+
+    @property
+    def cycles(self) -> List[List[str]]:
+        '''Returns the strongly connected components that contain a cycle.'''
+        return [
+            [self.nodes[v] for v in component]
+            for component in self._components
+            if len(component) > 1 or self._pred[component[0]] >> component[0] & 1
+        ]
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the graph.'''
+        edges = sum(bin(mask).count('1') for mask in self._pred)
+        return 'DependencyGraph(nodes={}, edges={})'.format(len(self.nodes), edges)
+
+
+def _bits(mask: int) -> Iterator[int]:
+    '''Returns an iterator over the positions of the set bits of `mask` in increasing order.'''
+    data = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return iter(np.flatnonzero(np.unpackbits(data, bitorder='little')).tolist())
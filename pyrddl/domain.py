@@ -19,10 +19,16 @@ from pyrddl.pvariable import PVariable
 from pyrddl.cpf import CPF
 from pyrddl.expr import Expression
 
-from typing import Dict, List, Sequence, Optional, Tuple
+import collections
+import types
+from typing import Dict, List, Mapping, Sequence, Optional, Tuple
 
 Type = Tuple[str, str]
 
+FluentIndex = collections.namedtuple('FluentIndex', ['fluents', 'orderings', 'interm_cpfs', 'state_cpfs', 'cpfs'])
+
+ActionBound = collections.namedtuple('ActionBound', ['params', 'scope', 'expr', 'strict'])
+
 
 class Domain(object):
     '''Domain class for accessing RDDL domain sections.
@@ -61,10 +67,54 @@ class Domain(object):
         self.invariants = sections.get('invariants', [])
         self.constraints = sections.get('constraints', [])
 
+        self._index = None
+
     def build(self):
+        self._build_fluent_index()
         self._build_preconditions_table()
         self._build_action_bound_constraints_table()
 
+    def _build_fluent_index(self):
+        '''Builds the immutable index of pvariables and CPFs by kind and name.'''
+        fluents = { kind: {} for kind in ['non-fluent', 'state-fluent', 'action-fluent', 'interm-fluent'] }
+        for pvar in self.pvariables:
+            fluents.setdefault(pvar.fluent_type, {})[str(pvar)] = pvar
+
+        interm_fluents = fluents['interm-fluent']
+        key = lambda pvar: (pvar.level, pvar.name)
+        orderings = {
+            'non-fluent': tuple(sorted(fluents['non-fluent'])),
+            'state-fluent': tuple(sorted(fluents['state-fluent'])),
+            'action-fluent': tuple(sorted(fluents['action-fluent'])),
+            'interm-fluent': tuple(str(pvar) for pvar in sorted(interm_fluents.values(), key=key))
+        }
+
+        _, cpfs = self.cpfs
+        interm_cpfs = [cpf for cpf in cpfs if cpf.name in interm_fluents]
+        interm_cpfs = sorted(interm_cpfs, key=lambda cpf: (interm_fluents[cpf.name].level, cpf.name))
+        state_cpfs = [cpf for cpf in cpfs if utils.rename_next_state_fluent(cpf.name) in fluents['state-fluent']]
+        state_cpfs = sorted(state_cpfs, key=lambda cpf: cpf.name)
+
+        cpf_table = {}
+        for cpf in interm_cpfs:
+            cpf_table[cpf.name] = cpf
+        for cpf in state_cpfs:
+            cpf_table[cpf.name] = cpf
+            cpf_table[utils.rename_next_state_fluent(cpf.name)] = cpf
+
+        self._index = FluentIndex(
+            fluents={ kind: types.MappingProxyType(table) for kind, table in fluents.items() },
+            orderings=orderings,
+            interm_cpfs=tuple(interm_cpfs),
+            state_cpfs=tuple(state_cpfs),
+            cpfs=types.MappingProxyType(cpf_table))
+
+    def _fluent_index(self) -> FluentIndex:
+        '''Returns the fluent index, building it on first use.'''
+        if self._index is None:
+            self._build_fluent_index()
+        return self._index
+
     def _build_preconditions_table(self):
         '''Builds the local action precondition expressions.'''
         self.local_action_preconditions = dict()
@@ -81,104 +131,131 @@ class Domain(object):
                 self.global_action_preconditions.append(precond)
 
     def _build_action_bound_constraints_table(self):
-        '''Builds the lower and upper action bound constraint expressions.'''
-        self.action_lower_bound_constraints = {}
-        self.action_upper_bound_constraints = {}
+        '''Builds the lower and upper action bound constraint expressions.
+
+        Bounds are extracted from every relational conjunct of each local
+        precondition, under any number of nested `forall` quantifiers and
+        `^` conjunctions. Equality constraints give both a lower and an
+        upper bound. All bounds of each action fluent are kept as
+        :obj:`ActionBound` tuples in `action_lower_bounds` and
+        `action_upper_bounds`; `action_lower_bound_constraints` and
+        `action_upper_bound_constraints` map each action fluent to the
+        expression of its last bound of each kind.
+        '''
+        self.action_lower_bounds = {}
+        self.action_upper_bounds = {}
 
         for name, preconds in self.local_action_preconditions.items():
-
             for precond in preconds:
-                expr_type = precond.etype
-                expr_args = precond.args
-
-                bounds_expr = None
-
-                if expr_type == ('aggregation', 'forall'):
-                    inner_expr = expr_args[1]
-                    if inner_expr.etype[0] == 'relational':
-                        bounds_expr = inner_expr
-                elif expr_type[0] == 'relational':
-                    bounds_expr = precond
-
-                if bounds_expr:
-                    # lower bound
-                    bound = self._extract_lower_bound(name, bounds_expr)
-                    if bound is not None:
-                        self.action_lower_bound_constraints[name] = bound
-                    else: # upper bound
-                        bound = self._extract_upper_bound(name, bounds_expr)
-                        if bound is not None:
-                            self.action_upper_bound_constraints[name] = bound
-
-
-    def _extract_lower_bound(self, name: str, expr: Expression) -> Optional[Expression]:
-        '''Returns the lower bound expression of the action with given `name`.'''
+                for relation, scope in self._bound_relations(precond, {}):
+                    strict = relation.etype[1] in ['<', '>']
+                    lower = self._extract_lower_bound(name, relation)
+                    if lower is not None:
+                        params, bound = lower
+                        bound = ActionBound(params, scope, bound, strict)
+                        self.action_lower_bounds.setdefault(name, []).append(bound)
+                    upper = self._extract_upper_bound(name, relation)
+                    if upper is not None:
+                        params, bound = upper
+                        bound = ActionBound(params, scope, bound, strict)
+                        self.action_upper_bounds.setdefault(name, []).append(bound)
+
+        self.action_lower_bound_constraints = { name: bounds[-1].expr for name, bounds in self.action_lower_bounds.items() }
+        self.action_upper_bound_constraints = { name: bounds[-1].expr for name, bounds in self.action_upper_bounds.items() }
+
+    @classmethod
+    def _bound_relations(cls, expr: Expression, scope: Dict[str, str]):
+        '''Yields the relational conjuncts of `expr` and the types of their quantified variables.'''
+        etype = expr.etype
+        if etype == ('aggregation', 'forall'):
+            scope = dict(scope)
+            for _, (var, vtype) in expr.args[:-1]:
+                scope[var] = vtype
+            yield from cls._bound_relations(expr.args[-1], scope)
+        elif etype in [('boolean', '^'), ('boolean', '&')]:
+            for arg in expr.args:
+                yield from cls._bound_relations(arg, scope)
+        elif etype[0] == 'relational':
+            yield expr, scope
+
+    def _extract_lower_bound(self, name: str, expr: Expression) -> Optional[Tuple[Tuple, Expression]]:
+        '''Returns the action parameters and lower bound expression of the action with given `name`.'''
         etype = expr.etype
         args = expr.args
-        if etype[1] in ['<=', '<']:
-            if args[1].is_pvariable_expression() and args[1].name == name:
-                return args[0]
-        elif etype[1] in ['>=', '>']:
-            if args[0].is_pvariable_expression() and args[0].name == name:
-                return args[1]
+        if etype[1] in ['<=', '<', '==']:
+            bound = self._bound_of(name, args[1], args[0])
+            if bound is not None:
+                return bound
+        if etype[1] in ['>=', '>', '==']:
+            return self._bound_of(name, args[0], args[1])
         return None
 
-    def _extract_upper_bound(self, name: str, expr: Expression) -> Optional[Expression]:
-        '''Returns the upper bound expression of the action with given `name`.'''
+    def _extract_upper_bound(self, name: str, expr: Expression) -> Optional[Tuple[Tuple, Expression]]:
+        '''Returns the action parameters and upper bound expression of the action with given `name`.'''
         etype = expr.etype
         args = expr.args
-        if etype[1] in ['<=', '<']:
-            if args[0].is_pvariable_expression() and args[0].name == name:
-                return args[1]
-        elif etype[1] in ['>=', '>']:
-            if args[1].is_pvariable_expression() and args[1].name == name:
-                return args[0]
+        if etype[1] in ['<=', '<', '==']:
+            bound = self._bound_of(name, args[0], args[1])
+            if bound is not None:
+                return bound
+        if etype[1] in ['>=', '>', '==']:
+            return self._bound_of(name, args[1], args[0])
+        return None
+
+    @classmethod
+    def _bound_of(cls, name: str, action: Expression, bound: Expression) -> Optional[Tuple[Tuple, Expression]]:
+        '''Returns the parameters of `action` and `bound` if `action` is the action `name` and `bound` does not depend on it.'''
+        if action.is_pvariable_expression() and action.name == name and name not in bound.scope:
+            _, params = action.args
+            return (tuple(params) if params is not None else (), bound)
         return None
 
     @property
-    def non_fluents(self) -> Dict[str, PVariable]:
+    def non_fluents(self) -> Mapping[str, PVariable]:
         '''Returns non-fluent pvariables.'''
-        return { str(pvar): pvar for pvar in self.pvariables if pvar.is_non_fluent() }
+        return self._fluent_index().fluents['non-fluent']
 
     @property
-    def state_fluents(self) -> Dict[str, PVariable]:
+    def state_fluents(self) -> Mapping[str, PVariable]:
         '''Returns state-fluent pvariables.'''
-        return { str(pvar): pvar for pvar in self.pvariables if pvar.is_state_fluent() }
+        return self._fluent_index().fluents['state-fluent']
 
     @property
-    def action_fluents(self) -> Dict[str, PVariable]:
+    def action_fluents(self) -> Mapping[str, PVariable]:
         '''Returns action-fluent pvariables.'''
-        return { str(pvar): pvar for pvar in self.pvariables if pvar.is_action_fluent() }
+        return self._fluent_index().fluents['action-fluent']
 
     @property
-    def intermediate_fluents(self) -> Dict[str, PVariable]:
+    def intermediate_fluents(self) -> Mapping[str, PVariable]:
         '''Returns interm-fluent pvariables.'''
-        return { str(pvar): pvar for pvar in self.pvariables if pvar.is_intermediate_fluent() }
+        return self._fluent_index().fluents['interm-fluent']
 
     @property
     def intermediate_cpfs(self) -> List[CPF]:
         '''Returns list of intermediate-fluent CPFs in level order.'''
-        _, cpfs = self.cpfs
-        interm_cpfs = [cpf for cpf in cpfs if cpf.name in self.intermediate_fluents]
-        interm_cpfs = sorted(interm_cpfs, key=lambda cpf: (self.intermediate_fluents[cpf.name].level, cpf.name))
-        return interm_cpfs
+        return list(self._fluent_index().interm_cpfs)
+
+    def get_cpf(self, name: str) -> Optional[CPF]:
+        '''Returns the CPF of the fluent with given `name`.
+
+        Args:
+            name: An intermediate fluent, state fluent or next state fluent name.
 
-    def get_intermediate_cpf(self, name):
-        for cpf in self.intermediate_cpfs:
-            if cpf.name == name:
-                return cpf
+        Returns:
+            Optional[CPF]: The CPF defining the fluent, or None if there is none.
+        '''
+        return self._fluent_index().cpfs.get(name)
+
+    def get_intermediate_cpf(self, name: str) -> Optional[CPF]:
+        '''Returns the CPF of the intermediate fluent with given `name`, or None.'''
+        if name not in self.intermediate_fluents:
+            return None
+        return self.get_cpf(name)
 
     @property
     def state_cpfs(self) -> List[CPF]:
         '''Returns list of state-fluent CPFs.'''
-        _, cpfs = self.cpfs
-        state_cpfs = []
-        for cpf in cpfs:
-            name = utils.rename_next_state_fluent(cpf.name)
-            if name in self.state_fluents:
-                state_cpfs.append(cpf)
-        state_cpfs = sorted(state_cpfs, key=lambda cpf: cpf.name)
-        return state_cpfs
+        return list(self._fluent_index().state_cpfs)
 
     @property
     def non_fluent_ordering(self) -> List[str]:
@@ -187,7 +264,7 @@ class Domain(object):
         Returns:
             List[str]: A list of fluent names.
         '''
-        return sorted(self.non_fluents)
+        return list(self._fluent_index().orderings['non-fluent'])
 
     @property
     def state_fluent_ordering(self) -> List[str]:
@@ -196,7 +273,7 @@ class Domain(object):
         Returns:
             List[str]: A list of fluent names.
         '''
-        return sorted(self.state_fluents)
+        return list(self._fluent_index().orderings['state-fluent'])
 
     @property
     def action_fluent_ordering(self) -> List[str]:
@@ -205,7 +282,7 @@ class Domain(object):
         Returns:
             List[str]: A list of fluent names.
         '''
-        return sorted(self.action_fluents)
+        return list(self._fluent_index().orderings['action-fluent'])
 
     @property
     def interm_fluent_ordering(self) -> List[str]:
@@ -214,9 +291,7 @@ class Domain(object):
         Returns:
             List[str]: A list of fluent names.
         '''
-        interm_fluents = self.intermediate_fluents.values()
-        key = lambda pvar: (pvar.level, pvar.name)
-        return [str(pvar) for pvar in sorted(interm_fluents, key=key)]
+        return list(self._fluent_index().orderings['interm-fluent'])
 
     @property
     def next_state_fluent_ordering(self) -> List[str]:
@@ -225,5 +300,4 @@ class Domain(object):
         Returns:
             List[str]: A list of fluent names.
         '''
-        key = lambda x: x.name
-        return [cpf.name for cpf in sorted(self.state_cpfs, key=key)]
+        return [cpf.name for cpf in self._fluent_index().state_cpfs]
@@ -0,0 +1,160 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import collections.abc
+import itertools
+
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+
+class GroundedFluentView(collections.abc.Sequence):
+    '''Lazy sequence of the grounded names of a fluent.
+
+    Grounded names (e.g., 'rlevel(t1)') follow the row-major order of the
+    fluent's parameter objects, which is also the order of the fluent's
+    tensor entries. Names and indices are computed on demand from the
+    object table, so the view never holds the list of all names.
+
+    Args:
+        functor: The fluent name without arity (e.g., 'rlevel').
+        param_types: The parameter types of the fluent.
+        object_table: The object table for each RDDL type.
+
+    Attributes:
+        functor (str): The fluent name without arity.
+        param_types (Tuple[str, ...]): The parameter types of the fluent.
+        shape (Tuple[int, ...]): The number of objects of each parameter type.
+    '''
+
+    def __init__(self, functor: str, param_types: Optional[Sequence[str]], object_table) -> None:
+        self.functor = functor
+        self.param_types = tuple(param_types) if param_types is not None else ()
+        self._objects = tuple(object_table[ptype]['objects'] for ptype in self.param_types)
+        self._idx = tuple(object_table[ptype]['idx'] for ptype in self.param_types)
+        self.shape = tuple(len(objects) for objects in self._objects)
+
+        strides = []
+        stride = 1
+        for size in reversed(self.shape):
+            strides.append(stride)
+            stride *= size
+        self._strides = tuple(reversed(strides))
+        self._size = stride
+
+    def __len__(self) -> int:
+        '''Returns the number of grounded names.'''
+        return self._size
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        '''Returns the grounded name at flat `index`, or a list of names for a slice.'''
+        if isinstance(index, slice):
+            return [self.name(i) for i in range(*index.indices(self._size))]
+        return self.name(index)
+
+    def __iter__(self) -> Iterator[str]:
+        '''Returns an iterator over the grounded names in row-major order.'''
+        if not self.param_types:
+            return iter([self.functor])
+        return ('{}({})'.format(self.functor, ','.join(objects)) for objects in itertools.product(*self._objects))
+
+    def __contains__(self, name: object) -> bool:
+        '''Returns True if `name` is a grounded name of the fluent.'''
+        try:
+            self.index(name)
+        except ValueError:
+            return False
+        return True
+
+    def name(self, index: int) -> str:
+        '''Returns the grounded name at flat `index`.
+
+        Raises:
+            IndexError: If `index` is out of range.
+        '''
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('Index {} out of range for {} grounded names'.format(index, self._size))
+        if not self.param_types:
+            return self.functor
+        objects = [objects[i] for objects, i in zip(self._objects, self.unravel(index))]
+        return '{}({})'.format(self.functor, ','.join(objects))
+
+    def index(self, name: str) -> int:
+        '''Returns the flat index of the grounded `name`.
+
+        Raises:
+            ValueError: If `name` is not a grounded name of the fluent.
+        '''
+        params = self._parse(name)
+        try:
+            multi_index = tuple(idx[obj] for idx, obj in zip(self._idx, params))
+        except KeyError:
+            raise ValueError('{} is not a grounded name of {}'.format(name, self.functor))
+        return self.ravel(multi_index)
+
+    def ravel(self, multi_index: Sequence) -> int:
+        '''Returns the flat index of `multi_index` in row-major order.
+
+        Each component of `multi_index` may be an integer or an integer array.
+
+        Raises:
+            ValueError: If the length of `multi_index` differs from the arity.
+        '''
+        if len(multi_index) != len(self.shape):
+            raise ValueError('Expected {} indices, got {}'.format(len(self.shape), len(multi_index)))
+        flat = 0
+        for i, stride in zip(multi_index, self._strides):
+            flat = flat + i * stride
+        return flat
+
+    def unravel(self, index) -> Tuple:
+        '''Returns the multi-index of flat `index` in row-major order.
+
+        `index` may be an integer or an integer array.
+        '''
+        multi_index = []
+        for stride, size in zip(self._strides, self.shape):
+            multi_index.append(index // stride % size)
+        return tuple(multi_index)
+
+    def _parse(self, name: str) -> Tuple[str, ...]:
+        '''Returns the objects of the grounded `name`.'''
+        if not self.param_types:
+            if name != self.functor:
+                raise ValueError('{} is not a grounded name of {}'.format(name, self.functor))
+            return ()
+        prefix = self.functor + '('
+        if not isinstance(name, str) or not name.startswith(prefix) or not name.endswith(')'):
+            raise ValueError('{} is not a grounded name of {}'.format(name, self.functor))
+        params = tuple(name[len(prefix):-1].split(','))
+        if len(params) != len(self.param_types):
+            raise ValueError('{} is not a grounded name of {}'.format(name, self.functor))
+        return params
+
+    def __eq__(self, other: object) -> bool:
+        '''Returns True if `other` holds the same grounded names in the same order.'''
+        if isinstance(other, GroundedFluentView):
+            return self.functor == other.functor and self._objects == other._objects
+        if isinstance(other, (list, tuple)):
+            return len(other) == self._size and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the view.'''
+        return 'GroundedFluentView({}, shape={})'.format(self.functor, self.shape)
@@ -0,0 +1,182 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.dependency import REWARD
+from pyrddl.expr import Expression
+from pyrddl import codegen
+from pyrddl import tensors
+from pyrddl import utils
+
+import collections
+import numpy as np
+
+from typing import Dict, Optional, Tuple
+
+Fluents = Dict[str, np.ndarray]
+
+
+def changed_rows(new: np.ndarray, old: np.ndarray) -> np.ndarray:
+    '''Returns the boolean mask of the batch rows where `new` and `old` differ.'''
+    diff = np.not_equal(new, old)
+    return diff.reshape(len(diff), -1).any(axis=1)
+
+
+class IncrementalEvaluator(object):
+    '''Evaluator of the CPFs and reward of an RDDL model that only recomputes what changed.
+
+    The first call evaluates every CPF and the reward with the functions
+    of :func:`pyrddl.codegen.compile_cpfs`, and caches all inputs and
+    results. Each later call compares the state and action tensors with
+    the cached ones and marks the batch rows where they changed. A CPF
+    is recomputed only if one of its parents in the dependency graph has
+    dirty rows, and only on those rows. Its new values are compared with
+    the cached ones, so that only the rows where it actually changed are
+    propagated to its children.
+
+    When more than `threshold` of the batch rows of a CPF are dirty, the
+    CPF is recomputed over the whole batch instead of gathering the rows.
+    Random CPFs, and the reward if it is random, are resampled over the
+    whole batch on every call; only the rows where their samples changed
+    are propagated to their children.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+        threshold: The fraction of dirty rows above which a CPF is
+            recomputed over the whole batch.
+
+    Attributes:
+        recomputed (Dict[str, int]): The number of rows recomputed for
+            each CPF and the reward in the last call.
+    '''
+
+    def __init__(self, rddl, cache_dir: Optional[str] = None, threshold: float = 0.25) -> None:
+        self.rddl = rddl
+        self.threshold = threshold
+        domain = rddl.domain
+        graph = rddl.dependency_graph
+        module = codegen.compile_cpfs(rddl, cache_dir)
+
+        self._inputs = domain.state_fluent_ordering + domain.action_fluent_ordering
+        self._functions = []
+        for cpf in domain.intermediate_cpfs + domain.state_cpfs:
+            self._functions.append((cpf.name, module.CPFS[cpf.name], graph.parents(cpf.name), _is_random(cpf.expr)))
+        self._functions.append((REWARD, module.reward, graph.parents(REWARD), _is_random(domain.reward)))
+
+        self._cache = None
+        self.recomputed = collections.OrderedDict()
+
+    def reset(self) -> None:
+        '''Discards the cached tensors, so that the next call evaluates everything.'''
+        self._cache = None
+
+    def __call__(self,
+            state: Fluents,
+            action: Fluents,
+            rng: np.random.Generator) -> Tuple[Fluents, Fluents, np.ndarray]:
+        '''Evaluates all CPFs and the reward of a batch of states and actions.
+
+        Args:
+            state: Mapping from state fluent name to a tensor of shape
+                (batch_size,) + shape.
+            action: Mapping from action fluent name to a tensor of shape
+                (batch_size,) + shape.
+            rng: The random number generator of recomputed random CPFs.
+
+        Returns:
+            Tuple[Fluents, Fluents, np.ndarray]: The intermediate fluents,
+            the next state fluents and the reward of shape (batch_size,).
+            The tensors are cached by the evaluator and updated in place by
+            later calls, and must not be modified.
+        '''
+        fluents = dict(state)
+        fluents.update(action)
+        batch_size = tensors.batch_size(fluents)
+        cache = self._cache
+        if cache is None or tensors.batch_size(cache) != batch_size:
+            self._evaluate_all(fluents, rng)
+        else:
+            dirty = {}
+            for name in self._inputs:
+                new = np.broadcast_to(np.asarray(fluents[name]), cache[name].shape)
+                rows = changed_rows(new, cache[name])
+                if rows.any():
+                    cache[name][rows] = new[rows]
+                    dirty[name] = rows
+            for name, function, parents, random in self._functions:
+                if random:
+                    rows = np.ones(batch_size, dtype=bool)
+                else:
+                    masks = [dirty[parent] for parent in parents if parent in dirty]
+                    rows = np.logical_or.reduce(masks) if masks else None
+                self.recomputed[name] = self._update(name, function, rows, dirty, rng)
+        return self._results()
+
+    def _evaluate_all(self, fluents: Fluents, rng: np.random.Generator) -> None:
+        '''Evaluates every CPF and the reward over the whole batch and caches the results.'''
+        batch_size = tensors.batch_size(fluents)
+        cache = collections.OrderedDict()
+        for name in self._inputs:
+            tensor = np.asarray(fluents[name])
+            cache[name] = np.array(np.broadcast_to(tensor, (batch_size,) + tensor.shape[1:]))
+        for name, function, _, _ in self._functions:
+            cache[name] = np.array(function(cache, rng))
+            self.recomputed[name] = batch_size
+        self._cache = cache
+
+    def _update(self,
+            name: str,
+            function,
+            rows: Optional[np.ndarray],
+            dirty: Dict[str, np.ndarray],
+            rng: np.random.Generator) -> int:
+        '''Recomputes the `rows` of CPF `name`, marks those that changed as dirty and returns their number.'''
+        if rows is None:
+            return 0
+        cache = self._cache
+        old = cache[name]
+        index = np.flatnonzero(rows)
+        if len(index) > self.threshold * len(rows):
+            new = function(cache, rng)
+            changed = changed_rows(new, old)
+            np.copyto(old, new)
+        else:
+            new = function(tensors.RowSubset(cache, index), rng)
+            changed = np.zeros(len(rows), dtype=bool)
+            changed[index] = changed_rows(new, old[index])
+            old[index] = new
+        if changed.any():
+            dirty[name] = changed
+        return len(index)
+
+    def _results(self) -> Tuple[Fluents, Fluents, np.ndarray]:
+        '''Returns the cached intermediate fluents, next state fluents and reward.'''
+        domain = self.rddl.domain
+        cache = self._cache
+        interms = collections.OrderedDict((name, cache[name]) for name in domain.interm_fluent_ordering)
+        next_state = collections.OrderedDict(
+            (name, cache[utils.rename_state_fluent(name)]) for name in domain.state_fluent_ordering)
+        return interms, next_state, cache[REWARD]
+
+
+def _is_random(expr: Expression) -> bool:
+    '''Returns True if `expr` samples a random variable other than a Kronecker or Dirac delta.'''
+    etype = expr.etype
+    if etype[0] == 'randomvar' and etype[1] not in ['KronDelta', 'DiracDelta']:
+        return True
+    if etype[0] in ['constant', 'pvar']:
+        return False
+    return any(_is_random(arg) for arg in expr.args if isinstance(arg, Expression))
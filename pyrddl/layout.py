@@ -0,0 +1,192 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import tensors
+
+import collections
+import numpy as np
+
+from typing import Dict, Optional, Sequence, Tuple
+
+FLUENT_KINDS = {
+    'state': ('state_fluent_ordering', 'state_size', 'state_range_type'),
+    'action': ('action_fluent_ordering', 'action_size', 'action_range_type'),
+    'interm': ('interm_fluent_ordering', 'interm_size', 'interm_range_type')
+}
+
+
+class FluentLayout(object):
+    '''Layout of fluent tensors as views into one contiguous buffer.
+
+    Each row of a (batch_size, width) buffer holds one tensor of every
+    fluent, in the given order, at precomputed offsets. The tensor of each
+    fluent is a reshaped view of its columns, so that a whole batch of
+    fluents can be copied, hashed or checkpointed as a single array.
+
+    If all fluents have the same dtype the buffer has that dtype and its
+    rows are flat vectors of all fluent values. Otherwise the buffer is a
+    byte array, and each fluent is stored at an offset aligned to its dtype.
+
+    Args:
+        names: The fluent names in layout order.
+        shapes: The shape of each fluent tensor, without the batch dimension.
+        dtypes: The dtype of each fluent tensor.
+
+    Attributes:
+        names (List[str]): The fluent names in layout order.
+        shapes (List[Tuple[int, ...]]): The shape of each fluent tensor.
+        dtypes (List[np.dtype]): The dtype of each fluent tensor.
+        dtype (np.dtype): The dtype of the buffer.
+        offsets (List[int]): The first column of each fluent in the buffer.
+        width (int): The number of columns of the buffer.
+    '''
+
+    def __init__(self,
+            names: Sequence[str],
+            shapes: Sequence[Tuple[int, ...]],
+            dtypes: Sequence[np.dtype]) -> None:
+        if not len(names) == len(shapes) == len(dtypes):
+            raise ValueError('Layout needs one shape and dtype per fluent.')
+        self.names = list(names)
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.dtypes = [np.dtype(dtype) for dtype in dtypes]
+
+        self.dtype = self.dtypes[0] if self.homogeneous and self.dtypes else np.dtype(np.uint8)
+
+        offset, offsets, alignment = 0, [], 1
+        for shape, dtype in zip(self.shapes, self.dtypes):
+            offset = -(-offset // dtype.alignment) * dtype.alignment
+            offsets.append(offset)
+            offset += int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            alignment = max(alignment, dtype.alignment)
+        nbytes = -(-offset // alignment) * alignment
+
+        unit = self.dtype.itemsize
+        self.offsets = [offset // unit for offset in offsets]
+        self.width = nbytes // unit
+        self._columns = collections.OrderedDict(
+            (name, slice(start, start + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize // unit))
+            for name, start, shape, dtype in zip(self.names, self.offsets, self.shapes, self.dtypes))
+
+    @classmethod
+    def from_rddl(cls,
+            rddl,
+            kind: str = 'state',
+            dtype: Optional[np.dtype] = None,
+            narrow: bool = False) -> 'FluentLayout':
+        '''Returns the layout of the state, action or intermediate fluents of `rddl`.
+
+        Fluents are laid out in their canonical order, e.g.
+        `Domain.state_fluent_ordering` for state fluents.
+
+        Args:
+            rddl: A built RDDL object.
+            kind: The fluent kind ('state', 'action' or 'interm').
+            dtype: A common dtype for all fluents. Defaults to the dtype
+                of each fluent's range.
+            narrow: If True, use 32-bit integers and floats for range dtypes.
+
+        Returns:
+            FluentLayout: The layout of the fluents.
+
+        Raises:
+            ValueError: If `kind` is not a fluent kind.
+        '''
+        if kind not in FLUENT_KINDS:
+            raise ValueError('Invalid fluent kind {}.'.format(kind))
+        ordering, size, range_type = FLUENT_KINDS[kind]
+        names = getattr(rddl.domain, ordering)
+        shapes = getattr(rddl, size)
+        if dtype is not None:
+            dtypes = [dtype] * len(names)
+        else:
+            object_table = rddl.object_table
+            dtypes = [tensors.range_dtype(rtype, object_table, narrow) for rtype in getattr(rddl, range_type)]
+        return cls(names, shapes, dtypes)
+
+    @property
+    def homogeneous(self) -> bool:
+        '''Returns True if the buffer has the dtype of all fluents.'''
+        return len(set(self.dtypes)) <= 1
+
+    @property
+    def nbytes(self) -> int:
+        '''Returns the number of bytes of a buffer row.'''
+        return self.width * self.dtype.itemsize
+
+    def column_slice(self, name: str) -> slice:
+        '''Returns the slice of the buffer columns of fluent `name`.'''
+        return self._columns[name]
+
+    def allocate(self, batch_size: int) -> np.ndarray:
+        '''Returns a zeroed buffer for `batch_size` rows.'''
+        return np.zeros((batch_size, self.width), dtype=self.dtype)
+
+    def views(self, buffer: np.ndarray) -> Dict[str, np.ndarray]:
+        '''Returns the tensor of each fluent as a view into `buffer`.
+
+        Args:
+            buffer: A (batch_size, width) array of the layout's dtype.
+
+        Returns:
+            Dict[str, np.ndarray]: Mapping from fluent name to a writable
+            view of shape (batch_size,) + shape and the fluent's dtype.
+
+        Raises:
+            ValueError: If `buffer` does not match the layout.
+        '''
+        self._check(buffer)
+        batch_size = buffer.shape[0]
+        views = collections.OrderedDict()
+        for name, shape, dtype in zip(self.names, self.shapes, self.dtypes):
+            columns = buffer[:, self._columns[name]]
+            if dtype != self.dtype:
+                columns = columns.view(dtype)
+            views[name] = columns.reshape((batch_size,) + shape)
+        return views
+
+    def pack(self, fluents: Dict[str, np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+        '''Copies the tensor of each fluent into a buffer.
+
+        Args:
+            fluents: Mapping from fluent name to a tensor broadcastable to
+                (batch_size,) + shape.
+            out: The buffer to write. Defaults to a new buffer with the
+                batch size of the first fluent.
+
+        Returns:
+            np.ndarray: The buffer.
+
+        Raises:
+            ValueError: If `out` does not match the layout.
+        '''
+        if out is None:
+            out = self.allocate(np.shape(fluents[self.names[0]])[0] if self.names else 0)
+        for name, view in self.views(out).items():
+            np.copyto(view, fluents[name], casting='same_kind')
+        return out
+
+    def _check(self, buffer: np.ndarray) -> None:
+        '''Checks that `buffer` has the layout's width and dtype.'''
+        if buffer.ndim != 2 or buffer.shape[1] != self.width or buffer.dtype != self.dtype:
+            raise ValueError('Buffer of shape {} and dtype {} does not match layout of width {} and dtype {}.'.format(
+                buffer.shape, buffer.dtype, self.width, self.dtype))
+        if self.width > 1 and buffer.strides[1] != self.dtype.itemsize:
+            raise ValueError('Buffer rows must be contiguous.')
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the layout.'''
+        return 'FluentLayout({} fluents, width={}, dtype={})'.format(len(self.names), self.width, self.dtype)
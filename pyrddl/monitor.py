@@ -0,0 +1,150 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import codegen
+
+import collections
+import numpy as np
+
+from typing import Dict, List, Optional
+
+Fluents = Dict[str, np.ndarray]
+
+Violation = collections.namedtuple('Violation', ['step', 'kind', 'index', 'rows'])
+
+
+class ConstraintMonitor(object):
+    '''Runtime monitor of the state invariants and state-action constraints of an RDDL model.
+
+    `Domain.invariants` and `Domain.constraints` are compiled into one
+    vectorized function each and evaluated over whole batches of states
+    (and actions). Each violated constraint is reported as a
+    :obj:`Violation` (step, kind, index, rows), where `kind` is
+    'invariants' or 'constraints', `index` is the position of the
+    constraint in its domain section and `rows` are the indices of the
+    violating batch elements.
+
+    Steps are checked every `every` calls, and, if `rate` is given, only
+    with probability `rate`, so that the cost of monitoring can be traded
+    off against detection latency.
+
+    Args:
+        rddl: A built RDDL object.
+        every: Check every `every`-th step, starting with the first one.
+        rate: The probability of checking a scheduled step. Defaults to 1.
+        seed: The seed of the step sampler.
+        strict: If True, raise on the first violation.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        step (int): The number of steps seen.
+        checked (int): The number of steps checked.
+        violations (List[Violation]): All violations found.
+    '''
+
+    def __init__(self,
+            rddl,
+            every: int = 1,
+            rate: Optional[float] = None,
+            seed: Optional[int] = None,
+            strict: bool = False,
+            cache_dir: Optional[str] = None) -> None:
+        if every < 1:
+            raise ValueError('Monitor period must be positive, got {}.'.format(every))
+        if rate is not None and not 0.0 <= rate <= 1.0:
+            raise ValueError('Monitor sampling rate must be in [0, 1], got {}.'.format(rate))
+        self.rddl = rddl
+        self.every = every
+        self.rate = rate
+        self.strict = strict
+        self._rng = np.random.default_rng(seed)
+
+        domain = rddl.domain
+        self._constraints = collections.OrderedDict()
+        for kind in ['invariants', 'constraints']:
+            exprs = getattr(domain, kind)
+            if exprs:
+                self._constraints[kind] = (exprs, codegen.compile_constraints(rddl, kind, exprs, cache_dir).CONSTRAINTS)
+
+        self.step = 0
+        self.checked = 0
+        self.violations = []
+
+    def scheduled(self) -> bool:
+        '''Returns True if the current step is to be checked, drawing from the sampler if needed.'''
+        if self.step % self.every != 0:
+            return False
+        return self.rate is None or self._rng.random() < self.rate
+
+    def __call__(self, state: Fluents, action: Optional[Fluents] = None) -> List[Violation]:
+        '''Checks a batch of states, and actions if given, if the step is scheduled.
+
+        State invariants are checked on `state`. State-action constraints
+        are checked only if `action` is given.
+
+        Args:
+            state: Mapping from state fluent name to a tensor of shape
+                (batch_size,) + shape.
+            action: Mapping from action fluent name to a tensor of shape
+                (batch_size,) + shape.
+
+        Returns:
+            List[Violation]: The violations found at this step.
+
+        Raises:
+            ValueError: If `strict` and some constraint is violated.
+        '''
+        violations = []
+        if self.scheduled():
+            violations = self.check(state, action)
+        self.step += 1
+        return violations
+
+    def check(self, state: Fluents, action: Optional[Fluents] = None) -> List[Violation]:
+        '''Checks a batch of states, and actions if given, regardless of the schedule.
+
+        Returns:
+            List[Violation]: The violations found.
+
+        Raises:
+            ValueError: If `strict` and some constraint is violated.
+        '''
+        self.checked += 1
+        fluents = dict(state)
+        if action is not None:
+            fluents.update(action)
+
+        violations = []
+        for kind, (exprs, functions) in self._constraints.items():
+            if kind == 'constraints' and action is None:
+                continue
+            for index, function in enumerate(functions):
+                satisfied = function(fluents)
+                if not satisfied.all():
+                    violations.append(Violation(self.step, kind, index, np.flatnonzero(~satisfied)))
+
+        self.violations += violations
+        if self.strict and violations:
+            raise ValueError(self.describe(violations[0]))
+        return violations
+
+    def describe(self, violation: Violation) -> str:
+        '''Returns a description of the `violation`.'''
+        exprs, _ = self._constraints[violation.kind]
+        rows = violation.rows
+        sample = ', '.join(str(row) for row in rows[:8]) + (', ...' if len(rows) > 8 else '')
+        return 'Step {}: {}[{}] violated by {} batch element(s) [{}]:\n{}'.format(
+            violation.step, violation.kind, violation.index, len(rows), sample, exprs[violation.index])
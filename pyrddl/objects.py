@@ -0,0 +1,320 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import collections.abc
+import itertools
+import numpy as np
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+FNV_OFFSET = np.uint64(14695981039346656037)
+
+FNV_PRIME = np.uint64(1099511628211)
+
+FIBONACCI_MULTIPLIER = np.uint64(11400714819323198485)
+
+
+class ObjectType(object):
+    '''Objects of an RDDL object or enum type backed by NumPy arrays.
+
+    Objects are stored in declaration order, which defines their index.
+    A hash table of the object names, built on first use, supports
+    vectorized name to index conversion.
+
+    For compatibility with the former dict-based object table, the keys
+    'size', 'idx' and 'objects' are also available by subscription.
+
+    Args:
+        name: The type name.
+        objects: The object names in declaration order.
+        enum: True if the type is an enum type.
+
+    Attributes:
+        name (str): The type name.
+        objects (np.ndarray): The object names in declaration order.
+        enum (bool): True if the type is an enum type.
+    '''
+
+    def __init__(self, name: str, objects: Sequence[str], enum: bool = False) -> None:
+        self.name = name
+        self.enum = enum
+        self.objects = np.array(list(objects), dtype=str)
+        if len(np.unique(self.objects)) != len(self.objects):
+            raise ValueError('Duplicate objects in type {}.'.format(name))
+        self._idx = None
+        self._names = None
+        self._tables = {}
+
+    @property
+    def size(self) -> int:
+        '''Returns the number of objects.'''
+        return len(self.objects)
+
+    @property
+    def idx(self) -> Dict[str, int]:
+        '''Returns the mapping from object name to index, built on first use.'''
+        if self._idx is None:
+            self._idx = { obj: i for i, obj in enumerate(self.names) }
+        return self._idx
+
+    @property
+    def names(self) -> List[str]:
+        '''Returns the object names as a list of Python strings.'''
+        if self._names is None:
+            self._names = self.objects.tolist()
+        return self._names
+
+    def index(self, name: str) -> int:
+        '''Returns the index of object `name`.
+
+        Raises:
+            ValueError: If `name` is not an object of the type.
+        '''
+        i = self.idx.get(name)
+        if i is None:
+            raise ValueError('Object {} is not of type {}.'.format(name, self.name))
+        return i
+
+    def names_to_indices(self, names) -> np.ndarray:
+        '''Returns the indices of the object `names`.
+
+        NumPy string arrays are converted without a Python-level loop: names
+        are hashed over their code points (FNV-1a), looked up in an open
+        addressing hash table of the objects, and verified against the
+        matched objects. Other sequences of names are converted by dict
+        lookups in a single pass.
+
+        Args:
+            names: A NumPy string array of any shape, or a sequence of names.
+
+        Returns:
+            np.ndarray: An integer array with the shape of `names`.
+
+        Raises:
+            ValueError: If some name is not an object of the type.
+        '''
+        if not isinstance(names, np.ndarray):
+            try:
+                return np.fromiter(map(self.idx.__getitem__, names), dtype=np.intp, count=len(names))
+            except KeyError as error:
+                raise ValueError('Object {} is not of type {}.'.format(error.args[0], self.name))
+
+        names = names.astype(str, copy=False)
+        if names.size == 0:
+            return np.zeros(names.shape, dtype=np.intp)
+
+        width = max(names.dtype.itemsize, self.objects.dtype.itemsize) // 4
+        objects, hashes, slots = self._hash_table(width)
+        if slots is None:
+            return self.names_to_indices(names.reshape(-1).tolist()).reshape(names.shape)
+
+        codes = _codes(names.reshape(-1), width)
+        query = _fnv1a(codes)
+        home = _home_slot(query, len(slots))
+        mask = len(slots) - 1
+        indices = np.full(len(query), -1, dtype=np.intp)
+        pending = np.arange(len(query))
+        probe = 0
+        while len(pending):
+            candidates = slots[(home[pending] + probe) & mask]
+            empty = candidates < 0
+            hit = ~empty & (hashes[candidates] == query[pending])
+            indices[pending[hit]] = candidates[hit]
+            pending = pending[~(hit | empty)]
+            probe += 1
+
+        found = (indices >= 0) & (objects[indices] == codes).all(axis=1)
+        if not found.all():
+            missing = names.reshape(-1)[~found][0]
+            raise ValueError('Object {} is not of type {}.'.format(missing, self.name))
+        return indices.reshape(names.shape)
+
+    def _hash_table(self, width: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        '''Returns the object code points padded to `width`, their hashes and the hash table.
+
+        The hash table maps slots to object indices, or -1 for empty slots,
+        with linear probing. It is None if two objects have the same hash.
+        Results are cached per `width`.
+        '''
+        if width not in self._tables:
+            objects = _codes(self.objects, width)
+            hashes = _fnv1a(objects)
+            slots = None
+            if len(np.unique(hashes)) == len(hashes):
+                slots = np.full(1 << max(1, (2 * self.size - 1).bit_length()), -1, dtype=np.intp)
+                home = _home_slot(hashes, len(slots))
+                mask = len(slots) - 1
+                pending = np.arange(self.size)
+                probe = 0
+                while len(pending):
+                    pos = (home[pending] + probe) & mask
+                    free = np.flatnonzero(slots[pos] < 0)
+                    _, first = np.unique(pos[free], return_index=True)
+                    inserted = free[first]
+                    slots[pos[inserted]] = pending[inserted]
+                    pending = np.delete(pending, inserted)
+                    probe += 1
+            self._tables[width] = (objects, hashes, slots)
+        return self._tables[width]
+
+    def indices_to_names(self, indices) -> np.ndarray:
+        '''Returns the object names of the given `indices`.
+
+        Args:
+            indices: An array-like of integer indices of any shape.
+
+        Returns:
+            np.ndarray: A string array with the shape of `indices`.
+        '''
+        return self.objects[np.asarray(indices, dtype=np.intp)]
+
+    def __getitem__(self, key: str):
+        '''Returns the 'size', 'idx' or 'objects' entry of the type.'''
+        if key == 'size':
+            return self.size
+        if key == 'idx':
+            return self.idx
+        if key == 'objects':
+            return self.names
+        raise KeyError(key)
+
+    def __len__(self) -> int:
+        '''Returns the number of objects.'''
+        return self.size
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the type.'''
+        kind = 'enum' if self.enum else 'object'
+        return 'ObjectType({}, {}, size={})'.format(self.name, kind, self.size)
+
+
+class ObjectTable(collections.abc.Mapping):
+    '''Mapping from type name to its :obj:`ObjectType`.
+
+    Args:
+        types: The object types.
+    '''
+
+    def __init__(self, types: Sequence[ObjectType]) -> None:
+        self._types = { otype.name: otype for otype in types }
+
+    @classmethod
+    def from_rddl(cls, domain, non_fluents) -> 'ObjectTable':
+        '''Returns the object table of the `domain` types.
+
+        Objects of object types are read from the `non_fluents` block and
+        objects of enum types from the type definition.
+
+        Raises:
+            ValueError: If an object type has no objects.
+        '''
+        objects = dict(non_fluents.objects)
+        types = []
+        for name, value in domain.types:
+            if value == 'object':
+                if name not in objects:
+                    raise ValueError('Type {} has no objects.'.format(name))
+                types.append(ObjectType(name, objects[name]))
+            else:
+                types.append(ObjectType(name, value, enum=True))
+        return cls(types)
+
+    def __getitem__(self, name: str) -> ObjectType:
+        return self._types[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._types)
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def names_to_indices(self, param_types: Sequence[str], names) -> np.ndarray:
+        '''Returns the indices of rows of object names.
+
+        Args:
+            param_types: The type of each column of `names`.
+            names: A NumPy string array of shape (n, len(param_types)), or a
+                sequence of n sequences of len(param_types) object names.
+
+        Returns:
+            np.ndarray: An integer array of shape (n, len(param_types)).
+
+        Raises:
+            ValueError: If a row does not have len(param_types) objects, or
+                an object is not of its column's type.
+        '''
+        arity = len(param_types)
+        if arity == 0:
+            return np.empty((len(names), 0), dtype=np.intp)
+        if isinstance(names, np.ndarray):
+            names = names.reshape(-1, arity)
+            indices = np.empty(names.shape, dtype=np.intp)
+            for j, ptype in enumerate(param_types):
+                indices[:, j] = self[ptype].names_to_indices(names[:, j])
+            return indices
+        for row in names:
+            if len(row) != arity:
+                raise ValueError('Row {} has {} objects, expected {}.'.format(tuple(row), len(row), arity))
+        idx = [self[ptype].idx for ptype in param_types]
+        objects = itertools.chain.from_iterable(names)
+        try:
+            indices = np.fromiter(map(dict.__getitem__, itertools.cycle(idx), objects), dtype=np.intp, count=len(names) * arity)
+        except KeyError as error:
+            obj = error.args[0]
+            ptype = next((ptype for ptype in param_types if obj not in self[ptype].idx), param_types[0])
+            raise ValueError('Object {} is not of type {}.'.format(obj, ptype))
+        return indices.reshape(-1, arity)
+
+    def indices_to_names(self, param_types: Sequence[str], indices) -> np.ndarray:
+        '''Returns the object names of rows of indices.
+
+        Args:
+            param_types: The type of each column of `indices`.
+            indices: An array-like of shape (n, len(param_types)) of indices.
+
+        Returns:
+            np.ndarray: A string array of shape (n, len(param_types)).
+        '''
+        if not param_types:
+            return np.empty((len(indices), 0), dtype=str)
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1, len(param_types))
+        columns = [self[ptype].indices_to_names(indices[:, j]) for j, ptype in enumerate(param_types)]
+        return np.stack(columns, axis=1)
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the table.'''
+        return 'ObjectTable({})'.format(', '.join(repr(otype) for otype in self._types.values()))
+
+
+def _codes(names: np.ndarray, width: int) -> np.ndarray:
+    '''Returns the code points of 1-D string array `names` padded to `width` as a (n, width) array.'''
+    names = np.ascontiguousarray(names, dtype='<U{}'.format(max(width, 1)))
+    return names.view(np.uint32).reshape(len(names), max(width, 1))
+
+
+def _fnv1a(codes: np.ndarray) -> np.ndarray:
+    '''Returns the FNV-1a hash of each row of code points.'''
+    hashes = np.full(codes.shape[0], FNV_OFFSET, dtype=np.uint64)
+    for j in range(codes.shape[1]):
+        hashes ^= codes[:, j]
+        hashes *= FNV_PRIME
+    return hashes
+
+
+def _home_slot(hashes: np.ndarray, size: int) -> np.ndarray:
+    '''Returns the home slot of each hash in a table of `size` slots, a power of two.'''
+    shift = np.uint64(64 - (size.bit_length() - 1))
+    return ((hashes * FIBONACCI_MULTIPLIER) >> shift).astype(np.intp)
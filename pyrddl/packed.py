@@ -0,0 +1,172 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import collections.abc
+import numpy as np
+
+from typing import Dict, Iterator, Optional
+
+WORD_BITS = 64
+
+
+def num_words(batch_size: int) -> int:
+    '''Returns the number of 64-bit words holding `batch_size` bits.'''
+    return -(-batch_size // WORD_BITS)
+
+
+def pack(tensor: np.ndarray) -> np.ndarray:
+    '''Packs a batched boolean tensor along its batch axis into 64-bit words.
+
+    Bit b % 64 of word b // 64 holds batch element b. Padding bits of the
+    last word are zero.
+
+    Args:
+        tensor: A boolean array of shape (batch_size,) + shape.
+
+    Returns:
+        np.ndarray: A uint64 array of shape shape + (num_words(batch_size),).
+    '''
+    tensor = np.asarray(tensor, dtype=bool)
+    batch_size, shape = tensor.shape[0], tensor.shape[1:]
+    rows = tensor.reshape(batch_size, -1).T
+    nbytes = num_words(batch_size) * 8
+    packed = np.zeros((rows.shape[0], nbytes), dtype=np.uint8)
+    packed[:, :-(-batch_size // 8)] = np.packbits(rows, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64, copy=False).reshape(shape + (nbytes // 8,))
+
+
+def unpack(words: np.ndarray, batch_size: int) -> np.ndarray:
+    '''Unpacks 64-bit words into a batched boolean tensor.
+
+    Args:
+        words: A uint64 array of shape shape + (num_words(batch_size),).
+        batch_size: The number of batch elements.
+
+    Returns:
+        np.ndarray: A boolean array of shape (batch_size,) + shape.
+    '''
+    words = np.asarray(words, dtype=np.uint64)
+    shape = words.shape[:-1]
+    data = np.ascontiguousarray(words.reshape(-1, words.shape[-1]), dtype='<u8').view(np.uint8)
+    bits = np.unpackbits(data, axis=1, count=batch_size, bitorder='little').astype(bool)
+    return bits.T.reshape((batch_size,) + shape)
+
+
+def implies(a: np.ndarray, b: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    '''Returns the word-wise implication of packed `a` and `b`.'''
+    return np.bitwise_or(np.invert(a, out=out), b, out=out)
+
+
+def equivalent(a: np.ndarray, b: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    '''Returns the word-wise equivalence of packed `a` and `b`.'''
+    return np.invert(np.bitwise_xor(a, b, out=out), out=out)
+
+
+BOOLEAN_OPS = {
+    '^': np.bitwise_and,
+    '&': np.bitwise_and,
+    '|': np.bitwise_or,
+    '~': np.invert,
+    '=>': implies,
+    '<=>': equivalent
+}
+
+
+class PackedFluents(collections.abc.Mapping):
+    '''Batch of fluent tensors with boolean fluents bit-packed along the batch axis.
+
+    Boolean fluents are stored as uint64 words (see :func:`pack`), using
+    one bit per value instead of one byte. Other fluents are stored as is.
+    Subscription returns unpacked tensors, so that a PackedFluents can be
+    passed wherever a dict of fluent tensors is expected, and only the
+    fluents actually read are unpacked.
+
+    Args:
+        tensors: Mapping from fluent name to its tensor, packed words for
+            names in `packed`.
+        batch_size: The number of batch elements.
+        packed: The names of the packed boolean fluents.
+
+    Attributes:
+        batch_size (int): The number of batch elements.
+        packed (frozenset): The names of the packed boolean fluents.
+    '''
+
+    def __init__(self, tensors: Dict[str, np.ndarray], batch_size: int, packed) -> None:
+        self._tensors = collections.OrderedDict(tensors)
+        self.batch_size = batch_size
+        self.packed = frozenset(packed)
+
+    @classmethod
+    def pack(cls, fluents: Dict[str, np.ndarray]) -> 'PackedFluents':
+        '''Returns the batch of `fluents`, packing those of boolean dtype.
+
+        Boolean tensors with a batch axis of 1 are broadcast to the batch
+        size before packing; other tensors are stored as given and keep a
+        batch axis of 1 in every row range.
+        '''
+        tensors = collections.OrderedDict()
+        packed = []
+        batch_size = max((np.shape(tensor)[0] for tensor in fluents.values()), default=0)
+        for name, tensor in fluents.items():
+            tensor = np.asarray(tensor)
+            if tensor.dtype == np.bool_:
+                tensor = pack(np.broadcast_to(tensor, (batch_size,) + tensor.shape[1:]))
+                packed.append(name)
+            tensors[name] = tensor
+        return cls(tensors, batch_size, packed)
+
+    def words(self, name: str) -> np.ndarray:
+        '''Returns the packed words of boolean fluent `name`.'''
+        if name not in self.packed:
+            raise ValueError('Fluent {} is not packed.'.format(name))
+        return self._tensors[name]
+
+    def rows(self, start: int, stop: int) -> 'PackedFluents':
+        '''Returns the batch elements in [start, stop), with `start` a multiple of 64.'''
+        if start % WORD_BITS:
+            raise ValueError('Packed row range must start at a word boundary, got {}.'.format(start))
+        stop = min(stop, self.batch_size)
+        words = slice(start // WORD_BITS, num_words(stop))
+        tensors = collections.OrderedDict()
+        for name, tensor in self._tensors.items():
+            if name in self.packed:
+                tensor = tensor[..., words]
+            elif tensor.shape[0] == self.batch_size:
+                tensor = tensor[start:stop]
+            tensors[name] = tensor
+        return PackedFluents(tensors, stop - start, self.packed)
+
+    def unpack(self) -> Dict[str, np.ndarray]:
+        '''Returns all fluent tensors unpacked.'''
+        return collections.OrderedDict((name, self[name]) for name in self)
+
+    @property
+    def nbytes(self) -> int:
+        '''Returns the number of bytes of the stored tensors.'''
+        return sum(tensor.nbytes for tensor in self._tensors.values())
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        tensor = self._tensors[name]
+        if name in self.packed:
+            return unpack(tensor, self.batch_size)
+        return tensor
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tensors)
+
+    def __len__(self) -> int:
+        return len(self._tensors)
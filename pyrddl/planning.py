@@ -0,0 +1,192 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import codegen
+from pyrddl import tensors
+
+import numpy as np
+
+from typing import Dict, Optional, Tuple
+
+Fluents = Dict[str, np.ndarray]
+
+
+class CommonRandomNumbers(object):
+    '''Random generator sharing samples across the candidates of a batch.
+
+    The batch is laid out as `samples` blocks of `candidates` consecutive
+    elements, i.e. element m * candidates + k is the m-th sampled future
+    of the k-th candidate. Each draw is made once per sampled future and
+    repeated for every candidate, so that all candidates are evaluated
+    under the same random outcomes (common random numbers).
+
+    It implements the generator methods called by the code of
+    :mod:`pyrddl.codegen`. Gamma and Poisson samples are only shared when
+    their parameters are the same for all batch elements; otherwise they
+    are drawn independently for each element. Other methods are
+    delegated to the wrapped generator.
+
+    Args:
+        rng: The wrapped generator.
+        candidates: The number of candidates sharing each sample.
+    '''
+
+    def __init__(self, rng: np.random.Generator, candidates: int) -> None:
+        self.rng = rng
+        self.candidates = candidates
+
+    def random(self, size=None, out=None) -> np.ndarray:
+        '''Returns uniform samples in [0, 1).'''
+        return self._common(self.rng.random, (), size, out)
+
+    def standard_normal(self, size=None, out=None) -> np.ndarray:
+        '''Returns standard normal samples.'''
+        return self._common(self.rng.standard_normal, (), size, out)
+
+    def standard_exponential(self, size=None, out=None) -> np.ndarray:
+        '''Returns standard exponential samples.'''
+        return self._common(self.rng.standard_exponential, (), size, out)
+
+    def standard_gamma(self, shape, size=None, out=None) -> np.ndarray:
+        '''Returns standard gamma samples of given `shape`.'''
+        if self._is_common(shape):
+            return self._common(self.rng.standard_gamma, (self._squeeze(shape),), size, out)
+        return self.rng.standard_gamma(shape, size=size, out=out)
+
+    def poisson(self, lam, size=None) -> np.ndarray:
+        '''Returns Poisson samples of given rate `lam`.'''
+        if self._is_common(lam):
+            return self._common(self.rng.poisson, (self._squeeze(lam),), size, None)
+        return self.rng.poisson(lam, size=size)
+
+    def __getattr__(self, name: str):
+        return getattr(self.rng, name)
+
+    def _common(self, sampler, args: Tuple, size, out) -> np.ndarray:
+        '''Returns the samples of `sampler` drawn per sampled future and repeated per candidate.'''
+        shape = tuple(out.shape) if out is not None else tuple(size)
+        if shape[0] % self.candidates:
+            raise ValueError('Batch size {} is not a multiple of the number of candidates {}.'.format(shape[0], self.candidates))
+        draws = sampler(*args, size=(shape[0] // self.candidates,) + shape[1:])
+        result = np.repeat(draws, self.candidates, axis=0)
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    @classmethod
+    def _is_common(cls, param) -> bool:
+        '''Returns True if the distribution parameter `param` is the same for all batch elements.'''
+        return np.ndim(param) == 0 or np.shape(param)[0] == 1
+
+    @classmethod
+    def _squeeze(cls, param):
+        '''Returns `param` without its unit batch axis.'''
+        return param if np.ndim(param) == 0 else np.asarray(param)[0]
+
+
+class PlanEvaluator(object):
+    '''Batched evaluator of open-loop plans of an RDDL model.
+
+    A batch of K candidate plans, each a sequence of actions over a
+    horizon, is simulated from an initial state over M sampled futures
+    in a single batch of K * M trajectories, with one call of the
+    compiled step function per timestep. By default, all candidates see
+    the same random outcomes in each sampled future (see
+    :class:`CommonRandomNumbers`), which reduces the variance of the
+    comparison between candidates. The last timestep only evaluates the
+    reward (see :func:`pyrddl.codegen.compile_step`).
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        discount (float): The instance's discount factor.
+    '''
+
+    def __init__(self, rddl, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        self.discount = float(getattr(rddl.instance, 'discount', 1.0))
+        self._module = codegen.compile_step(rddl, cache_dir)
+
+    def __call__(self,
+            plans: Fluents,
+            state: Optional[Fluents] = None,
+            samples: int = 1,
+            seed: Optional[int] = None,
+            common: bool = True) -> np.ndarray:
+        '''Returns the discounted return of each plan in each sampled future.
+
+        Args:
+            plans: Mapping from action fluent name to a tensor of shape
+                (K, horizon) + shape. Missing action fluents are kept at
+                their defaults.
+            state: Mapping from state fluent name to a tensor of shape
+                shape or (1,) + shape. Defaults to the initial state.
+            samples: The number M of sampled futures.
+            seed: The seed of the random generator.
+            common: If True, use common random numbers across plans.
+
+        Returns:
+            np.ndarray: A float64 array of shape (K, M).
+
+        Raises:
+            ValueError: If `plans` is empty or plans disagree on K or the horizon.
+        '''
+        domain = self.rddl.domain
+        plans = { name: np.asarray(plan) for name, plan in plans.items() }
+        if not plans:
+            raise ValueError('No action fluent given in plans.')
+        candidates, horizon = next(iter(plans.values())).shape[:2]
+        for name, plan in plans.items():
+            if plan.shape[:2] != (candidates, horizon):
+                raise ValueError('Plan of {} has shape {}, expected ({}, {}, ...).'.format(
+                    name, plan.shape, candidates, horizon))
+
+        batch_size = candidates * samples
+        rng = np.random.default_rng(seed)
+        if common:
+            rng = CommonRandomNumbers(rng, candidates)
+
+        if state is None:
+            state = self.rddl.initial_state_tensors()
+        current = {}
+        for name, shape in zip(domain.state_fluent_ordering, self.rddl.state_size):
+            tensor = np.asarray(state[name]).reshape((-1,) + tuple(shape))
+            current[name] = np.broadcast_to(tensor, (batch_size,) + tuple(shape))
+
+        defaults = {}
+        for name, shape in zip(domain.action_fluent_ordering, self.rddl.action_size):
+            if name not in plans:
+                pvar = domain.action_fluents[name]
+                dtype = tensors.range_dtype(pvar.range, self.rddl.object_table)
+                defaults[name] = np.full((batch_size,) + tuple(shape), pvar.default, dtype=dtype)
+
+        step = self._module.make_step(batch_size)
+        returns = np.zeros(batch_size)
+        for t in range(horizon):
+            action = dict(defaults)
+            for name, plan in plans.items():
+                actions = plan[:, t]
+                action[name] = np.broadcast_to(actions, (samples,) + actions.shape).reshape((batch_size,) + actions.shape[1:])
+            if t < horizon - 1:
+                _, current, reward = step(current, action, rng)
+            else:
+                reward = self._module.reward(current, action, rng)
+            returns += self.discount ** t * reward
+
+        return returns.reshape(samples, candidates).T
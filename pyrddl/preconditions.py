@@ -0,0 +1,163 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.expr import Expression
+from pyrddl.packed import PackedFluents
+from pyrddl import codegen
+from pyrddl import packed
+from pyrddl import tensors
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+Fluents = Dict[str, np.ndarray]
+
+
+def action_preconditions(domain) -> List[Tuple[Optional[str], Expression]]:
+    '''Returns the action preconditions of a built `domain` in checking order.
+
+    Local preconditions, which constrain a single action fluent, come
+    first, grouped by action fluent in canonical order. Global
+    preconditions follow in declaration order.
+
+    Returns:
+        List[Tuple[Optional[str], Expression]]: The constrained action
+        fluent (None for global preconditions) and expression of each
+        precondition.
+    '''
+    local = domain.local_action_preconditions
+    preconds = []
+    for name in domain.action_fluent_ordering:
+        preconds += [(name, expr) for expr in local.get(name, [])]
+    preconds += [(None, expr) for expr in domain.global_action_preconditions]
+    return preconds
+
+
+class PreconditionChecker(object):
+    '''Batched feasibility checker of the action preconditions of an RDDL model.
+
+    Each precondition is compiled into a vectorized function over a batch
+    of (state, action) candidates. Preconditions are evaluated in the
+    order of :func:`action_preconditions`, and each one only on the
+    candidates that satisfied all previous ones, so that candidates
+    failing a cheap local precondition skip the remaining checks.
+
+    Args:
+        rddl: A built RDDL object.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        preconditions (List[Tuple[Optional[str], Expression]]): The
+            preconditions in checking order.
+    '''
+
+    def __init__(self, rddl, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        self.preconditions = action_preconditions(rddl.domain)
+        exprs = [expr for _, expr in self.preconditions]
+        self._functions = codegen.compile_constraints(rddl, 'preconds', exprs, cache_dir).CONSTRAINTS
+
+    def __call__(self, state: Fluents, action: Fluents) -> np.ndarray:
+        '''Returns the feasibility mask of a batch of candidate actions.
+
+        Args:
+            state: Mapping from state fluent name to a tensor of shape
+                (batch_size,) + shape, or (1,) + shape for a state shared by
+                all candidates.
+            action: Mapping from action fluent name to a tensor of shape
+                (batch_size,) + shape.
+
+        Returns:
+            np.ndarray: Boolean array of shape (batch_size,), True for
+            candidates satisfying all preconditions.
+        '''
+        return self.first_violation(state, action) < 0
+
+    def first_violation(self, state: Fluents, action: Fluents) -> np.ndarray:
+        '''Returns the index of the first precondition violated by each candidate.
+
+        Args:
+            state: Mapping from state fluent name to a batched tensor.
+            action: Mapping from action fluent name to a batched tensor.
+
+        Returns:
+            np.ndarray: Integer array of shape (batch_size,) with the index
+            in `preconditions` of the first violated precondition, or -1
+            for feasible candidates.
+        '''
+        fluents = self._broadcast(state, action)
+        batch_size = tensors.batch_size(fluents)
+        violation = np.full(batch_size, -1, dtype=np.intp)
+        rows = None
+        candidates = fluents
+        for k, function in enumerate(self._functions):
+            satisfied = function(candidates)
+            if satisfied.all():
+                continue
+            failed = ~satisfied
+            if rows is None:
+                violation[failed] = k
+                rows = np.flatnonzero(satisfied)
+            else:
+                violation[rows[failed]] = k
+                rows = rows[satisfied]
+            if len(rows) == 0:
+                break
+            candidates = tensors.RowSubset(fluents, rows)
+        return violation
+
+    def packed_mask(self, state: Fluents, action: PackedFluents, chunk_size: int = 65536) -> np.ndarray:
+        '''Returns the packed feasibility mask of a bit-packed batch of candidate actions.
+
+        Candidates are unpacked and checked `chunk_size` rows at a time, so
+        that only one chunk of candidates is held unpacked in memory.
+
+        Args:
+            state: Mapping from state fluent name to a tensor of shape
+                (1,) + shape, or to a batched tensor.
+            action: The bit-packed candidate actions.
+            chunk_size: The number of candidates checked at a time, rounded
+                up to a multiple of 64.
+
+        Returns:
+            np.ndarray: The uint64 words of the feasibility mask (see
+            :func:`pyrddl.packed.pack`).
+        '''
+        chunk_size = packed.num_words(chunk_size) * packed.WORD_BITS
+        words = np.empty(packed.num_words(action.batch_size), dtype=np.uint64)
+        for start in range(0, action.batch_size, chunk_size):
+            chunk = action.rows(start, start + chunk_size)
+            rows = slice(start, start + chunk.batch_size)
+            chunk_state = {
+                name: tensor[rows] if np.shape(tensor)[0] > 1 else tensor
+                for name, tensor in state.items()
+            }
+            mask = self(chunk_state, chunk)
+            words[start // packed.WORD_BITS:packed.num_words(start + chunk.batch_size)] = packed.pack(mask)
+        return words
+
+    def _broadcast(self, state: Fluents, action: Fluents) -> Fluents:
+        '''Returns the state and action fluents broadcast to the candidate batch size.'''
+        fluents = dict(action)
+        batch_size = tensors.batch_size(fluents)
+        for name, tensor in state.items():
+            tensor = np.asarray(tensor)
+            if tensor.shape[0] != batch_size:
+                tensor = np.broadcast_to(tensor, (batch_size,) + tensor.shape[1:])
+            fluents[name] = tensor
+        return fluents
+
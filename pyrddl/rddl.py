@@ -14,18 +14,23 @@
 # along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
 
 
+from pyrddl.dependency import DependencyGraph
 from pyrddl.domain import Domain
+from pyrddl.grounding import GroundedFluentView
 from pyrddl.instance import Instance
 from pyrddl.nonfluents import NonFluents
+from pyrddl.objects import ObjectTable
+from pyrddl.pvariable import PVariable
+from pyrddl import tensors
 
 import collections
-import itertools
-from typing import Dict, List, Sequence, Optional, Tuple, Union
+import numpy as np
+from typing import Dict, List, Sequence, Optional, Set, Tuple, Union
 
 Block = Union[Domain, NonFluents, Instance]
-ObjectStruct = Dict[str, Union[int, Dict[str, int], List[str]]]
-ObjectTable = Dict[str, ObjectStruct]
-FluentParamsList = Sequence[Tuple[str, List[str]]]
+FluentParamsList = Sequence[Tuple[str, GroundedFluentView]]
+
+FluentTables = collections.namedtuple('FluentTables', ['size', 'range_type', 'variables'])
 
 
 class RDDL(object):
@@ -49,26 +54,60 @@ class RDDL(object):
         self.domain = blocks['domain']
         self.non_fluents = blocks['non_fluents']
         self.instance = blocks['instance']
+        self._tables = None
 
     def build(self):
         self.domain.build()
         self._build_object_table()
+        self._build_fluent_tables()
         self._build_fluent_table()
+        self._build_dependency_graph()
+
+    @property
+    def object_table(self) -> ObjectTable:
+        '''Returns the object table for each RDDL type.'''
+        return self._object_table
+
+    @object_table.setter
+    def object_table(self, object_table: ObjectTable) -> None:
+        '''Sets the object table and invalidates the fluent tables.'''
+        self._object_table = object_table
+        self.invalidate_fluent_tables()
+
+    def invalidate_fluent_tables(self) -> None:
+        '''Discards the cached size, range type and variable tables.
+
+        Assigning a new object table already invalidates them. This method
+        must be called after modifying the object table in place.
+        '''
+        self._tables = None
 
     def _build_object_table(self):
-        '''Builds the object table for each RDDL type.'''
-        types = self.domain.types
-        objects = dict(self.non_fluents.objects)
-        self.object_table = dict()
-        for name, value in self.domain.types:
-            if value == 'object':
-                objs = objects[name]
-                idx = { obj: i for i, obj in enumerate(objs) }
-                self.object_table[name] = {
-                    'size': len(objs),
-                    'idx': idx,
-                    'objects': objs
-                }
+        '''Builds the object table for each RDDL object and enum type.'''
+        self.object_table = ObjectTable.from_rddl(self.domain, self.non_fluents)
+
+    def _build_fluent_tables(self):
+        '''Builds the size, range type and variable tables of each fluent kind.'''
+        domain = self.domain
+        kinds = {
+            'non-fluent': (domain.non_fluents, domain.non_fluent_ordering),
+            'state-fluent': (domain.state_fluents, domain.state_fluent_ordering),
+            'action-fluent': (domain.action_fluents, domain.action_fluent_ordering),
+            'interm-fluent': (domain.intermediate_fluents, domain.interm_fluent_ordering)
+        }
+        tables = {}
+        for kind, (fluents, ordering) in kinds.items():
+            tables[kind] = FluentTables(
+                size=self._fluent_size(fluents, ordering),
+                range_type=self._fluent_range_type(fluents, ordering),
+                variables=self._fluent_params(fluents, ordering))
+        self._tables = tables
+
+    def _fluent_tables(self, kind: str) -> FluentTables:
+        '''Returns the tables of the given fluent `kind`, building them if invalidated.'''
+        if self._tables is None:
+            self._build_fluent_tables()
+        return self._tables[kind]
 
     def _build_fluent_table(self):
         '''Builds the fluent table for each RDDL pvariable.'''
@@ -90,53 +129,52 @@ class RDDL(object):
             fluent = self.domain.intermediate_fluents[name]
             self.fluent_table[name] = (fluent, size)
 
+    def _build_dependency_graph(self):
+        '''Builds the dependency graph of all fluents, CPFs, reward and constraints.'''
+        graph = DependencyGraph.from_rddl(self)
+        self.dependency_graph = graph
+        self._interm_mask = graph.mask(self.domain.intermediate_fluents)
+        self._node_fluents = [self.fluent_table.get(name, (None, None))[0] for name in graph.nodes]
+
     @property
     def non_fluent_variables(self) -> FluentParamsList:
         '''Returns the instantiated non-fluents in canonical order.
 
         Returns:
-            Sequence[Tuple[str, List[str]]]: A tuple of pairs of fluent name
-            and a list of instantiated fluents represented as strings.
+            Sequence[Tuple[str, GroundedFluentView]]: A tuple of pairs of fluent name
+            and a lazy view of instantiated fluents represented as strings.
         '''
-        fluents = self.domain.non_fluents
-        ordering = self.domain.non_fluent_ordering
-        return self._fluent_params(fluents, ordering)
+        return self._fluent_tables('non-fluent').variables
 
     @property
     def state_fluent_variables(self) -> FluentParamsList:
         '''Returns the instantiated state fluents in canonical order.
 
         Returns:
-            Sequence[Tuple[str, List[str]]]: A tuple of pairs of fluent name
-            and a list of instantiated fluents represented as strings.
+            Sequence[Tuple[str, GroundedFluentView]]: A tuple of pairs of fluent name
+            and a lazy view of instantiated fluents represented as strings.
         '''
-        fluents = self.domain.state_fluents
-        ordering = self.domain.state_fluent_ordering
-        return self._fluent_params(fluents, ordering)
+        return self._fluent_tables('state-fluent').variables
 
     @property
     def interm_fluent_variables(self) -> FluentParamsList:
         '''Returns the instantiated intermediate fluents in canonical order.
 
         Returns:
-            Sequence[Tuple[str, List[str]]]: A tuple of pairs of fluent name
-            and a list of instantiated fluents represented as strings.
+            Sequence[Tuple[str, GroundedFluentView]]: A tuple of pairs of fluent name
+            and a lazy view of instantiated fluents represented as strings.
         '''
-        fluents = self.domain.intermediate_fluents
-        ordering = self.domain.interm_fluent_ordering
-        return self._fluent_params(fluents, ordering)
+        return self._fluent_tables('interm-fluent').variables
 
     @property
     def action_fluent_variables(self) -> FluentParamsList:
         '''Returns the instantiated action fluents in canonical order.
 
         Returns:
-            Sequence[Tuple[str, List[str]]]: A tuple of pairs of fluent name
-            and a list of instantiated fluents represented as strings.
+            Sequence[Tuple[str, GroundedFluentView]]: A tuple of pairs of fluent name
+            and a lazy view of instantiated fluents represented as strings.
         '''
-        fluents = self.domain.action_fluents
-        ordering = self.domain.action_fluent_ordering
-        return self._fluent_params(fluents, ordering)
+        return self._fluent_tables('action-fluent').variables
 
     @property
     def non_fluent_size(self) -> Sequence[Sequence[int]]:
@@ -146,9 +184,7 @@ class RDDL(object):
             Sequence[Sequence[int]]: A tuple of tuple of integers
             representing the shape and size of each non-fluent.
         '''
-        fluents = self.domain.non_fluents
-        ordering = self.domain.non_fluent_ordering
-        return self._fluent_size(fluents, ordering)
+        return self._fluent_tables('non-fluent').size
 
     @property
     def state_size(self) -> Sequence[Sequence[int]]:
@@ -158,9 +194,7 @@ class RDDL(object):
             Sequence[Sequence[int]]: A tuple of tuple of integers
             representing the shape and size of each fluent.
         '''
-        fluents = self.domain.state_fluents
-        ordering = self.domain.state_fluent_ordering
-        return self._fluent_size(fluents, ordering)
+        return self._fluent_tables('state-fluent').size
 
     @property
     def action_size(self) -> Sequence[Sequence[int]]:
@@ -170,9 +204,7 @@ class RDDL(object):
             Sequence[Sequence[int]]: A tuple of tuple of integers
             representing the shape and size of each fluent.
         '''
-        fluents = self.domain.action_fluents
-        ordering = self.domain.action_fluent_ordering
-        return self._fluent_size(fluents, ordering)
+        return self._fluent_tables('action-fluent').size
 
     @property
     def interm_size(self)-> Sequence[Sequence[int]]:
@@ -182,9 +214,7 @@ class RDDL(object):
             Sequence[Sequence[int]]: A tuple of tuple of integers
             representing the shape and size of each fluent.
         '''
-        fluents = self.domain.intermediate_fluents
-        ordering = self.domain.interm_fluent_ordering
-        return self._fluent_size(fluents, ordering)
+        return self._fluent_tables('interm-fluent').size
 
     @property
     def state_range_type(self) -> Sequence[str]:
@@ -194,9 +224,7 @@ class RDDL(object):
             Sequence[str]: A tuple of range types representing
             the range of each fluent.
         '''
-        fluents = self.domain.state_fluents
-        ordering = self.domain.state_fluent_ordering
-        return self._fluent_range_type(fluents, ordering)
+        return self._fluent_tables('state-fluent').range_type
 
     @property
     def action_range_type(self) -> Sequence[str]:
@@ -206,9 +234,7 @@ class RDDL(object):
             Sequence[str]: A tuple of range types representing
             the range of each fluent.
         '''
-        fluents = self.domain.action_fluents
-        ordering = self.domain.action_fluent_ordering
-        return self._fluent_range_type(fluents, ordering)
+        return self._fluent_tables('action-fluent').range_type
 
     @property
     def interm_range_type(self) -> Sequence[str]:
@@ -218,9 +244,7 @@ class RDDL(object):
             Sequence[str]: A tuple of range types representing
             the range of each fluent.
         '''
-        fluents = self.domain.intermediate_fluents
-        ordering = self.domain.interm_fluent_ordering
-        return self._fluent_range_type(fluents, ordering)
+        return self._fluent_tables('interm-fluent').range_type
 
     @classmethod
     def _fluent_range_type(cls, fluents, ordering) -> Sequence[str]:
@@ -240,28 +264,19 @@ class RDDL(object):
     def _fluent_params(self, fluents, ordering) -> FluentParamsList:
         '''Returns the instantiated `fluents` for the given `ordering`.
 
-        For each fluent in `fluents`, it instantiates each parameter
-        type w.r.t. the contents of the object table.
+        For each fluent in `fluents`, it returns a lazy view of the
+        instantiations of each parameter type w.r.t. the contents of
+        the object table.
 
         Returns:
-            Sequence[Tuple[str, List[str]]]: A tuple of pairs of fluent name
-            and a list of instantiated fluents represented as strings.
+            Sequence[Tuple[str, GroundedFluentView]]: A tuple of pairs of fluent name
+            and a view of instantiated fluents represented as strings.
         '''
         variables = []
         for fluent_id in ordering:
             fluent = fluents[fluent_id]
-            param_types = fluent.param_types
-            objects = ()
-            names = []
-            if param_types is None:
-                names = [fluent.name]
-            else:
-                objects = tuple(self.object_table[ptype]['objects'] for ptype in param_types)
-                for values in itertools.product(*objects):
-                    values = ','.join(values)
-                    var_name = '{}({})'.format(fluent.name, values)
-                    names.append(var_name)
-            variables.append((fluent_id, names))
+            view = GroundedFluentView(fluent.name, fluent.param_types, self.object_table)
+            variables.append((fluent_id, view))
         return tuple(variables)
 
     def _fluent_size(self, fluents, ordering) -> Sequence[Sequence[int]]:
@@ -284,20 +299,65 @@ class RDDL(object):
         shape = tuple(self.object_table[ptype]['size'] for ptype in param_types)
         return shape
 
-    def get_dependencies(self, expr):
-        deps = set()
+    def non_fluent_tensors(self, narrow: bool = False) -> Dict[str, np.ndarray]:
+        '''Returns the tensor of each non-fluent in canonical order.
 
-        expressions = [expr]
-        while expressions:
-            expr = expressions.pop()
+        Each tensor has the fluent's shape and range dtype, and is filled
+        with the fluent's default and the non-fluents block initializers.
 
-            for name in expr.scope:
-                fluent, _ = self.fluent_table[name]
+        Args:
+            narrow: If True, use 32-bit integers and floats.
 
-                if fluent.is_intermediate_fluent():
-                    cpf = self.domain.get_intermediate_cpf(name)
-                    expressions.append(cpf.expr)
-                else:
-                    deps.add(fluent)
+        Returns:
+            Dict[str, np.ndarray]: Mapping from non-fluent name to its tensor.
+        '''
+        fluents = self.domain.non_fluents
+        ordering = self.domain.non_fluent_ordering
+        initializers = getattr(self.non_fluents, 'init_non_fluent', [])
+        return self._fluent_tensors(fluents, ordering, self.non_fluent_size, initializers, narrow)
+
+    def initial_state_tensors(self, narrow: bool = False) -> Dict[str, np.ndarray]:
+        '''Returns the initial tensor of each state fluent in canonical order.
+
+        Each tensor has the fluent's shape and range dtype, and is filled
+        with the fluent's default and the instance init-state initializers.
+
+        Args:
+            narrow: If True, use 32-bit integers and floats.
+
+        Returns:
+            Dict[str, np.ndarray]: Mapping from state fluent name to its tensor.
+        '''
+        fluents = self.domain.state_fluents
+        ordering = self.domain.state_fluent_ordering
+        initializers = getattr(self.instance, 'init_state', [])
+        return self._fluent_tensors(fluents, ordering, self.state_size, initializers, narrow)
+
+    def _fluent_tensors(self, fluents, ordering, sizes, initializers, narrow: bool) -> Dict[str, np.ndarray]:
+        '''Returns the tensors of `fluents` in the given `ordering` built from `initializers`.'''
+        groups = tensors.initializer_groups(initializers, ordering)
+        result = collections.OrderedDict()
+        for name, shape in zip(ordering, sizes):
+            result[name] = tensors.fluent_tensor(fluents[name], shape, self.object_table, groups[name], narrow)
+        return result
+
+    def get_dependencies(self, expr) -> Set[PVariable]:
+        '''Returns the fluents `expr` depends on through intermediate CPFs.
 
-        return deps
+        Args:
+            expr (:obj:`Expression`): An RDDL expression.
+
+        Returns:
+            Set[PVariable]: The non-intermediate fluents in the transitive scope of `expr`.
+        '''
+        graph = self.dependency_graph
+        interms = self._interm_mask
+        mask = 0
+        for name in expr.scope:
+            bit = 1 << graph.index[name]
+            if bit & interms:
+                mask |= graph.ancestors_mask([name]) & ~interms
+            else:
+                mask |= bit
+        fluents = self._node_fluents
+        return { fluents[i] for i in graph.indices(mask) }
@@ -0,0 +1,168 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import codegen
+
+import concurrent.futures
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+Tensors = Dict[str, np.ndarray]
+
+
+def cpf_names(rddl) -> List[str]:
+    '''Returns the names of the intermediate and next state CPFs in canonical order.'''
+    domain = rddl.domain
+    return [cpf.name for cpf in domain.intermediate_cpfs + domain.state_cpfs]
+
+
+def dependency_levels(rddl) -> Dict[str, int]:
+    '''Returns the level of each CPF implied by its data dependencies.
+
+    A CPF that reads no intermediate or next state fluent has level 1.
+    Any other CPF has a level one greater than the highest level among
+    the CPFs it reads.
+
+    Args:
+        rddl: A built RDDL object.
+
+    Returns:
+        Dict[str, int]: Mapping from CPF name to its level.
+
+    Raises:
+        ValueError: If the CPFs have cyclic dependencies.
+    '''
+    graph = rddl.dependency_graph
+    names = cpf_names(rddl)
+    cpfs = set(names)
+    for cycle in graph.cycles:
+        if cpfs.intersection(cycle):
+            raise ValueError('Cyclic CPF dependencies: {}'.format(cycle))
+
+    levels = {}
+    for name in graph.topological_order:
+        if name in cpfs:
+            parents = [levels[parent] for parent in graph.parents(name) if parent in levels]
+            levels[name] = 1 + max(parents, default=0)
+    return { name: levels[name] for name in names }
+
+
+def evaluation_waves(rddl) -> List[List[str]]:
+    '''Returns the CPFs grouped in waves of mutually independent CPFs.
+
+    Every CPF of a wave reads only fluents computed in earlier waves, so
+    the CPFs of a wave can be evaluated concurrently. Waves follow the
+    data dependencies, not the declared levels, and CPFs within a wave
+    follow the canonical order.
+
+    Args:
+        rddl: A built RDDL object.
+
+    Returns:
+        List[List[str]]: The CPF names of each wave.
+    '''
+    levels = dependency_levels(rddl)
+    waves = [[] for _ in range(max(levels.values(), default=0))]
+    for name, level in levels.items():
+        waves[level - 1].append(name)
+    return waves
+
+
+def validate_levels(rddl) -> None:
+    '''Checks the declared levels of intermediate fluents against their dependencies.
+
+    Args:
+        rddl: A built RDDL object.
+
+    Raises:
+        ValueError: If an intermediate fluent reads an intermediate fluent
+            of the same or a higher declared level.
+    '''
+    graph = rddl.dependency_graph
+    interms = rddl.domain.intermediate_fluents
+    errors = []
+    for name in rddl.domain.interm_fluent_ordering:
+        level = interms[name].level
+        for parent in sorted(graph.parents(name)):
+            if parent in interms and interms[parent].level >= level:
+                errors.append('{} (level {}) reads {} (level {})'.format(name, level, parent, interms[parent].level))
+    if errors:
+        raise ValueError('Inconsistent intermediate fluent levels: {}'.format('; '.join(errors)))
+
+
+class ScheduledStep(object):
+    '''Step function evaluating independent CPFs concurrently.
+
+    CPFs are evaluated wave by wave (see :func:`evaluation_waves`). The
+    CPFs of a wave are submitted to a thread pool, as NumPy releases the
+    GIL in large ufuncs. Each CPF samples from its own generator, seeded
+    from the step's generator in canonical CPF order, so results do not
+    depend on thread timing or on the number of workers. Random values
+    differ from those of :func:`pyrddl.codegen.compile_step`.
+
+    Args:
+        rddl: A built RDDL object.
+        max_workers: Maximum number of threads. Defaults to the executor's default.
+        cache_dir: Directory of generated modules. Defaults to codegen.DEFAULT_CACHE_DIR.
+
+    Attributes:
+        waves (List[List[str]]): The CPF names of each wave.
+    '''
+
+    def __init__(self, rddl, max_workers: Optional[int] = None, cache_dir: Optional[str] = None) -> None:
+        self.rddl = rddl
+        self.waves = evaluation_waves(rddl)
+        self._module = codegen.compile_cpfs(rddl, cache_dir=cache_dir)
+        self._names = cpf_names(rddl)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def __call__(self, state: Tensors, action: Tensors, rng: np.random.Generator) -> Tuple[Tensors, Tensors, np.ndarray]:
+        '''Returns the tuple (interms, next_state, reward) of one step.'''
+        fluents = dict(state)
+        fluents.update(action)
+
+        seeds = rng.integers(0, 2 ** 63 - 1, size=len(self._names) + 1)
+        rngs = { name: np.random.default_rng(seed) for name, seed in zip(self._names, seeds) }
+
+        cpfs = self._module.CPFS
+        for wave in self.waves:
+            if len(wave) == 1:
+                name = wave[0]
+                fluents[name] = cpfs[name](fluents, rngs[name])
+                continue
+            futures = [self._executor.submit(cpfs[name], fluents, rngs[name]) for name in wave]
+            results = [future.result() for future in futures]
+            fluents.update(zip(wave, results))
+
+        reward = self._module.reward(fluents, np.random.default_rng(seeds[-1]))
+
+        domain = self.rddl.domain
+        interms = { name: fluents[name] for name in domain.interm_fluent_ordering }
+        next_state = {}
+        for name, next_name in zip(domain.state_fluent_ordering, domain.next_state_fluent_ordering):
+            next_state[name] = fluents[next_name]
+        return interms, next_state, reward
+
+    def close(self) -> None:
+        '''Shuts down the thread pool.'''
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'ScheduledStep':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
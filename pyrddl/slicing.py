@@ -0,0 +1,132 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl import utils
+from pyrddl.dependency import REWARD
+from pyrddl.domain import Domain
+from pyrddl.instance import Instance
+from pyrddl.nonfluents import NonFluents
+from pyrddl.rddl import RDDL
+
+import collections
+from typing import List, Set, Tuple
+
+SliceReport = collections.namedtuple('SliceReport', ['non_fluents', 'state_fluents', 'action_fluents', 'interm_fluents', 'cpfs'])
+
+
+def root_nodes(rddl) -> List[str]:
+    '''Returns the dependency graph nodes of the reward and of every constraint.'''
+    domain = rddl.domain
+    roots = [REWARD]
+    for section in ['preconds', 'invariants', 'constraints']:
+        roots.extend('{}[{}]'.format(section, i) for i in range(len(getattr(domain, section))))
+    return roots
+
+
+def relevant_fluents(rddl) -> Set[str]:
+    '''Returns the fluents in the backward cone of the reward and the constraints.
+
+    A fluent is relevant if the reward or a constraint reads it, either
+    directly or through CPFs, at the current or at any future timestep.
+    Whenever a state fluent is relevant, the CPF of its next state fluent
+    is followed as well, until no new fluent is reached.
+
+    Args:
+        rddl: A built RDDL object.
+
+    Returns:
+        Set[str]: The names of the relevant fluents and next state fluents.
+    '''
+    graph = rddl.dependency_graph
+    state_fluents = rddl.domain.state_fluents
+    roots = root_nodes(rddl)
+    mask = graph.ancestors_mask(roots)
+    while True:
+        names = graph.names(mask)
+        pending = [utils.rename_state_fluent(name) for name in names if name in state_fluents]
+        pending = [name for name in pending if name in graph.index and name not in names]
+        if not pending:
+            break
+        mask |= graph.ancestors_mask(pending)
+    return graph.names(mask).difference(roots)
+
+
+def slice_rddl(rddl) -> Tuple[RDDL, SliceReport]:
+    '''Returns the RDDL model reduced to its relevant fluents.
+
+    Fluents that influence neither the reward nor any precondition,
+    invariant or state-action constraint (see :func:`relevant_fluents`)
+    are removed together with their CPFs and initializers. The reward,
+    the constraints, the types and the objects are shared with `rddl`,
+    which is left unchanged.
+
+    Args:
+        rddl: A built RDDL object.
+
+    Returns:
+        Tuple[RDDL, SliceReport]: The built reduced RDDL object and the
+        names of the removed fluents of each kind and of the removed CPFs.
+    '''
+    domain = rddl.domain
+    relevant = relevant_fluents(rddl)
+
+    pvariables = [pvar for pvar in domain.pvariables if str(pvar) in relevant]
+    cpfs_name, cpfs = domain.cpfs
+    kept_cpfs = [cpf for cpf in cpfs if cpf.name in relevant]
+
+    sections = {
+        'pvariables': pvariables,
+        'cpfs': (cpfs_name, kept_cpfs),
+        'reward': domain.reward,
+        'types': domain.types,
+        'preconds': domain.preconds,
+        'invariants': domain.invariants,
+        'constraints': domain.constraints
+    }
+    reduced_domain = Domain(domain.name, domain.requirements, sections)
+
+    non_fluents = NonFluents(rddl.non_fluents.name, dict(vars(rddl.non_fluents)))
+    non_fluents.init_non_fluent = _initializers(getattr(rddl.non_fluents, 'init_non_fluent', []), relevant)
+
+    instance = Instance(rddl.instance.name, dict(vars(rddl.instance)))
+    instance.init_state = _initializers(getattr(rddl.instance, 'init_state', []), relevant)
+
+    reduced = RDDL({ 'domain': reduced_domain, 'non_fluents': non_fluents, 'instance': instance })
+    reduced.build()
+
+    report = SliceReport(
+        non_fluents=_removed(domain.non_fluent_ordering, relevant),
+        state_fluents=_removed(domain.state_fluent_ordering, relevant),
+        action_fluents=_removed(domain.action_fluent_ordering, relevant),
+        interm_fluents=_removed(domain.interm_fluent_ordering, relevant),
+        cpfs=tuple(cpf.name for cpf in domain.intermediate_cpfs + domain.state_cpfs if cpf.name not in relevant))
+
+    return reduced, report
+
+
+def _initializers(initializers, relevant: Set[str]) -> list:
+    '''Returns the `initializers` of relevant fluents.'''
+    kept = []
+    for (name, params), value in initializers:
+        fluent = '{}/{}'.format(name, len(params) if params is not None else 0)
+        if fluent in relevant:
+            kept.append(((name, params), value))
+    return kept
+
+
+def _removed(ordering: List[str], relevant: Set[str]) -> Tuple[str, ...]:
+    '''Returns the names in `ordering` that are not relevant.'''
+    return tuple(name for name in ordering if name not in relevant)
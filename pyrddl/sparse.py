@@ -0,0 +1,195 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from typing import Dict, Optional, Sequence, Tuple
+
+SPARSE_DENSITY = 0.01
+
+SPARSE_MIN_SIZE = 1 << 12
+
+
+class SparseTensor(object):
+    '''Coordinate (COO) representation of a non-fluent tensor.
+
+    Entries not listed in `coords` hold the zero of the tensor's dtype.
+    Like the dense non-fluent tensors, a sparse tensor has a leading axis
+    of size 1, which is not represented in `coords`.
+
+    Args:
+        coords: Integer array of shape (arity, nnz) with the entry indices.
+        values: Array of shape (1, nnz) with the entry values.
+        shape: Shape of the tensor without the leading axis.
+
+    Attributes:
+        coords (np.ndarray): Integer array of shape (arity, nnz) with the entry indices.
+        values (np.ndarray): Array of shape (1, nnz) with the entry values.
+        shape (Tuple[int, ...]): Shape of the tensor without the leading axis.
+    '''
+
+    def __init__(self, coords: np.ndarray, values: np.ndarray, shape: Tuple[int, ...]) -> None:
+        self.coords = coords
+        self.values = values
+        self.shape = shape
+        self._dense = None
+        self._sorted = {}
+        self._segments = None
+
+    @property
+    def nnz(self) -> int:
+        '''Returns the number of stored entries.'''
+        return self.values.shape[1]
+
+    @property
+    def dtype(self) -> np.dtype:
+        '''Returns the dtype of the entries.'''
+        return self.values.dtype
+
+    def todense(self) -> np.ndarray:
+        '''Returns the dense tensor with a leading axis of size 1.
+
+        The dense tensor is built on the first call and cached.
+        '''
+        if self._dense is None:
+            dense = np.zeros((1,) + self.shape, dtype=self.dtype)
+            dense[(0,) + tuple(self.coords)] = self.values[0]
+            self._dense = dense
+        return self._dense
+
+    def sorted_by(self, axes: Tuple[int, ...]) -> 'SparseTensor':
+        '''Returns the same tensor with entries sorted by the given `axes`.
+
+        Entries with equal indices on `axes` are contiguous in the result, as
+        required by :func:`segment_sum`. Results are cached per `axes`.
+        '''
+        if axes not in self._sorted:
+            keys = _linear_index(self.coords, self.shape, axes)
+            order = np.argsort(keys, kind='stable')
+            tensor = SparseTensor(self.coords[:, order], self.values[:, order], self.shape)
+            starts = np.flatnonzero(np.r_[True, keys[order][1:] != keys[order][:-1]]) if len(keys) else keys
+            tensor._segments = (axes, starts, keys[order][starts])
+            self._sorted[axes] = tensor
+        return self._sorted[axes]
+
+    def segments(self) -> Tuple[Tuple[int, ...], np.ndarray, np.ndarray]:
+        '''Returns the sorting axes, segment starts and segment keys.'''
+        if self._segments is None:
+            raise ValueError('SparseTensor is not sorted. Use sorted_by first.')
+        return self._segments
+
+    def __repr__(self) -> str:
+        '''Returns a short description of the tensor.'''
+        return 'SparseTensor(shape={}, nnz={}, dtype={})'.format(self.shape, self.nnz, self.dtype)
+
+
+def is_sparse(size: int,
+        nnz: int,
+        default,
+        max_density: float = SPARSE_DENSITY,
+        min_size: int = SPARSE_MIN_SIZE) -> bool:
+    '''Returns True if a tensor should be stored as a SparseTensor.
+
+    Only tensors whose default value is zero qualify, so that the entries
+    left out of the coordinate representation do not contribute to sums of
+    products.
+
+    Args:
+        size: Number of entries of the dense tensor.
+        nnz: Number of non-default entries.
+        default: Default value of the fluent.
+        max_density: Maximum fraction of non-default entries.
+        min_size: Minimum number of entries of the dense tensor.
+
+    Returns:
+        bool: True if the tensor is sparse.
+    '''
+    if default is None or default != 0:
+        return False
+    return size >= min_size and nnz <= max_density * size
+
+
+def from_entries(entries: Dict[Tuple[int, ...], object], shape: Tuple[int, ...], dtype) -> SparseTensor:
+    '''Returns the SparseTensor with given non-zero `entries`.
+
+    Args:
+        entries: Mapping from index tuple to value. Zero values are dropped.
+        shape: Shape of the tensor without the leading axis.
+        dtype: NumPy dtype of the entries.
+
+    Returns:
+        :obj:`SparseTensor`: The sparse tensor.
+    '''
+    entries = [(idx, value) for idx, value in entries.items() if value != 0]
+    coords = np.array([idx for idx, _ in entries], dtype=np.intp).reshape(len(entries), len(shape)).T
+    values = np.array([value for _, value in entries], dtype=dtype).reshape(1, len(entries))
+    return SparseTensor(np.ascontiguousarray(coords), values, shape)
+
+
+def segment_sum(terms: np.ndarray, tensor: SparseTensor, out: Optional[np.ndarray] = None) -> np.ndarray:
+    '''Scatters the per-entry `terms` of a contraction into the output axes.
+
+    Args:
+        terms: Array of shape (batch, nnz, *rest) indexed by the entries of `tensor`.
+        tensor: A SparseTensor returned by :meth:`SparseTensor.sorted_by`.
+        out: Optional array of shape (batch, *kept_dims, *rest) to write into.
+
+    Returns:
+        np.ndarray: The sums of the terms of each segment, of shape (batch, *kept_dims, *rest).
+    '''
+    return _segment_reduce(np.add, 0, terms, tensor, out)
+
+
+def segment_any(terms: np.ndarray, tensor: SparseTensor, out: Optional[np.ndarray] = None) -> np.ndarray:
+    '''Returns whether any per-entry term of each segment is true.
+
+    Segments without entries are false. Arguments are as in :func:`segment_sum`;
+    `terms` may have an entry axis of size 1 to be broadcast.
+    '''
+    return _segment_reduce(np.logical_or, False, terms, tensor, out)
+
+
+def segment_all(terms: np.ndarray, tensor: SparseTensor, out: Optional[np.ndarray] = None) -> np.ndarray:
+    '''Returns whether all per-entry terms of each segment are true.
+
+    Segments without entries are true. Arguments are as in :func:`segment_sum`;
+    `terms` may have an entry axis of size 1 to be broadcast.
+    '''
+    return _segment_reduce(np.logical_and, True, terms, tensor, out)
+
+
+def _segment_reduce(ufunc, identity, terms: np.ndarray, tensor: SparseTensor, out: Optional[np.ndarray]) -> np.ndarray:
+    '''Reduces the per-entry `terms` of each segment of `tensor` with `ufunc`.'''
+    axes, starts, keys = tensor.segments()
+    kept = tuple(tensor.shape[axis] for axis in axes)
+    terms = np.broadcast_to(terms, (terms.shape[0], tensor.nnz) + terms.shape[2:])
+    shape = (terms.shape[0],) + kept + terms.shape[2:]
+    if out is None:
+        out = np.full(shape, identity, dtype=terms.dtype)
+    else:
+        out.fill(identity)
+    if len(starts):
+        flat = out.reshape((shape[0], int(np.prod(kept))) + terms.shape[2:])
+        flat[:, keys] = ufunc.reduceat(terms, starts, axis=1)
+    return out
+
+
+def _linear_index(coords: np.ndarray, shape: Tuple[int, ...], axes: Sequence[int]) -> np.ndarray:
+    '''Returns the row-major linear index of `coords` restricted to `axes`.'''
+    index = np.zeros(coords.shape[1], dtype=np.intp)
+    for axis in axes:
+        index = index * shape[axis] + coords[axis]
+    return index
@@ -0,0 +1,148 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import collections
+import collections.abc
+import numpy as np
+
+from typing import Dict, Iterator, Optional
+
+Fluents = Dict[str, np.ndarray]
+
+Snapshot = collections.namedtuple('Snapshot', ['batch_size', 'tensors'])
+
+
+class SimulatorState(collections.abc.Mapping):
+    '''Batch of state fluent tensors with copy-on-write snapshots.
+
+    The state holds one tensor of shape (batch_size,) + shape per state
+    fluent of the RDDL fluent table, in canonical order, and can be passed
+    wherever a dict of state tensors is expected (e.g. to the compiled
+    step function). Tensors are shared by reference with snapshots and
+    forks: taking a snapshot or restoring one only copies the references,
+    and a tensor is copied on its first write after being shared, so that
+    the cost of a snapshot is proportional to the number of fluents
+    changed before the next one.
+
+    Tensors returned by subscription must not be modified in place; use
+    :meth:`assign` or :meth:`writable` instead.
+
+    Args:
+        rddl: A built RDDL object.
+        fluents: Mapping from state fluent name to a tensor of shape
+            (batch_size,) + shape, or (1,) + shape to broadcast a single
+            state. Defaults to the initial state.
+        batch_size: The number of batch elements. Defaults to the batch
+            size of `fluents`.
+
+    Attributes:
+        names (List[str]): The state fluent names in canonical order.
+        batch_size (int): The number of batch elements.
+    '''
+
+    def __init__(self, rddl, fluents: Optional[Fluents] = None, batch_size: Optional[int] = None) -> None:
+        self.rddl = rddl
+        self.names = list(rddl.domain.state_fluent_ordering)
+        self._index = { name: i for i, name in enumerate(self.names) }
+        self._shapes = [tuple(rddl.fluent_table[name][1]) for name in self.names]
+
+        if fluents is None:
+            fluents = { name: tensor[np.newaxis] for name, tensor in rddl.initial_state_tensors().items() }
+        if batch_size is None:
+            batch_size = max(np.shape(fluents[name])[0] for name in self.names)
+        self.batch_size = batch_size
+
+        self._tensors = []
+        for name, shape in zip(self.names, self._shapes):
+            tensor = np.asarray(fluents[name])
+            if tensor.shape[0] != batch_size:
+                tensor = np.broadcast_to(tensor, (batch_size,) + shape)
+            self._tensors.append(tensor)
+        self._owned = [False] * len(self.names)
+        for name in self.names:
+            self._check(name, self._tensors[self._index[name]])
+
+    def snapshot(self) -> Snapshot:
+        '''Returns a snapshot of the current tensors, without copying them.'''
+        self._owned = [False] * len(self._owned)
+        return Snapshot(self.batch_size, tuple(self._tensors))
+
+    def restore(self, snapshot: Snapshot) -> None:
+        '''Restores the tensors of a `snapshot`, without copying them.'''
+        self.batch_size = snapshot.batch_size
+        self._tensors[:] = snapshot.tensors
+        self._owned = [False] * len(self._owned)
+
+    def fork(self, index: int, children: int) -> 'SimulatorState':
+        '''Returns a state with `children` copies of the batch element `index`.
+
+        The children share the element's tensors through read-only
+        broadcast views until they are written.
+        '''
+        fluents = { name: tensor[index:index + 1] for name, tensor in self.items() }
+        return SimulatorState(self.rddl, fluents, children)
+
+    def update(self, fluents: Fluents, copy: bool = False) -> None:
+        '''Replaces the tensors of the given state fluents.
+
+        Args:
+            fluents: Mapping from state fluent name to a tensor of shape
+                (batch_size,) + shape, e.g. the next state of a step.
+            copy: If True, copy the tensors, reusing owned tensors in place.
+                Required for tensors that the caller later overwrites, such
+                as the outputs of arena-backed step functions.
+
+        Raises:
+            ValueError: If a tensor does not have the fluent's batched shape.
+        '''
+        for name, tensor in fluents.items():
+            i = self._index[name]
+            self._check(name, tensor)
+            if not copy:
+                self._tensors[i] = tensor
+                self._owned[i] = False
+            elif self._owned[i] and self._tensors[i].dtype == tensor.dtype:
+                np.copyto(self._tensors[i], tensor)
+            else:
+                self._tensors[i] = np.array(tensor)
+                self._owned[i] = True
+
+    def writable(self, name: str) -> np.ndarray:
+        '''Returns the tensor of state fluent `name`, copying it first if it is shared.'''
+        i = self._index[name]
+        if not self._owned[i]:
+            self._tensors[i] = np.array(self._tensors[i])
+            self._owned[i] = True
+        return self._tensors[i]
+
+    def assign(self, name: str, index, value) -> None:
+        '''Sets the entries `index` of the tensor of state fluent `name` to `value`.'''
+        self.writable(name)[index] = value
+
+    def _check(self, name: str, tensor: np.ndarray) -> None:
+        '''Raises ValueError if `tensor` does not have the batched shape of fluent `name`.'''
+        shape = (self.batch_size,) + self._shapes[self._index[name]]
+        if np.shape(tensor) != shape:
+            raise ValueError('Tensor of {} has shape {}, expected {}.'.format(name, np.shape(tensor), shape))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._tensors[self._index[name]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
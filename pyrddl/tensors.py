@@ -0,0 +1,169 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.pvariable import PVariable
+
+import collections.abc
+import numpy as np
+
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+Initializers = Tuple[List[Sequence[str]], List[object]]
+
+NUMPY_DTYPES = {
+    'bool': np.bool_,
+    'int': np.int64,
+    'real': np.float64
+}
+
+NARROW_DTYPES = {
+    'bool': np.bool_,
+    'int': np.int32,
+    'real': np.float32
+}
+
+
+def range_dtype(range_type: str, object_table, narrow: bool = False) -> np.dtype:
+    '''Returns the NumPy dtype of fluents with the given `range_type`.
+
+    Enum-valued fluents are represented by the index of their value in
+    the enum type, so they get the integer dtype.
+
+    Args:
+        range_type: The fluent range ('bool', 'int', 'real' or an enum type).
+        object_table: The object table for each RDDL type.
+        narrow: If True, use 32-bit integers and floats.
+
+    Returns:
+        np.dtype: The tensor dtype.
+
+    Raises:
+        ValueError: If `range_type` is neither a primitive nor an enum type.
+    '''
+    dtypes = NARROW_DTYPES if narrow else NUMPY_DTYPES
+    if range_type in dtypes:
+        return np.dtype(dtypes[range_type])
+    if range_type in object_table:
+        return np.dtype(dtypes['int'])
+    raise ValueError('Range {} has no tensor dtype.'.format(range_type))
+
+
+def initializer_groups(initializers, ordering: Sequence[str]) -> Dict[str, Initializers]:
+    '''Returns the parameters and values of the `initializers` of each fluent.
+
+    Args:
+        initializers: A list of ((functor, params), value) initializers.
+        ordering: The names of the fluents to group initializers for.
+
+    Returns:
+        Dict[str, Initializers]: Mapping from fluent name to the list of
+        parameter lists and the list of values of its initializers.
+
+    Raises:
+        ValueError: If an initializer does not match any fluent in `ordering`.
+    '''
+    groups = { name: ([], []) for name in ordering }
+    for (functor, params), value in initializers:
+        params = params if params is not None else []
+        name = '{}/{}'.format(functor, len(params))
+        if name not in groups:
+            raise ValueError('Initializer of undeclared fluent {}.'.format(name))
+        params_list, values = groups[name]
+        params_list.append(params)
+        values.append(value)
+    return groups
+
+
+def batch_size(fluents: Dict[str, np.ndarray]) -> int:
+    '''Returns the largest leading dimension of the batched `fluents` tensors.'''
+    return max((np.shape(tensor)[0] for tensor in fluents.values()), default=0)
+
+
+def fluent_tensor(pvar: PVariable,
+        shape: Tuple[int, ...],
+        object_table,
+        initializers: Initializers,
+        narrow: bool = False) -> np.ndarray:
+    '''Returns the tensor of `pvar` filled with its default and initializers.
+
+    Parameters of all initializers are converted to indices in bulk and
+    written with a single scatter.
+
+    Args:
+        pvar: The fluent.
+        shape: The fluent shape.
+        object_table: The object table for each RDDL type.
+        initializers: The parameter lists and values of the fluent's initializers.
+        narrow: If True, use 32-bit integers and floats.
+
+    Returns:
+        np.ndarray: The tensor of given `shape`.
+
+    Raises:
+        ValueError: If a value does not fit the narrowed dtype, or if an
+            object or enum value is not of its type.
+    '''
+    dtype = range_dtype(pvar.range, object_table, narrow)
+    params_list, values = initializers
+    default = pvar.default if pvar.default is not None else 0
+    if pvar.range in object_table:
+        otype = object_table[pvar.range]
+        default = otype.index(default) if pvar.default is not None else 0
+        values = otype.names_to_indices(list(values))
+    values = np.asarray(values)
+    _check_range(pvar, np.append(values, default) if values.size else np.asarray([default]), dtype)
+
+    tensor = np.full(shape, default, dtype=dtype)
+    if len(values) == 0:
+        return tensor
+    if not shape:
+        tensor[()] = values[-1]
+        return tensor
+    indices = object_table.names_to_indices(pvar.param_types, params_list)
+    tensor[tuple(indices.T)] = values
+    return tensor
+
+
+def _check_range(pvar: PVariable, values: np.ndarray, dtype: np.dtype) -> None:
+    '''Checks that integer `values` fit in `dtype`.'''
+    if dtype.kind == 'i' and values.dtype.kind in 'iu' and values.size:
+        info = np.iinfo(dtype)
+        if values.min() < info.min or values.max() > info.max:
+            raise ValueError('Values of {} do not fit in {}.'.format(pvar, dtype))
+
+
+class RowSubset(collections.abc.Mapping):
+    '''Read-only mapping of fluent tensors restricted to the given batch `rows`.
+
+    Tensors are gathered on first access, so that a compiled function only
+    gathers the fluents it reads.
+    '''
+
+    def __init__(self, fluents: Dict[str, np.ndarray], rows: np.ndarray) -> None:
+        self._fluents = fluents
+        self._rows = rows
+        self._cache = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._cache:
+            self._cache[name] = self._fluents[name][self._rows]
+        return self._cache[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fluents)
+
+    def __len__(self) -> int:
+        return len(self._fluents)
@@ -24,6 +24,7 @@ setup(
     packages=find_packages(),
     scripts=['scripts/pyrddl'],
     install_requires=[
+        'numpy',
         'ply',
         'typing; python_version<"3.5"'
     ],
@@ -0,0 +1,164 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.actions import BooleanActionSpace, binomial_table
+from pyrddl.parser import RDDLParser
+
+import itertools
+import math
+import numpy as np
+import tempfile
+import unittest
+
+
+LIGHTS = '''
+domain lights {
+
+	requirements = {concurrent};
+
+	types {
+		room : object;
+	};
+
+	pvariables {
+		LOCKED(room) : { non-fluent, bool, default = false };
+		lit(room)    : { state-fluent, bool, default = false };
+		toggle(room) : { action-fluent, bool, default = false };
+		alarm        : { action-fluent, bool, default = false };
+	};
+
+	cpfs {
+		lit'(?r) = (lit(?r) ^ ~toggle(?r)) | (~lit(?r) ^ toggle(?r));
+	};
+
+	reward = (sum_{?r : room} lit(?r)) - alarm;
+
+	action-preconditions {
+		forall_{?r : room} [toggle(?r) => ~LOCKED(?r)];
+	};
+}
+
+non-fluents lights_nf {
+	domain = lights;
+	objects {
+		room : {r1, r2, r3, r4, r5};
+	};
+	non-fluents {
+		LOCKED(r2);
+	};
+}
+
+instance lights_inst {
+	domain = lights;
+	non-fluents = lights_nf;
+	init-state {
+		lit(r1);
+	};
+	max-nondef-actions = 2;
+	horizon = 10;
+	discount = 1.0;
+}
+'''
+
+
+def comb(n, k):
+    if k > n:
+        return 0
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+
+
+class TestBooleanActionSpace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(LIGHTS)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.rddl3 = parser.parse(LIGHTS.replace('{r1, r2, r3, r4, r5}', '{{{}}}'.format(', '.join('r{}'.format(i) for i in range(1, 41)))))
+        cls.rddl3.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def test_binomial_table(self):
+        table = binomial_table(10, 4)
+        for n, k in itertools.product(range(11), range(5)):
+            self.assertEqual(table[n, k], comb(n, k))
+        with self.assertRaises(ValueError):
+            binomial_table(100, 50)
+
+    def test_space(self):
+        space = BooleanActionSpace(self.rddl1, cache_dir=self.cache_dir)
+        self.assertListEqual(space.names, ['alarm/0', 'toggle/1'])
+        self.assertEqual(space.size, 6)
+        self.assertEqual(space.max_nondef, 2)
+        self.assertEqual(len(space), 1 + 6 + 15)
+        self.assertEqual(space.count(2), 15)
+
+        actions = space[:]
+        self.assertEqual(actions.shape, (22, 6))
+        self.assertListEqual(actions.sum(axis=1).tolist(), [0] + [1] * 6 + [2] * 15)
+        self.assertEqual(len(set(map(bytes, actions))), 22)
+        np.testing.assert_array_equal(space[-1], actions[-1])
+        np.testing.assert_array_equal(space.rank(actions), np.arange(22))
+
+        with self.assertRaises(ValueError):
+            space.rank(np.ones((1, 6), dtype=bool))
+        with self.assertRaises(ValueError):
+            space.unrank([22])
+
+    def test_rank_unrank(self):
+        space = BooleanActionSpace(self.rddl3, max_nondef=4, cache_dir=self.cache_dir)
+        self.assertEqual(len(space), sum(comb(41, k) for k in range(5)))
+        ranks = np.random.default_rng(0).integers(0, len(space), size=10000)
+        actions = space.unrank(ranks)
+        self.assertTrue((actions.sum(axis=1) <= 4).all())
+        np.testing.assert_array_equal(space.rank(actions), ranks)
+
+    def test_non_boolean_actions(self):
+        space = BooleanActionSpace(self.rddl2, cache_dir=self.cache_dir)
+        self.assertListEqual(space.names, ['snapPicture/0'])
+        self.assertEqual(len(space), 2)
+        fluents = space.fluents(space[:])
+        self.assertListEqual(fluents['snapPicture/0'].tolist(), [False, True])
+        self.assertListEqual(fluents['xMove/0'].tolist(), [0.0, 0.0])
+
+    def test_batches(self):
+        space = BooleanActionSpace(self.rddl1, cache_dir=self.cache_dir)
+        ranks = np.concatenate([ranks for ranks, _ in space.batches(batch_size=5)])
+        np.testing.assert_array_equal(ranks, np.arange(22))
+
+        state = { 'lit/1': np.zeros((1, 5), dtype=bool) }
+        batches = list(space.batches(batch_size=5, state=state))
+        actions = np.concatenate([actions for _, actions in batches])
+        fluents = space.fluents(actions)
+        self.assertFalse(fluents['toggle/1'][:, 1].any())
+        self.assertEqual(len(actions), 1 + 5 + 10)
+        for ranks, actions in batches:
+            self.assertLessEqual(len(ranks), 5)
+            np.testing.assert_array_equal(space.unrank(ranks), actions)
+
+    def test_packed_batches(self):
+        space = BooleanActionSpace(self.rddl1, cache_dir=self.cache_dir)
+        state = { 'lit/1': np.zeros((1, 5), dtype=bool) }
+        for ranks, words in space.batches(batch_size=8, state=state, packed=True):
+            self.assertEqual(words.shape, (space.size, 1))
+            np.testing.assert_array_equal(space.unpack(words, len(ranks)), space.unrank(ranks))
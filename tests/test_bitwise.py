@@ -0,0 +1,141 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.bitwise import BitParallelStep, BitwiseCompiler
+from pyrddl.packed import PackedFluents, pack, unpack
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+GRID = '''
+domain grid {
+
+	requirements = {concurrent};
+
+	types {
+		cell : object;
+	};
+
+	pvariables {
+		NEIGHBOR(cell, cell) : { non-fluent, bool, default = false };
+		on(cell)             : { state-fluent, bool, default = false };
+		mark(cell)           : { state-fluent, bool, default = false };
+		lucky                : { state-fluent, bool, default = false };
+		count                : { state-fluent, int, default = 0 };
+		crowded(cell)        : { interm-fluent, bool, level = 1 };
+		flip(cell)           : { action-fluent, bool, default = false };
+	};
+
+	cpfs {
+		crowded(?c) = forall_{?d : cell} [NEIGHBOR(?c, ?d) => on(?d)];
+		on'(?c) = if (flip(?c)) then ~on(?c)
+		          else on(?c) | [exists_{?d : cell} (NEIGHBOR(?c, ?d) ^ on(?d)) ^ ~crowded(?c)];
+		mark'(?c) = ((on(?c) == flip(?c)) ~= NEIGHBOR(?c, ?c)) | on(c1) | false;
+		lucky' = Bernoulli(0.5);
+		count' = count + sum_{?c : cell} on(?c);
+	};
+
+	reward = sum_{?c : cell} [on'(?c) ^ ~on(?c)];
+}
+
+non-fluents grid_nf {
+	domain = grid;
+	objects {
+		cell : {c1, c2, c3, c4, c5};
+	};
+	non-fluents {
+		NEIGHBOR(c1, c2); NEIGHBOR(c2, c1); NEIGHBOR(c2, c3); NEIGHBOR(c3, c2);
+		NEIGHBOR(c3, c4); NEIGHBOR(c4, c3); NEIGHBOR(c4, c5); NEIGHBOR(c5, c4);
+		NEIGHBOR(c3, c3);
+	};
+}
+
+instance grid_inst {
+	domain = grid;
+	non-fluents = grid_nf;
+	init-state {
+		on(c3);
+	};
+	max-nondef-actions = pos-inf;
+	horizon = 10;
+	discount = 1.0;
+}
+'''
+
+
+class TestBitParallelStep(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl = parser.parse(GRID)
+        cls.rddl.build()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def batch(self, batch_size, seed=0):
+        rng = np.random.default_rng(seed)
+        state = {
+            'on/1': rng.random((batch_size, 5)) < 0.5,
+            'mark/1': rng.random((batch_size, 5)) < 0.5,
+            'lucky/0': rng.random(batch_size) < 0.5,
+            'count/0': rng.integers(0, 10, batch_size)
+        }
+        action = { 'flip/1': rng.random((batch_size, 5)) < 0.2 }
+        return state, action
+
+    def test_supports(self):
+        compiler = BitwiseCompiler(self.rddl)
+        supported = {cpf.name: compiler.supports(cpf.expr) for cpf in self.rddl.domain.state_cpfs}
+        self.assertDictEqual(supported, {
+            "count'/0": False, "lucky'/0": False, "mark'/1": True, "on'/1": True
+        })
+        step = BitParallelStep(self.rddl, cache_dir=self.cache_dir)
+        self.assertListEqual(step.bitwise, ['crowded/1', "mark'/1", "on'/1"])
+        self.assertListEqual(step.general, ["count'/0", "lucky'/0"])
+
+    def test_step(self):
+        module = codegen.compile_step(self.rddl, cache_dir=self.cache_dir)
+        step = BitParallelStep(self.rddl, cache_dir=self.cache_dir)
+        for batch_size in [1, 64, 150]:
+            state, action = self.batch(batch_size)
+            interms1, next_state1, reward1 = module.step(state, action, np.random.default_rng(0))
+            interms2, next_state2, reward2 = step(PackedFluents.pack(state), action, np.random.default_rng(0))
+            self.assertSetEqual(next_state2.packed, {'on/1', 'mark/1', 'lucky/0'})
+            self.assertSetEqual(interms2.packed, {'crowded/1'})
+            np.testing.assert_array_equal(interms2['crowded/1'], interms1['crowded/1'])
+            for name, tensor in next_state1.items():
+                np.testing.assert_array_equal(next_state2[name], tensor)
+            np.testing.assert_array_equal(reward2, reward1)
+
+            words = next_state2.words('on/1')
+            np.testing.assert_array_equal(words, pack(unpack(words, batch_size)))
+
+    def test_general_fallback(self):
+        step = BitParallelStep(self.rddl2, cache_dir=self.cache_dir)
+        self.assertListEqual(step.bitwise, [])
+        self.assertEqual(len(step.general), 4)
@@ -0,0 +1,125 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.bounds import ActionBounds
+from pyrddl.domain import ActionBound
+from pyrddl.parser import RDDLParser
+
+import numpy as np
+import tempfile
+import unittest
+
+
+PRECONDITIONS = '\t\tforall_{?r : res} outflow(?r) <= rlevel(?r); \n\t\tforall_{?r : res} outflow(?r) >= 0;'
+
+
+class TestActionBounds(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+
+        cls.rddl2 = parser.parse(RESERVOIR.replace(PRECONDITIONS,
+            '\t\tforall_{?r : res} [(outflow(?r) >= 0) ^ (outflow(?r) <= rlevel(?r))];\n'
+            '\t\tforall_{?r : res, ?s : res} outflow(?r) <= rlevel(?s) + 10.0;'))
+        cls.rddl2.build()
+
+        cls.rddl3 = parser.parse(RESERVOIR.replace(PRECONDITIONS,
+            '\t\tforall_{?r : res} outflow(?r) == 5.0;\n'
+            '\t\toutflow(t1) <= 3.0;'))
+        cls.rddl3.build()
+
+        cls.rddl5 = parser.parse(RESERVOIR.replace(PRECONDITIONS,
+            '\t\tforall_{?r : res} [(outflow(?r) < rlevel(?r) / 20) ^ (outflow(?r) > -1)];').replace(
+            'outflow(res): { action-fluent, real, default = 0.0 };', 'outflow(res): { action-fluent, int, default = 0 };'))
+        cls.rddl5.build()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+        cls.rddl4 = parser.parse(MARS_ROVER.replace('\taction-preconditions {\n',
+            '\taction-preconditions {\n\t\txMove <= yMove + 5.0;\n'))
+        cls.rddl4.build()
+        relation = cls.rddl4.domain.global_action_preconditions[0]
+        cls.rddl4.domain.action_upper_bounds['xMove/0'] = [ActionBound((), {}, relation.args[1], False)]
+
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.state = { 'rlevel/1': np.array([[75.0] + [50.0] * 7, [100.0] * 8]) }
+
+    def test_bounds(self):
+        bounds = ActionBounds(self.rddl1, cache_dir=self.cache_dir)
+        self.assertListEqual(bounds.bounded, ['outflow/1'])
+        lower, upper = bounds(self.state)
+        self.assertEqual(lower['outflow/1'].shape, (2, 8))
+        np.testing.assert_array_equal(lower['outflow/1'], np.zeros((2, 8)))
+        np.testing.assert_array_equal(upper['outflow/1'], self.state['rlevel/1'])
+
+    def test_conjunctions_and_quantified_bounds(self):
+        domain = self.rddl2.domain
+        self.assertEqual(len(domain.action_lower_bounds['outflow/1']), 1)
+        self.assertEqual(len(domain.action_upper_bounds['outflow/1']), 2)
+
+        bounds = ActionBounds(self.rddl2, cache_dir=self.cache_dir)
+        lower, upper = bounds(self.state)
+        np.testing.assert_array_equal(lower['outflow/1'], np.zeros((2, 8)))
+        np.testing.assert_array_equal(upper['outflow/1'][0], [60.0] + [50.0] * 7)
+        np.testing.assert_array_equal(upper['outflow/1'][1], [100.0] * 8)
+
+    def test_equality_and_unsupported_bounds(self):
+        bounds = ActionBounds(self.rddl3, cache_dir=self.cache_dir)
+        self.assertEqual(len(bounds.unsupported), 1)
+        self.assertEqual(bounds.unsupported[0][0], 'outflow/1')
+        lower, upper = bounds(self.state)
+        np.testing.assert_array_equal(lower['outflow/1'], np.full((2, 8), 5.0))
+        np.testing.assert_array_equal(upper['outflow/1'], np.full((2, 8), 5.0))
+
+    def test_clip(self):
+        bounds = ActionBounds(self.rddl1, cache_dir=self.cache_dir)
+        outflow = np.array([[-1.0, 60.0] + [10.0] * 6, [120.0] * 8])
+        clipped = bounds.clip(self.state, { 'outflow/1': outflow })
+        np.testing.assert_array_equal(clipped['outflow/1'][0], [0.0, 50.0] + [10.0] * 6)
+        np.testing.assert_array_equal(clipped['outflow/1'][1], [100.0] * 8)
+        np.testing.assert_array_equal(outflow[0, :2], [-1.0, 60.0])
+
+    def test_strict_integer_bounds(self):
+        bounds = ActionBounds(self.rddl5, cache_dir=self.cache_dir)
+        lower, upper = bounds(self.state)
+        np.testing.assert_array_equal(lower['outflow/1'], np.zeros((2, 8)))
+        np.testing.assert_array_equal(upper['outflow/1'][0], [3.0] + [2.0] * 7)
+        np.testing.assert_array_equal(upper['outflow/1'][1], [4.0] * 8)
+        outflow = np.array([[9, -1] + [1] * 6, [5] * 8])
+        clipped = bounds.clip(self.state, { 'outflow/1': outflow })['outflow/1']
+        np.testing.assert_array_equal(clipped[0], [3, 0] + [1] * 6)
+        np.testing.assert_array_equal(clipped[1], [4] * 8)
+        self.assertEqual(clipped.dtype, outflow.dtype)
+
+    def test_bounds_reading_actions(self):
+        bounds = ActionBounds(self.rddl4, cache_dir=self.cache_dir)
+        self.assertListEqual(bounds.bounded, ['xMove/0'])
+        state = { 'picTaken/1': np.zeros((2, 3), dtype=bool), 'time/0': np.zeros(2), 'xPos/0': np.zeros(2), 'yPos/0': np.zeros(2) }
+        action = { 'xMove/0': np.array([10.0, 1.0]), 'yMove/0': np.array([1.0, 2.0]) }
+        with self.assertRaises(ValueError):
+            bounds(state)
+        _, upper = bounds(state, action)
+        np.testing.assert_array_equal(upper['xMove/0'], [6.0, 7.0])
+        clipped = bounds.clip(state, action)
+        np.testing.assert_array_equal(clipped['xMove/0'], [6.0, 1.0])
@@ -0,0 +1,372 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.parser import RDDLParser
+from pyrddl.expr import Expression
+from pyrddl.objects import ObjectTable, ObjectType
+from pyrddl import codegen
+from pyrddl import sparse
+
+import numpy as np
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+
+def reservoir_chain(text, size):
+    objects = ','.join('t{}'.format(i) for i in range(1, size + 1))
+    text = text.replace('res: {t1,t2,t3,t4,t5,t6,t7,t8};', 'res: {{{}}};'.format(objects))
+    chain = ''.join('\t\tDOWNSTREAM(t{},t{});\n'.format(i, i + 1) for i in range(9, size))
+    return text.replace('\t\tDOWNSTREAM(t7,t8);\n', '\t\tDOWNSTREAM(t7,t8);\n' + chain)
+
+
+def default_tensors(rddl, ordering, fluents, sizes, batch_size):
+    tensors = {}
+    for name, size in zip(ordering, sizes):
+        pvar = fluents[name]
+        dtype = codegen.NUMPY_DTYPES[pvar.range]
+        tensors[name] = np.full((batch_size,) + size, pvar.default, dtype=dtype)
+    return tensors
+
+
+class TestCodeGen(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.rddls = [cls.rddl1, cls.rddl2]
+        cls.rddl3 = parser.parse(reservoir_chain(RESERVOIR, 100))
+        cls.rddl3.build()
+
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.batch_size = 5
+
+    def initial_state(self, rddl):
+        domain = rddl.domain
+        return default_tensors(rddl, domain.state_fluent_ordering, domain.state_fluents, rddl.state_size, self.batch_size)
+
+    def default_action(self, rddl):
+        domain = rddl.domain
+        return default_tensors(rddl, domain.action_fluent_ordering, domain.action_fluents, rddl.action_size, self.batch_size)
+
+    def test_generate_step(self):
+        for rddl in self.rddls:
+            source = codegen.CodeGenerator(rddl).generate_step()
+            self.assertIn('def step(state, action, rng):', source)
+            compile(source, '<step>', 'exec')
+
+    def test_step_shapes(self):
+        for rddl in self.rddls:
+            module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+            state = self.initial_state(rddl)
+            action = self.default_action(rddl)
+            interms, next_state, reward = module.step(state, action, np.random.default_rng(0))
+
+            self.assertListEqual(list(next_state), rddl.domain.state_fluent_ordering)
+            for name, size in zip(rddl.domain.state_fluent_ordering, rddl.state_size):
+                self.assertEqual(next_state[name].shape, (self.batch_size,) + size)
+                self.assertIsNot(next_state[name], state[name])
+
+            self.assertListEqual(list(interms), rddl.domain.interm_fluent_ordering)
+            for name, size in zip(rddl.domain.interm_fluent_ordering, rddl.interm_size):
+                self.assertEqual(interms[name].shape, (self.batch_size,) + size)
+
+            self.assertEqual(reward.shape, (self.batch_size,))
+            self.assertEqual(reward.dtype, np.float64)
+
+    def test_step_semantics(self):
+        rddl = self.rddl1
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        nf = codegen.non_fluent_tensors(rddl)
+
+        state = self.initial_state(rddl)
+        state['rlevel/1'][:] = np.linspace(10.0, 120.0, 8)
+        action = self.default_action(rddl)
+        action['outflow/1'][:] = 5.0
+        interms, next_state, reward = module.step(state, action, np.random.default_rng(0))
+
+        rlevel = state['rlevel/1']
+        outflow = action['outflow/1']
+        cap = nf['MAX_RES_CAP/1']
+        evaporated = nf['MAX_WATER_EVAP_FRAC_PER_TIME_UNIT/0'][:, None] * (rlevel * rlevel) / (cap * cap) * rlevel
+        overflow = np.maximum(0, rlevel - outflow - cap)
+        inflow = np.einsum('ud,bu->bd', nf['DOWNSTREAM/2'][0], outflow + overflow)
+        rainfall = interms['rainfall/1']
+        expected = np.maximum(0.0, rlevel + rainfall - evaporated - outflow - overflow + inflow)
+
+        np.testing.assert_allclose(interms['evaporated/1'], evaporated)
+        np.testing.assert_allclose(interms['overflow/1'], overflow)
+        np.testing.assert_allclose(interms['inflow/1'], inflow)
+        np.testing.assert_allclose(next_state['rlevel/1'], expected)
+        self.assertTrue(np.all(rainfall >= 0.0))
+
+    def test_step_is_cached(self):
+        rddl = self.rddl2
+        module1 = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        path = module1.__file__
+        mtime = os.path.getmtime(path)
+        module2 = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        self.assertEqual(module2.__file__, path)
+        self.assertEqual(os.path.getmtime(path), mtime)
+        self.assertIn(codegen.fingerprint(rddl), os.path.basename(path))
+        self.assertNotEqual(codegen.fingerprint(self.rddl1), codegen.fingerprint(self.rddl2))
+
+    def test_fingerprint_objects(self):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+        parser = RDDLParser()
+        parser.build()
+        rddl = parser.parse(RESERVOIR)
+        rddl.build()
+        fingerprint = codegen.fingerprint(rddl)
+        self.assertEqual(fingerprint, codegen.fingerprint(self.rddl1))
+        objects = list(reversed(rddl.object_table['res'].objects.tolist()))
+        rddl.object_table = ObjectTable([ObjectType('res', objects)])
+        self.assertNotEqual(codegen.fingerprint(rddl), fingerprint)
+        rddl = parser.parse(RESERVOIR)
+        rddl.build()
+        rddl.domain.types = rddl.domain.types + [('pump', 'object')]
+        self.assertNotEqual(codegen.fingerprint(rddl), fingerprint)
+
+    def test_constraints_batch_size(self):
+        rddl = self.rddl2
+        precond = rddl.domain.global_action_preconditions[0]
+        function = codegen.compile_constraints(rddl, 'actions', [precond], cache_dir=self.cache_dir).CONSTRAINTS[0]
+        action = default_tensors(rddl, rddl.domain.action_fluent_ordering, rddl.domain.action_fluents, rddl.action_size, 5)
+        self.assertEqual(function(action).shape, (5,))
+        state = default_tensors(rddl, rddl.domain.state_fluent_ordering, rddl.domain.state_fluents, rddl.state_size, 1)
+        fluents = dict(state)
+        fluents.update(action)
+        self.assertEqual(function(fluents).shape, (5,))
+
+    def test_step_is_reproducible(self):
+        rddl = self.rddl2
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        state = self.initial_state(rddl)
+        action = self.default_action(rddl)
+        action['xMove/0'][:] = 1.0
+        _, next_state1, _ = module.step(state, action, np.random.default_rng(42))
+        _, next_state2, _ = module.step(state, action, np.random.default_rng(42))
+        for name in next_state1:
+            np.testing.assert_array_equal(next_state1[name], next_state2[name])
+
+    def test_reward_only(self):
+        for rddl in self.rddls:
+            module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+            state = self.initial_state(rddl)
+            action = self.default_action(rddl)
+            if rddl is self.rddl2:
+                action['snapPicture/0'][:2] = True
+            _, _, reward1 = module.step(state, action, np.random.default_rng(7))
+            reward2 = module.reward(state, action, np.random.default_rng(7))
+            self.assertEqual(reward2.shape, (self.batch_size,))
+            np.testing.assert_array_equal(reward1, reward2)
+
+        source = codegen.CodeGenerator(self.rddl2).generate_step()
+        reward = source[source.index('def reward(state, action, rng):'):]
+        self.assertNotIn('rng.standard_normal', reward)
+        self.assertIn('rng.standard_normal', source[:source.index('def reward(state, action, rng):')])
+
+    def test_make_step_matches_step(self):
+        for rddl in self.rddls:
+            module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+            arena_step = module.make_step(self.batch_size)
+            state1 = state2 = self.initial_state(rddl)
+            action = self.default_action(rddl)
+            for t in range(3):
+                interms1, state1, reward1 = module.step(state1, action, np.random.default_rng(t))
+                interms2, state2, reward2 = arena_step(state2, action, np.random.default_rng(t))
+                for name in state1:
+                    np.testing.assert_array_equal(state1[name], state2[name])
+                for name in interms1:
+                    np.testing.assert_array_equal(interms1[name], interms2[name])
+                np.testing.assert_array_equal(reward1, reward2)
+
+    def test_make_step_reuses_buffers(self):
+        rddl = self.rddl1
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        arena_step = module.make_step(self.batch_size)
+        state = self.initial_state(rddl)
+        action = self.default_action(rddl)
+        rng = np.random.default_rng(0)
+        _, next_state1, _ = arena_step(state, action, rng)
+        _, next_state2, _ = arena_step(next_state1, action, rng)
+        _, next_state3, _ = arena_step(next_state2, action, rng)
+        self.assertIsNot(next_state1['rlevel/1'], next_state2['rlevel/1'])
+        self.assertIs(next_state1['rlevel/1'], next_state3['rlevel/1'])
+
+    def test_make_step_allocations(self):
+        batch_size = 50000
+        rddl = self.rddl1
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        state = default_tensors(rddl, rddl.domain.state_fluent_ordering, rddl.domain.state_fluents, rddl.state_size, batch_size)
+        action = default_tensors(rddl, rddl.domain.action_fluent_ordering, rddl.domain.action_fluents, rddl.action_size, batch_size)
+        tensor_size = batch_size * 8 * np.dtype(np.float64).itemsize
+
+        def allocated(step):
+            rng = np.random.default_rng(0)
+            step(state, action, rng)
+            tracemalloc.start()
+            try:
+                current, _ = tracemalloc.get_traced_memory()
+                step(state, action, rng)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            return peak - current
+
+        self.assertGreater(allocated(module.step), 10 * tensor_size)
+        self.assertLess(allocated(module.make_step(batch_size)), tensor_size // 4)
+
+    def test_make_step_fuses_tiles(self):
+        rddl = self.rddl1
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        with open(module.__file__, mode='r') as file:
+            self.assertIn('for i in range(0, batch_size,', file.read())
+
+        batch_size = 3000
+        state = default_tensors(rddl, rddl.domain.state_fluent_ordering, rddl.domain.state_fluents, rddl.state_size, batch_size)
+        state['rlevel/1'][:] = np.random.default_rng(0).uniform(0.0, 150.0, size=(batch_size, 8))
+        action = default_tensors(rddl, rddl.domain.action_fluent_ordering, rddl.domain.action_fluents, rddl.action_size, batch_size)
+        action['outflow/1'][:] = 5.0
+        interms1, next_state1, reward1 = module.step(state, action, np.random.default_rng(1))
+        interms2, next_state2, reward2 = module.make_step(batch_size)(state, action, np.random.default_rng(1))
+        for name in interms1:
+            np.testing.assert_array_equal(interms1[name], interms2[name])
+        np.testing.assert_array_equal(next_state1['rlevel/1'], next_state2['rlevel/1'])
+        np.testing.assert_array_equal(reward1, reward2)
+
+    def test_sum_of_products_is_contracted(self):
+        rddl = self.rddl1
+        source = codegen.CodeGenerator(rddl).generate_step()
+        self.assertIn('np.einsum(', source)
+
+        generator = codegen.CodeGenerator(rddl)
+        generator.reset()
+        generator.add_source('rlevel/1', "state['rlevel/1']", True)
+        generator.add_source('DOWNSTREAM/2', "_NF['DOWNSTREAM/2']", False)
+        downstream = Expression(('pvar_expr', ('DOWNSTREAM', ['?up', '?down'])))
+        rlevel = Expression(('pvar_expr', ('rlevel', ['?up'])))
+        body = Expression(('*', (Expression(('number', 2.0)), Expression(('*', (downstream, rlevel))))))
+        expr = Expression(('avg', (('typed_var', ('?up', 'res')), body)))
+        value = generator.compile_expression(expr, {'?down': 'res'})
+        value = generator.materialize(value, ('?down',), (8,), 'real')
+        self.assertListEqual([instr.op for instr in generator.instrs], ['load', 'load', 'einsum', 'ufunc'])
+
+        nf = codegen.non_fluent_tensors(rddl)
+        state = {'rlevel/1': np.random.default_rng(0).uniform(0.0, 100.0, size=(self.batch_size, 8))}
+        namespace = {'np': np, '_NF': nf, 'state': state, 'batch_size': self.batch_size}
+        exec('\n'.join(codegen.emit_instr(instr) for instr in generator.instrs), namespace)
+        expected = np.mean(2.0 * nf['DOWNSTREAM/2'] * state['rlevel/1'][:, :, None], axis=1)
+        np.testing.assert_allclose(namespace[value.code], expected)
+
+    def test_round_half_away_from_zero(self):
+        generator = codegen.CodeGenerator(self.rddl1)
+        generator.reset()
+        generator.add_source('rlevel/1', "state['rlevel/1']", True)
+        rlevel = Expression(('pvar_expr', ('rlevel', ['?r'])))
+        value = generator.compile_expression(Expression(('func', ('round', [rlevel]))), {'?r': 'res'})
+        state = {'rlevel/1': np.array([[2.5, -2.5, 0.5, -0.5, 1.4, -1.6, 3.0, 0.0]])}
+        namespace = {'np': np, 'state': state, 'batch_size': 1}
+        exec('\n'.join(codegen.emit_instr(instr) for instr in generator.instrs), namespace)
+        np.testing.assert_array_equal(namespace[value.code], [[3.0, -3.0, 1.0, -1.0, 1.0, -2.0, 3.0, 0.0]])
+
+        for x, expected in [(2.5, 3.0), (-2.5, -3.0)]:
+            value = generator.compile_expression(Expression(('func', ('round', [Expression(('number', x))]))), {})
+            self.assertEqual(value.value, expected)
+
+    def test_sparse_non_fluents(self):
+        self.assertDictEqual(codegen.sparse_non_fluents(self.rddl1), {})
+        self.assertDictEqual(codegen.sparse_non_fluents(self.rddl3), {'DOWNSTREAM/2': 98})
+
+        nf = codegen.non_fluent_tensors(self.rddl3)
+        downstream = nf['DOWNSTREAM/2']
+        self.assertIsInstance(downstream, sparse.SparseTensor)
+        self.assertEqual(downstream.nnz, 98)
+        dense = codegen.non_fluent_tensors(self.rddl3, sparse_names=())['DOWNSTREAM/2']
+        np.testing.assert_array_equal(downstream.todense(), dense)
+
+    def test_sparse_quantifiers(self):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+        quantifiers = [
+            'exists_{?s : res} [DOWNSTREAM(?r, ?s) ^ (rlevel(?s) >= 50)]',
+            'forall_{?s : res} [DOWNSTREAM(?s, ?r) => (rlevel(?s) >= 50)]',
+            'exists_{?s : res} DOWNSTREAM(?r, ?s)',
+            'forall_{?s : res} [(DOWNSTREAM(?r, ?s) ^ (rlevel(?r) >= 50)) => (rlevel(?s) >= rlevel(?r))]',
+            '[sum_{?s : res} [if (DOWNSTREAM(?r, ?s)) then rlevel(?s) else 0.0] >= 0]'
+        ]
+        preconds = ''.join('\t\tforall_{{?r : res}} {};\n'.format(quantifier) for quantifier in quantifiers)
+        parser = RDDLParser()
+        parser.build()
+        rddl = parser.parse(reservoir_chain(RESERVOIR, 100).replace('\taction-preconditions {\n', '\taction-preconditions {\n' + preconds))
+        rddl.build()
+        items = [(precond.args[-1], { '?r': 'res' }, ('?r',), 'bool') for precond in rddl.domain.preconds[:len(quantifiers)]]
+        with self.assertWarns(UserWarning):
+            codegen.CodeGenerator(rddl).generate_tensors(items[-1:])
+        items = items[:-1]
+
+        source = codegen.CodeGenerator(rddl).generate_tensors(items)
+        self.assertIn('sparse.segment_any(', source)
+        self.assertIn('sparse.segment_all(', source)
+        self.assertNotIn('todense', source)
+        sparse_module, dense_module = {}, {}
+        exec(source, sparse_module)
+        sparse_module['bind'](codegen.non_fluent_tensors(rddl))
+        exec(codegen.CodeGenerator(rddl, sparse={}).generate_tensors(items), dense_module)
+        dense_module['bind'](codegen.non_fluent_tensors(rddl, sparse_names=()))
+
+        fluents = { 'rlevel/1': np.random.default_rng(0).uniform(0.0, 100.0, size=(self.batch_size, 100)) }
+        for f1, f2 in zip(sparse_module['TENSORS'], dense_module['TENSORS']):
+            result = f1(fluents)
+            self.assertEqual(result.shape, (self.batch_size, 100))
+            np.testing.assert_array_equal(result, f2(fluents))
+
+    def test_sparse_aggregation(self):
+        rddl = self.rddl3
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        with open(module.__file__, mode='r') as file:
+            self.assertIn('sparse.segment_sum(', file.read())
+
+        dense_source = codegen.CodeGenerator(rddl, sparse={}).generate_step()
+        dense_module = {}
+        exec(dense_source, dense_module)
+        dense_module['bind'](codegen.non_fluent_tensors(rddl, sparse_names=()))
+
+        state = default_tensors(rddl, rddl.domain.state_fluent_ordering, rddl.domain.state_fluents, rddl.state_size, self.batch_size)
+        state['rlevel/1'][:] = np.random.default_rng(0).uniform(0.0, 150.0, size=(self.batch_size, 100))
+        action = default_tensors(rddl, rddl.domain.action_fluent_ordering, rddl.domain.action_fluents, rddl.action_size, self.batch_size)
+        action['outflow/1'][:] = 5.0
+        for step in (module.step, module.make_step(self.batch_size)):
+            interms1, next_state1, reward1 = step(state, action, np.random.default_rng(0))
+            interms2, next_state2, reward2 = dense_module['step'](state, action, np.random.default_rng(0))
+            for name in interms1:
+                np.testing.assert_allclose(interms1[name], interms2[name])
+            np.testing.assert_allclose(next_state1['rlevel/1'], next_state2['rlevel/1'])
+            np.testing.assert_allclose(reward1, reward2)
@@ -0,0 +1,100 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.parser import RDDLParser
+from pyrddl.dependency import DependencyGraph, REWARD
+from pyrddl.expr import Expression
+
+import unittest
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.rddls = [cls.rddl1, cls.rddl2]
+
+    def test_nodes(self):
+        for rddl in self.rddls:
+            graph = rddl.dependency_graph
+            self.assertIsInstance(graph, DependencyGraph)
+            for name in rddl.fluent_table:
+                self.assertIn(name, graph.index)
+            for name in rddl.domain.next_state_fluent_ordering:
+                self.assertIn(name, graph.index)
+            self.assertIn(REWARD, graph.index)
+            self.assertEqual(len(graph.nodes), len(set(graph.nodes)))
+
+    def test_topological_order(self):
+        for rddl in self.rddls:
+            graph = rddl.dependency_graph
+            order = graph.topological_order
+            self.assertListEqual(sorted(order), sorted(graph.nodes))
+            position = { name: i for i, name in enumerate(order) }
+            for name in graph.nodes:
+                for parent in graph.parents(name):
+                    self.assertLess(position[parent], position[name])
+
+    def test_ancestors(self):
+        graph = self.rddl1.dependency_graph
+        self.assertSetEqual(graph.parents('overflow/1'), {'rlevel/1', 'outflow/1', 'MAX_RES_CAP/1'})
+        ancestors = graph.ancestors("rlevel'/1")
+        for name in ['rlevel/1', 'outflow/1', 'evaporated/1', 'rainfall/1', 'overflow/1', 'inflow/1', 'DOWNSTREAM/2']:
+            self.assertIn(name, ancestors)
+        self.assertNotIn(REWARD, ancestors)
+        self.assertTrue(graph.depends_on(REWARD, 'overflow/1'))
+        self.assertFalse(graph.depends_on('overflow/1', REWARD))
+
+    def test_descendants(self):
+        graph = self.rddl1.dependency_graph
+        descendants = graph.descendants('outflow/1')
+        for name in ['overflow/1', 'inflow/1', "rlevel'/1", REWARD]:
+            self.assertIn(name, descendants)
+        self.assertNotIn('rainfall/1', descendants)
+        for name in graph.nodes:
+            for descendant in graph.descendants(name):
+                self.assertIn(name, graph.ancestors(descendant))
+
+    def test_strongly_connected_components(self):
+        for rddl in self.rddls:
+            graph = rddl.dependency_graph
+            components = graph.strongly_connected_components
+            self.assertEqual(sum(len(component) for component in components), len(graph.nodes))
+            self.assertListEqual(graph.cycles, [])
+
+    def test_cycles(self):
+        a = Expression(('pvar_expr', ('a', None)))
+        b = Expression(('pvar_expr', ('b', None)))
+        c = Expression(('pvar_expr', ('c', None)))
+        graph = DependencyGraph(['a/0', 'b/0', 'c/0', 'd/0'], {'a/0': b, 'b/0': a, 'c/0': a, 'd/0': c})
+        self.assertListEqual(graph.cycles, [['a/0', 'b/0']])
+        self.assertListEqual(graph.strongly_connected_components, [['a/0', 'b/0'], ['c/0'], ['d/0']])
+        self.assertSetEqual(graph.ancestors('a/0'), {'a/0', 'b/0'})
+        self.assertSetEqual(graph.ancestors('d/0'), {'a/0', 'b/0', 'c/0'})
+        self.assertSetEqual(graph.descendants('b/0'), {'a/0', 'b/0', 'c/0', 'd/0'})
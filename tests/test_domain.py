@@ -259,3 +259,43 @@ class TestDomain(unittest.TestCase):
         self.assertIsInstance(upper, Expression)
         self.assertTrue(upper.is_pvariable_expression())
         self.assertEqual(upper.name, 'rlevel/1')
+
+    def test_action_bounds(self):
+        domain = self.rddl1.domain
+        lower_bounds = domain.action_lower_bounds['outflow/1']
+        upper_bounds = domain.action_upper_bounds['outflow/1']
+        self.assertEqual(len(lower_bounds), 1)
+        self.assertEqual(len(upper_bounds), 1)
+        self.assertEqual(lower_bounds[0].params, ('?r',))
+        self.assertDictEqual(lower_bounds[0].scope, {'?r': 'res'})
+        self.assertFalse(lower_bounds[0].strict)
+        self.assertEqual(upper_bounds[0].expr.name, 'rlevel/1')
+        self.assertDictEqual(self.rddl2.domain.action_lower_bounds, {})
+
+    def test_fluent_index(self):
+        for rddl in self.rddls:
+            domain = rddl.domain
+            self.assertIs(domain.non_fluents, domain.non_fluents)
+            self.assertIs(domain.state_fluents, domain.state_fluents)
+            with self.assertRaises(TypeError):
+                domain.state_fluents['x/0'] = None
+
+            ordering = domain.state_fluent_ordering
+            ordering.append('x/0')
+            self.assertNotIn('x/0', domain.state_fluent_ordering)
+
+            cpfs = domain.intermediate_cpfs
+            cpfs.clear()
+            self.assertEqual(len(domain.intermediate_cpfs), len(domain.intermediate_fluents))
+
+    def test_get_cpf(self):
+        for rddl in self.rddls:
+            domain = rddl.domain
+            for cpf in domain.intermediate_cpfs:
+                self.assertIs(domain.get_cpf(cpf.name), cpf)
+                self.assertIs(domain.get_intermediate_cpf(cpf.name), cpf)
+            for cpf in domain.state_cpfs:
+                self.assertIs(domain.get_cpf(cpf.name), cpf)
+                self.assertIs(domain.get_cpf(utils.rename_next_state_fluent(cpf.name)), cpf)
+                self.assertIsNone(domain.get_intermediate_cpf(cpf.name))
+            self.assertIsNone(domain.get_cpf('outflow/1'))
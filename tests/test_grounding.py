@@ -0,0 +1,121 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.grounding import GroundedFluentView
+from pyrddl.parser import RDDLParser
+
+import itertools
+import numpy as np
+import unittest
+
+
+def object_table(types):
+    table = {}
+    for name, objects in types.items():
+        table[name] = {
+            'size': len(objects),
+            'idx': { obj: i for i, obj in enumerate(objects) },
+            'objects': objects
+        }
+    return table
+
+
+class TestGroundedFluentView(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.rddls = [cls.rddl1, cls.rddl2]
+
+        cls.table = object_table({
+            'x': ['x{}'.format(i) for i in range(1000)],
+            'y': ['y{}'.format(i) for i in range(1000)],
+            'z': ['z{}'.format(i) for i in range(1000)]
+        })
+
+    def test_names_follow_tensor_order(self):
+        for rddl in self.rddls:
+            variables = rddl.non_fluent_variables + rddl.state_fluent_variables + rddl.action_fluent_variables
+            for name, view in variables:
+                fluent, size = rddl.fluent_table[name]
+                self.assertEqual(view.shape, size)
+                self.assertEqual(len(view), int(np.prod(size)))
+                names = list(view)
+                self.assertEqual(len(names), len(view))
+                for i, var in enumerate(names):
+                    self.assertEqual(view[i], var)
+                    self.assertEqual(view.index(var), i)
+                    self.assertIn(var, view)
+
+    def test_scalar_fluent(self):
+        view = GroundedFluentView('time', None, self.rddl2.object_table)
+        self.assertEqual(len(view), 1)
+        self.assertEqual(view.shape, ())
+        self.assertListEqual(list(view), ['time'])
+        self.assertEqual(view[0], 'time')
+        self.assertEqual(view.index('time'), 0)
+        self.assertEqual(view.ravel(()), 0)
+        self.assertTupleEqual(view.unravel(0), ())
+
+    def test_large_view(self):
+        view = GroundedFluentView('f', ['x', 'y', 'z'], self.table)
+        self.assertEqual(len(view), 10 ** 9)
+        self.assertEqual(view[0], 'f(x0,y0,z0)')
+        self.assertEqual(view[-1], 'f(x999,y999,z999)')
+        self.assertEqual(view[123456789], 'f(x123,y456,z789)')
+        self.assertEqual(view.index('f(x123,y456,z789)'), 123456789)
+        self.assertListEqual(view[1000:1002], ['f(x0,y1,z0)', 'f(x0,y1,z1)'])
+        self.assertListEqual(list(itertools.islice(view, 2)), ['f(x0,y0,z0)', 'f(x0,y0,z1)'])
+
+    def test_ravel_unravel(self):
+        view = GroundedFluentView('f', ['x', 'y', 'z'], self.table)
+        self.assertEqual(view.ravel((1, 2, 3)), 1002003)
+        self.assertTupleEqual(view.unravel(1002003), (1, 2, 3))
+
+        flat = np.array([0, 7, 1002003, 10 ** 9 - 1])
+        multi_index = view.unravel(flat)
+        self.assertTrue(np.array_equal(view.ravel(multi_index), flat))
+        self.assertTrue(np.array_equal(np.ravel_multi_index(multi_index, view.shape), flat))
+
+        with self.assertRaises(ValueError):
+            view.ravel((1, 2))
+
+    def test_invalid_names(self):
+        view = GroundedFluentView('f', ['x', 'y', 'z'], self.table)
+        for name in ['f(x0,y0)', 'f(x0,y0,w0)', 'g(x0,y0,z0)', 'f', 42]:
+            self.assertNotIn(name, view)
+            with self.assertRaises(ValueError):
+                view.index(name)
+        with self.assertRaises(IndexError):
+            view[10 ** 9]
+
+    def test_equality(self):
+        view = self.rddl1.state_fluent_variables[0][1]
+        self.assertEqual(view, GroundedFluentView('rlevel', ['res'], self.rddl1.object_table))
+        self.assertEqual(view, ['rlevel(t{})'.format(i) for i in range(1, 9)])
+        self.assertNotEqual(view, ['rlevel(t1)'])
@@ -0,0 +1,145 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.incremental import IncrementalEvaluator
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestIncrementalEvaluator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        cls.rddl = parser.parse(MARS_ROVER)
+        cls.rddl.build()
+        cls.rddl2 = parser.parse(RESERVOIR)
+        cls.rddl2.build()
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.batch_size = 8
+
+    def batch(self):
+        rng = np.random.default_rng(0)
+        state = {
+            'xPos/0': rng.random(self.batch_size) * 10.0,
+            'yPos/0': rng.random(self.batch_size) * 10.0,
+            'time/0': np.zeros(self.batch_size),
+            'picTaken/1': np.zeros((self.batch_size, 3), dtype=bool)
+        }
+        action = {
+            'xMove/0': np.zeros(self.batch_size),
+            'yMove/0': np.zeros(self.batch_size),
+            'snapPicture/0': np.ones(self.batch_size, dtype=bool)
+        }
+        return state, action
+
+    def assertMatchesStep(self, results, state, action):
+        module = codegen.compile_step(self.rddl, cache_dir=self.cache_dir)
+        _, expected, reward = module.step(state, action, np.random.default_rng(0))
+        _, next_state, reward2 = results
+        for name, tensor in expected.items():
+            np.testing.assert_array_equal(next_state[name], tensor)
+        np.testing.assert_array_equal(reward2, reward)
+
+    def test_unchanged_inputs(self):
+        evaluator = IncrementalEvaluator(self.rddl, cache_dir=self.cache_dir)
+        state, action = self.batch()
+        evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed['reward'], self.batch_size)
+        results = evaluator(state, action, np.random.default_rng(0))
+        for name in ["picTaken'/1", "time'/0", 'reward']:
+            self.assertEqual(evaluator.recomputed[name], 0)
+        self.assertEqual(evaluator.recomputed["xPos'/0"], self.batch_size)
+        self.assertMatchesStep(results, state, action)
+
+    def test_single_entry_perturbation(self):
+        evaluator = IncrementalEvaluator(self.rddl, cache_dir=self.cache_dir)
+        state, action = self.batch()
+        evaluator(state, action, np.random.default_rng(0))
+
+        action['snapPicture/0'][2] = False
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["time'/0"], 1)
+        self.assertEqual(evaluator.recomputed["picTaken'/1"], 1)
+        self.assertMatchesStep(results, state, action)
+
+        state['xPos/0'][5] = 1.0
+        state['yPos/0'][5] = 1.0
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["picTaken'/1"], 1)
+        self.assertEqual(evaluator.recomputed["time'/0"], 0)
+        self.assertMatchesStep(results, state, action)
+
+    def test_full_recompute(self):
+        evaluator = IncrementalEvaluator(self.rddl, cache_dir=self.cache_dir)
+        state, action = self.batch()
+        evaluator(state, action, np.random.default_rng(0))
+        state['time/0'][:] = 20.0
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["time'/0"], self.batch_size)
+        self.assertMatchesStep(results, state, action)
+
+        state, action = self.batch()
+        evaluator.reset()
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["xPos'/0"], self.batch_size)
+        self.assertMatchesStep(results, state, action)
+
+    def test_broadcast_inputs(self):
+        evaluator = IncrementalEvaluator(self.rddl, cache_dir=self.cache_dir)
+        state, action = self.batch()
+        state['time/0'] = np.array([3.0])
+        evaluator(state, action, np.random.default_rng(0))
+
+        action['snapPicture/0'][4] = False
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["time'/0"], 1)
+        self.assertEqual(evaluator.recomputed["picTaken'/1"], 1)
+
+        state['time/0'] = np.array([5.0])
+        results = evaluator(state, action, np.random.default_rng(0))
+        self.assertEqual(evaluator.recomputed["time'/0"], self.batch_size)
+        state['time/0'] = np.full(self.batch_size, 5.0)
+        self.assertMatchesStep(results, state, action)
+
+    def test_random_cpfs(self):
+        rddl = self.rddl2
+        evaluator = IncrementalEvaluator(rddl, cache_dir=self.cache_dir)
+        state = { 'rlevel/1': np.full((self.batch_size, 8), 75.0) }
+        action = { 'outflow/1': np.zeros((self.batch_size, 8)) }
+        interms, next_state, _ = evaluator(state, action, np.random.default_rng(0))
+        rainfall = np.array(interms['rainfall/1'])
+        rlevel = np.array(next_state['rlevel/1'])
+
+        interms, next_state, _ = evaluator(state, action, np.random.default_rng(1))
+        self.assertEqual(evaluator.recomputed['rainfall/1'], self.batch_size)
+        self.assertEqual(evaluator.recomputed['evaporated/1'], 0)
+        self.assertFalse(np.array_equal(interms['rainfall/1'], rainfall))
+        self.assertFalse(np.array_equal(next_state['rlevel/1'], rlevel))
+        expected = np.maximum(0.0, 75.0 + interms['rainfall/1'] - interms['evaporated/1'] - interms['overflow/1'] + interms['inflow/1'])
+        np.testing.assert_allclose(next_state['rlevel/1'], expected)
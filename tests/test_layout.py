@@ -0,0 +1,124 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.layout import FluentLayout
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestFluentLayout(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def test_homogeneous_layout(self):
+        layout = FluentLayout.from_rddl(self.rddl1, 'interm')
+        self.assertListEqual(layout.names, self.rddl1.domain.interm_fluent_ordering)
+        self.assertEqual(layout.dtype, np.float64)
+        self.assertListEqual(layout.offsets, [0, 8, 16, 24])
+        self.assertEqual(layout.width, 32)
+
+        buffer = layout.allocate(5)
+        views = layout.views(buffer)
+        for name in layout.names:
+            self.assertEqual(views[name].shape, (5, 8))
+            self.assertTrue(np.shares_memory(views[name], buffer))
+        views['inflow/1'][2, 3] = 7.0
+        self.assertEqual(buffer[2, layout.column_slice('inflow/1')][3], 7.0)
+
+    def test_heterogeneous_layout(self):
+        layout = FluentLayout.from_rddl(self.rddl2, 'state')
+        self.assertFalse(layout.homogeneous)
+        self.assertEqual(layout.dtype, np.uint8)
+        self.assertListEqual(layout.offsets, [0, 8, 16, 24])
+        self.assertEqual(layout.nbytes, 32)
+
+        state = self.rddl2.initial_state_tensors()
+        batch = { name: np.repeat(tensor[np.newaxis], 3, axis=0) for name, tensor in state.items() }
+        batch['xPos/0'][1] = 2.5
+        buffer = layout.pack(batch)
+        views = layout.views(buffer)
+        for name in layout.names:
+            self.assertEqual(views[name].dtype, batch[name].dtype)
+            self.assertTrue(np.shares_memory(views[name], buffer))
+            np.testing.assert_array_equal(views[name], batch[name])
+
+        copy = layout.views(buffer.copy())
+        np.testing.assert_array_equal(copy['xPos/0'], [0.0, 2.5, 0.0])
+
+    def test_common_dtype(self):
+        layout = FluentLayout.from_rddl(self.rddl2, 'state', dtype=np.float32)
+        self.assertEqual(layout.dtype, np.float32)
+        self.assertEqual(layout.width, 6)
+        buffer = layout.pack({ 'picTaken/1': [[True, False, True]], 'time/0': [1.0], 'xPos/0': [2.0], 'yPos/0': [3.0] })
+        self.assertListEqual(buffer.tolist(), [[1.0, 0.0, 1.0, 1.0, 2.0, 3.0]])
+
+    def test_invalid_buffer(self):
+        layout = FluentLayout.from_rddl(self.rddl1, 'state')
+        with self.assertRaises(ValueError):
+            layout.views(np.zeros((2, 9)))
+        with self.assertRaises(ValueError):
+            layout.views(np.zeros((2, 8), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            layout.views(np.zeros((2, 16))[:, ::2])
+        with self.assertRaises(ValueError):
+            FluentLayout.from_rddl(self.rddl1, 'observ')
+
+    def test_make_step_writes_views(self):
+        for rddl in (self.rddl1, self.rddl2):
+            module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+            state_layout = FluentLayout.from_rddl(rddl, 'state')
+            interm_layout = FluentLayout.from_rddl(rddl, 'interm')
+            states = [state_layout.allocate(4) for _ in range(2)]
+            interms = [interm_layout.allocate(4) for _ in range(2)]
+            views = [dict(state_layout.views(s), **interm_layout.views(i)) for s, i in zip(states, interms)]
+            arena_step = module.make_step(4, views)
+
+            initial = rddl.initial_state_tensors()
+            state1 = { name: np.repeat(tensor[np.newaxis], 4, axis=0) for name, tensor in initial.items() }
+            state2 = state_layout.views(state_layout.pack(state1))
+            action_layout = FluentLayout.from_rddl(rddl, 'action')
+            action = action_layout.views(action_layout.allocate(4))
+            for t in range(3):
+                interms1, state1, reward1 = module.step(state1, action, np.random.default_rng(t))
+                interms2, state2, reward2 = arena_step(state2, action, np.random.default_rng(t))
+                state_views = state_layout.views(states[t % 2])
+                interm_views = interm_layout.views(interms[t % 2])
+                for name in state1:
+                    np.testing.assert_array_equal(state1[name], state2[name])
+                    np.testing.assert_array_equal(state1[name], state_views[name])
+                    self.assertTrue(np.shares_memory(state2[name], states[t % 2]))
+                for name in interms1:
+                    np.testing.assert_array_equal(interms1[name], interm_views[name])
+                np.testing.assert_array_equal(reward1, reward2)
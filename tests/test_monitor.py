@@ -0,0 +1,98 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.monitor import ConstraintMonitor
+from pyrddl.parser import RDDLParser
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestConstraintMonitor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(RESERVOIR.replace('\tstate-invariants {',
+            '\tstate-action-constraints {\n\t\tforall_{?r : res} outflow(?r) <= 100.0;\n\t};\n\n\tstate-invariants {'))
+        cls.rddl2.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def states(self, batch_size):
+        return { 'rlevel/1': np.full((batch_size, 8), 50.0) }
+
+    def test_invariants(self):
+        monitor = ConstraintMonitor(self.rddl1, cache_dir=self.cache_dir)
+        state = self.states(6)
+        self.assertListEqual(monitor(state), [])
+        state['rlevel/1'][[1, 4], 3] = -1.0
+        violations = monitor(state)
+        self.assertEqual(len(violations), 1)
+        violation = violations[0]
+        self.assertEqual(violation.step, 1)
+        self.assertEqual(violation.kind, 'invariants')
+        self.assertEqual(violation.index, 0)
+        self.assertListEqual(violation.rows.tolist(), [1, 4])
+        self.assertListEqual(monitor.violations, violations)
+        self.assertIn('invariants[0] violated by 2 batch element(s) [1, 4]', monitor.describe(violation))
+
+    def test_state_action_constraints(self):
+        monitor = ConstraintMonitor(self.rddl2, cache_dir=self.cache_dir)
+        state = self.states(3)
+        action = { 'outflow/1': np.zeros((3, 8)) }
+        action['outflow/1'][2, 0] = 150.0
+        self.assertListEqual(monitor(state), [])
+        violations = monitor(state, action)
+        self.assertEqual(len(violations), 1)
+        self.assertEqual(violations[0].kind, 'constraints')
+        self.assertListEqual(violations[0].rows.tolist(), [2])
+
+    def test_every(self):
+        monitor = ConstraintMonitor(self.rddl1, every=3, cache_dir=self.cache_dir)
+        state = self.states(2)
+        state['rlevel/1'][0, 0] = -1.0
+        steps = [t for t in range(10) if monitor(state)]
+        self.assertListEqual(steps, [0, 3, 6, 9])
+        self.assertEqual(monitor.step, 10)
+        self.assertEqual(monitor.checked, 4)
+
+    def test_rate(self):
+        monitor = ConstraintMonitor(self.rddl1, rate=0.25, seed=0, cache_dir=self.cache_dir)
+        state = self.states(2)
+        for _ in range(400):
+            monitor(state)
+        self.assertGreater(monitor.checked, 50)
+        self.assertLess(monitor.checked, 150)
+        self.assertEqual(ConstraintMonitor(self.rddl1, rate=0.0, cache_dir=self.cache_dir).scheduled(), False)
+        with self.assertRaises(ValueError):
+            ConstraintMonitor(self.rddl1, rate=2.0, cache_dir=self.cache_dir)
+        with self.assertRaises(ValueError):
+            ConstraintMonitor(self.rddl1, every=0, cache_dir=self.cache_dir)
+
+    def test_strict(self):
+        monitor = ConstraintMonitor(self.rddl1, strict=True, cache_dir=self.cache_dir)
+        state = self.states(2)
+        state['rlevel/1'][1, 5] = -1.0
+        with self.assertRaises(ValueError):
+            monitor(state)
@@ -0,0 +1,123 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.objects import ObjectTable, ObjectType
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import unittest
+from unittest import mock
+
+
+class TestObjectTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+
+        cls.rddl3 = parser.parse(RESERVOIR.replace('res: object;', 'res: object;\n\t\tseason: {@dry, @wet};'))
+        cls.rddl3.build()
+
+    def test_object_table(self):
+        table = self.rddl1.object_table
+        self.assertIsInstance(table, ObjectTable)
+        self.assertListEqual(list(table), ['res'])
+        res = table['res']
+        self.assertIsInstance(res, ObjectType)
+        self.assertFalse(res.enum)
+        self.assertEqual(res.size, 8)
+        self.assertEqual(res['size'], 8)
+        self.assertListEqual(res['objects'], ['t{}'.format(i) for i in range(1, 9)])
+        self.assertEqual(res['idx']['t3'], 2)
+        self.assertEqual(res.index('t3'), 2)
+        with self.assertRaises(ValueError):
+            res.index('p1')
+
+    def test_enum_types(self):
+        table = self.rddl3.object_table
+        self.assertListEqual(list(table), ['res', 'season'])
+        season = table['season']
+        self.assertTrue(season.enum)
+        self.assertListEqual(season.names, ['@dry', '@wet'])
+        self.assertEqual(season.index('@wet'), 1)
+
+    def test_names_to_indices(self):
+        objects = ['obj{}'.format(i) for i in range(1000)]
+        rng = np.random.default_rng(0)
+        rng.shuffle(objects)
+        otype = ObjectType('thing', objects)
+        indices = rng.integers(0, 1000, size=(50, 3))
+        names = np.array(objects)[indices]
+        self.assertTrue(np.array_equal(otype.names_to_indices(names), indices))
+        self.assertTrue(np.array_equal(otype.indices_to_names(indices), names))
+        self.assertEqual(otype.names_to_indices([]).shape, (0,))
+        with self.assertRaises(ValueError):
+            otype.names_to_indices(['obj1', 'obj1000'])
+        with self.assertRaises(ValueError):
+            otype.names_to_indices(['obj99999'])
+        with self.assertRaises(ValueError):
+            ObjectType('thing', ['a', 'b', 'a'])
+
+    def test_table_names_to_indices(self):
+        table = self.rddl1.object_table
+        names = [['t1', 't6'], ['t2', 't3'], ['t8', 't8']]
+        indices = table.names_to_indices(['res', 'res'], names)
+        self.assertListEqual(indices.tolist(), [[0, 5], [1, 2], [7, 7]])
+        self.assertListEqual(table.indices_to_names(['res', 'res'], indices).tolist(), names)
+        self.assertEqual(table.names_to_indices([], [(), ()]).shape, (2, 0))
+        with self.assertRaises(ValueError):
+            table.names_to_indices(['res', 'res'], [['t1', 'p1']])
+        with self.assertRaises(ValueError):
+            table.names_to_indices(['res', 'res'], [['t1', 't2', 't3'], ['t4']])
+        with self.assertRaises(ValueError):
+            table.names_to_indices(['res', 'res'], [['t1', 't2'], ['t3']])
+
+    def test_non_fluent_entries(self):
+        entries = codegen.non_fluent_entries(self.rddl1)
+        self.assertEqual(entries['DOWNSTREAM/2'][(0, 5)], True)
+        self.assertEqual(entries['RAIN_SCALE/1'][(7,)], 30.0)
+        self.assertEqual(entries['MAX_WATER_EVAP_FRAC_PER_TIME_UNIT/0'], {})
+        entries = codegen.non_fluent_entries(self.rddl2)
+        self.assertEqual(entries['MAX_TIME/0'], { (): 12.0 })
+
+    def test_names_to_indices_with_hash_collisions(self):
+        objects = ['a', 'b', 'c']
+        otype = ObjectType('thing', objects)
+        with mock.patch('pyrddl.objects._fnv1a', lambda codes: np.zeros(len(codes), dtype=np.uint64)):
+            self.assertListEqual(otype.names_to_indices(np.array(['c', 'a'])).tolist(), [2, 0])
+            with self.assertRaises(ValueError):
+                otype.names_to_indices(np.array(['d']))
+
+    def test_sequence_names_to_indices(self):
+        table = self.rddl1.object_table
+        self.assertListEqual(table['res'].names_to_indices(['t2', 't1']).tolist(), [1, 0])
+        with self.assertRaises(ValueError):
+            table['res'].names_to_indices(['t2', 'p1'])
+        names = np.array([['t1', 't6'], ['t2', 't3']])
+        self.assertListEqual(table.names_to_indices(['res', 'res'], names).tolist(), [[0, 5], [1, 2]])
@@ -0,0 +1,137 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.packed import PackedFluents, BOOLEAN_OPS, num_words, pack, unpack
+from pyrddl.preconditions import PreconditionChecker
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestPacked(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl = parser.parse(MARS_ROVER)
+        cls.rddl.build()
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.rng = np.random.default_rng(42)
+
+    def test_pack_unpack(self):
+        for batch_size in [1, 63, 64, 65, 200]:
+            tensor = self.rng.random((batch_size, 3, 2)) < 0.5
+            words = pack(tensor)
+            self.assertEqual(words.dtype, np.uint64)
+            self.assertEqual(words.shape, (3, 2, num_words(batch_size)))
+            np.testing.assert_array_equal(unpack(words, batch_size), tensor)
+
+        words = pack(np.array([True] + [False] * 64 + [True]))
+        self.assertListEqual(words.tolist(), [1, 2])
+
+    def test_boolean_ops(self):
+        a, b = self.rng.random((2, 130, 4)) < 0.5
+        pa, pb = pack(a), pack(b)
+        expected = {
+            '^': a & b, '&': a & b, '|': a | b,
+            '=>': ~a | b, '<=>': a == b
+        }
+        for op, value in expected.items():
+            np.testing.assert_array_equal(unpack(BOOLEAN_OPS[op](pa, pb), 130), value)
+        np.testing.assert_array_equal(unpack(BOOLEAN_OPS['~'](pa), 130), ~a)
+
+    def test_packed_fluents(self):
+        fluents = {
+            'picTaken/1': self.rng.random((100, 3)) < 0.5,
+            'time/0': self.rng.random(100)
+        }
+        packed = PackedFluents.pack(fluents)
+        self.assertEqual(packed.batch_size, 100)
+        self.assertSetEqual(packed.packed, {'picTaken/1'})
+        self.assertEqual(packed.words('picTaken/1').shape, (3, 2))
+        self.assertLess(packed.nbytes, 100 * 3 + 100 * 8)
+        for name, tensor in fluents.items():
+            np.testing.assert_array_equal(packed[name], tensor)
+
+        rows = packed.rows(64, 100)
+        self.assertEqual(rows.batch_size, 36)
+        np.testing.assert_array_equal(rows['picTaken/1'], fluents['picTaken/1'][64:])
+        np.testing.assert_array_equal(rows['time/0'], fluents['time/0'][64:])
+        with self.assertRaises(ValueError):
+            packed.rows(10, 20)
+        with self.assertRaises(ValueError):
+            packed.words('time/0')
+
+    def test_packed_fluents_broadcast(self):
+        fluents = {
+            'picTaken/1': self.rng.random((1, 3)) < 0.5,
+            'snapPicture/0': self.rng.random(100) < 0.5,
+            'time/0': np.array([2.0])
+        }
+        packed = PackedFluents.pack(fluents)
+        self.assertEqual(packed.batch_size, 100)
+        rows = packed.rows(64, 100)
+        self.assertEqual(rows.batch_size, 36)
+        np.testing.assert_array_equal(rows['picTaken/1'], np.broadcast_to(fluents['picTaken/1'], (36, 3)))
+        np.testing.assert_array_equal(rows['time/0'], [2.0])
+
+    def test_packed_step(self):
+        batch_size = 70
+        state = {
+            'xPos/0': self.rng.random(batch_size),
+            'yPos/0': self.rng.random(batch_size),
+            'time/0': np.zeros(batch_size),
+            'picTaken/1': self.rng.random((batch_size, 3)) < 0.5
+        }
+        action = {
+            'xMove/0': np.zeros(batch_size),
+            'yMove/0': np.zeros(batch_size),
+            'snapPicture/0': self.rng.random(batch_size) < 0.5
+        }
+        module = codegen.compile_step(self.rddl, cache_dir=self.cache_dir)
+        _, expected, reward1 = module.step(state, action, np.random.default_rng(0))
+        _, next_state, reward2 = module.step(PackedFluents.pack(state), PackedFluents.pack(action), np.random.default_rng(0))
+        np.testing.assert_array_equal(reward1, reward2)
+        for name, tensor in expected.items():
+            np.testing.assert_array_equal(next_state[name], tensor)
+
+    def test_packed_mask(self):
+        batch_size = 200
+        snap = self.rng.random(batch_size) < 0.5
+        xmove = (self.rng.random(batch_size) < 0.5).astype(float)
+        action = PackedFluents.pack({
+            'xMove/0': xmove,
+            'yMove/0': np.zeros(batch_size),
+            'snapPicture/0': snap
+        })
+        state = {
+            'xPos/0': np.zeros(1),
+            'yPos/0': np.zeros(1),
+            'time/0': np.zeros(1),
+            'picTaken/1': np.zeros((1, 3), dtype=bool)
+        }
+        checker = PreconditionChecker(self.rddl, self.cache_dir)
+        words = checker.packed_mask(state, action, chunk_size=64)
+        self.assertEqual(words.shape, (num_words(batch_size),))
+        np.testing.assert_array_equal(unpack(words, batch_size), ~snap | (xmove == 0.0))
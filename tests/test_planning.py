@@ -0,0 +1,100 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.planning import CommonRandomNumbers, PlanEvaluator
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestPlanEvaluator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def test_common_random_numbers(self):
+        rng = CommonRandomNumbers(np.random.default_rng(0), 3)
+        samples = rng.standard_normal(size=(6, 2))
+        np.testing.assert_array_equal(samples[0], samples[1])
+        np.testing.assert_array_equal(samples[3], samples[5])
+        self.assertFalse(np.array_equal(samples[0], samples[3]))
+
+        out = np.empty(6)
+        rng.random(out=out)
+        self.assertEqual(len(np.unique(out)), 2)
+
+        gamma = rng.standard_gamma(np.full((1, 2), 5.0), size=(6, 2))
+        np.testing.assert_array_equal(gamma[0], gamma[2])
+        gamma = rng.standard_gamma(np.arange(1.0, 7.0)[:, None], size=(6, 1))
+        self.assertEqual(len(np.unique(gamma)), 6)
+
+        with self.assertRaises(ValueError):
+            rng.random(size=(4,))
+
+    def test_deterministic_plans(self):
+        rddl = self.rddl2
+        evaluator = PlanEvaluator(rddl, cache_dir=self.cache_dir)
+        snap = np.zeros((2, 4), dtype=bool)
+        snap[1] = True
+        returns = evaluator({ 'snapPicture/0': snap }, samples=3, seed=0)
+        self.assertEqual(returns.shape, (2, 3))
+
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        for k in range(2):
+            state = { name: tensor[np.newaxis] for name, tensor in rddl.initial_state_tensors().items() }
+            expected = 0.0
+            for t in range(4):
+                action = {
+                    'xMove/0': np.zeros(1), 'yMove/0': np.zeros(1),
+                    'snapPicture/0': snap[k, t:t + 1]
+                }
+                _, state, reward = module.step(state, action, np.random.default_rng(t))
+                expected += reward[0]
+            np.testing.assert_allclose(returns[k], expected)
+
+    def test_common_random_numbers_across_plans(self):
+        evaluator = PlanEvaluator(self.rddl1, cache_dir=self.cache_dir)
+        plans = { 'outflow/1': np.full((3, 5, 8), 10.0) }
+        returns = evaluator(plans, samples=4, seed=1)
+        self.assertEqual(returns.shape, (3, 4))
+        np.testing.assert_array_equal(returns[0], returns[1])
+        np.testing.assert_array_equal(returns[0], returns[2])
+        self.assertGreater(len(np.unique(returns[0])), 1)
+
+        returns = evaluator(plans, samples=4, seed=1, common=False)
+        self.assertFalse(np.array_equal(returns[0], returns[1]))
+
+    def test_invalid_plans(self):
+        evaluator = PlanEvaluator(self.rddl1, cache_dir=self.cache_dir)
+        with self.assertRaises(ValueError):
+            evaluator({})
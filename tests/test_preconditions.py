@@ -0,0 +1,100 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.parser import RDDLParser
+from pyrddl.preconditions import PreconditionChecker, action_preconditions
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestPreconditionChecker(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def test_action_preconditions(self):
+        preconds = action_preconditions(self.rddl1.domain)
+        self.assertListEqual([name for name, _ in preconds], ['outflow/1', 'outflow/1'])
+        preconds = action_preconditions(self.rddl2.domain)
+        self.assertListEqual([name for name, _ in preconds], [None])
+
+    def test_local_preconditions(self):
+        checker = PreconditionChecker(self.rddl1, cache_dir=self.cache_dir)
+        state = { name: tensor[np.newaxis] for name, tensor in self.rddl1.initial_state_tensors().items() }
+        outflow = np.random.default_rng(0).uniform(-5.0, 80.0, size=(1000, 8))
+        feasible = checker(state, { 'outflow/1': outflow })
+        expected = (outflow <= state['rlevel/1']).all(axis=1) & (outflow >= 0).all(axis=1)
+        self.assertEqual(feasible.shape, (1000,))
+        np.testing.assert_array_equal(feasible, expected)
+
+        violation = checker.first_violation(state, { 'outflow/1': outflow })
+        np.testing.assert_array_equal(violation == 0, ~(outflow <= state['rlevel/1']).all(axis=1))
+        np.testing.assert_array_equal(violation < 0, expected)
+
+    def test_batched_states(self):
+        checker = PreconditionChecker(self.rddl1, cache_dir=self.cache_dir)
+        state = { 'rlevel/1': np.array([[10.0] * 8, [1.0] * 8]) }
+        action = { 'outflow/1': np.array([[5.0] * 8, [5.0] * 8]) }
+        self.assertListEqual(checker(state, action).tolist(), [True, False])
+
+    def test_short_circuit(self):
+        checker = PreconditionChecker(self.rddl1, cache_dir=self.cache_dir)
+        rows = []
+        functions = list(checker._functions)
+
+        def counting(function):
+            def wrapper(fluents):
+                rows.append(len(fluents['outflow/1']))
+                return function(fluents)
+            return wrapper
+
+        checker._functions = [counting(function) for function in functions]
+        state = { 'rlevel/1': np.full((1, 8), 50.0) }
+        outflow = np.full((10, 8), 10.0)
+        outflow[:7, 0] = 60.0
+        self.assertEqual(checker(state, { 'outflow/1': outflow }).sum(), 3)
+        self.assertListEqual(rows, [10, 3])
+
+        rows.clear()
+        outflow[:, 0] = 60.0
+        self.assertFalse(checker(state, { 'outflow/1': outflow }).any())
+        self.assertListEqual(rows, [10])
+
+    def test_global_preconditions(self):
+        checker = PreconditionChecker(self.rddl2, cache_dir=self.cache_dir)
+        state = { name: tensor[np.newaxis] for name, tensor in self.rddl2.initial_state_tensors().items() }
+        action = {
+            'snapPicture/0': np.array([True, True, False, False]),
+            'xMove/0': np.array([0.0, 1.0, 1.0, 0.0]),
+            'yMove/0': np.array([0.0, 0.0, 2.0, 0.0])
+        }
+        self.assertListEqual(checker(state, action).tolist(), [True, False, True, True])
@@ -14,11 +14,14 @@
 # along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
 
 
+from pyrddl.grounding import GroundedFluentView
 from pyrddl.parser import RDDLParser
 from pyrddl.pvariable import PVariable
 from pyrddl.rddl import RDDL
 
+import numpy as np
 import unittest
+from unittest import mock
 
 
 class TestRDDL(unittest.TestCase):
@@ -77,7 +80,8 @@ class TestRDDL(unittest.TestCase):
             self.assertEqual(len(fluent_variables), len(expected_variables))
             for name, actual_variables in fluent_variables:
                 self.assertIn(name, expected_variables)
-                self.assertListEqual(actual_variables, expected_variables[name])
+                self.assertIsInstance(actual_variables, GroundedFluentView)
+                self.assertListEqual(list(actual_variables), expected_variables[name])
 
     def test_interm_fluent_variables(self):
         rddls = [self.rddl1, self.rddl2]
@@ -95,7 +99,8 @@ class TestRDDL(unittest.TestCase):
             self.assertEqual(len(fluent_variables), len(expected_variables))
             for name, actual_variables in fluent_variables:
                 self.assertIn(name, expected_variables)
-                self.assertListEqual(actual_variables, expected_variables[name])
+                self.assertIsInstance(actual_variables, GroundedFluentView)
+                self.assertListEqual(list(actual_variables), expected_variables[name])
 
     def test_action_fluent_variables(self):
         rddls = [self.rddl1, self.rddl2]
@@ -114,7 +119,8 @@ class TestRDDL(unittest.TestCase):
             self.assertEqual(len(fluent_variables), len(expected_variables))
             for name, actual_variables in fluent_variables:
                 self.assertIn(name, expected_variables)
-                self.assertListEqual(actual_variables, expected_variables[name])
+                self.assertIsInstance(actual_variables, GroundedFluentView)
+                self.assertListEqual(list(actual_variables), expected_variables[name])
 
     def test_state_size(self):
         rddls = [self.rddl1, self.rddl2]
@@ -191,6 +197,92 @@ class TestRDDL(unittest.TestCase):
                 self.assertIsInstance(range_type, str)
                 self.assertEqual(range_type, fluent.range)
 
+    def test_fluent_tables_are_cached(self):
+        for rddl in self.rddls:
+            with mock.patch.object(RDDL, '_fluent_params') as fluent_params, \
+                    mock.patch.object(RDDL, '_fluent_size') as fluent_size:
+                for _ in range(100):
+                    self.assertIs(rddl.state_fluent_variables, rddl.state_fluent_variables)
+                    self.assertIs(rddl.action_size, rddl.action_size)
+                    self.assertIs(rddl.interm_range_type, rddl.interm_range_type)
+                    rddl.non_fluent_variables
+                    rddl.state_size
+                fluent_params.assert_not_called()
+                fluent_size.assert_not_called()
+
+    def test_fluent_tables_invalidation(self):
+        parser = RDDLParser()
+        parser.build()
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            rddl = parser.parse(file.read())
+        rddl.build()
+        self.assertTupleEqual(rddl.state_size, ((8,),))
+
+        object_table = dict(rddl.object_table)
+        objects = ['t1', 't2', 't3']
+        object_table['res'] = { 'size': 3, 'idx': { obj: i for i, obj in enumerate(objects) }, 'objects': objects }
+        rddl.object_table = object_table
+        self.assertTupleEqual(rddl.state_size, ((3,),))
+        self.assertTupleEqual(rddl.state_fluent_variables, (('rlevel/1', ('rlevel(t1)', 'rlevel(t2)', 'rlevel(t3)')),))
+
+        rddl.object_table['res'] = { 'size': 2, 'idx': { 't1': 0, 't2': 1 }, 'objects': ['t1', 't2'] }
+        rddl.invalidate_fluent_tables()
+        self.assertTupleEqual(rddl.action_size, ((2,),))
+
+    def test_non_fluent_tensors(self):
+        for rddl in self.rddls:
+            tensors = rddl.non_fluent_tensors()
+            self.assertListEqual(list(tensors), rddl.domain.non_fluent_ordering)
+            for (name, tensor), size in zip(tensors.items(), rddl.non_fluent_size):
+                pvar = rddl.domain.non_fluents[name]
+                self.assertTupleEqual(tensor.shape, size)
+                self.assertEqual(tensor.dtype, {'bool': np.bool_, 'int': np.int64, 'real': np.float64}[pvar.range])
+
+        tensors = self.rddl1.non_fluent_tensors()
+        self.assertListEqual(np.flatnonzero(tensors['DOWNSTREAM/2']).tolist(), [5, 10, 20, 31, 38, 46, 55])
+        self.assertListEqual(tensors['RAIN_SCALE/1'].tolist(), [5.0, 3.0, 9.0, 7.0, 15.0, 13.0, 25.0, 30.0])
+        self.assertListEqual(tensors['LOWER_BOUND/1'].tolist(), [20.0] * 8)
+        self.assertListEqual(tensors['SINK_RES/1'].tolist(), [False] * 7 + [True])
+        self.assertEqual(tensors['MAX_WATER_EVAP_FRAC_PER_TIME_UNIT/0'], 0.05)
+
+        tensors = self.rddl2.non_fluent_tensors()
+        self.assertEqual(tensors['MAX_TIME/0'], 12.0)
+        self.assertListEqual(tensors['PICT_VALUE/1'][:2].tolist(), [5.0, 10.0])
+
+    def test_initial_state_tensors(self):
+        tensors = self.rddl1.initial_state_tensors()
+        self.assertListEqual(list(tensors), ['rlevel/1'])
+        self.assertListEqual(tensors['rlevel/1'].tolist(), [75.0] + [50.0] * 7)
+
+        tensors = self.rddl2.initial_state_tensors()
+        self.assertListEqual(list(tensors), self.rddl2.domain.state_fluent_ordering)
+        self.assertEqual(tensors['picTaken/1'].dtype, np.bool_)
+        self.assertListEqual(tensors['picTaken/1'].tolist(), [False] * 3)
+
+    def test_narrow_tensors(self):
+        for rddl in self.rddls:
+            wide = rddl.non_fluent_tensors()
+            wide.update(rddl.initial_state_tensors())
+            narrow = rddl.non_fluent_tensors(narrow=True)
+            narrow.update(rddl.initial_state_tensors(narrow=True))
+            for name, tensor in narrow.items():
+                self.assertIn(tensor.dtype, (np.bool_, np.int32, np.float32))
+                self.assertTrue(np.allclose(tensor, wide[name]))
+                if tensor.dtype != np.bool_:
+                    self.assertEqual(tensor.nbytes * 2, wide[name].nbytes)
+
+    def test_get_dependencies(self):
+        domain = self.rddl1.domain
+        cpf = domain.get_cpf('rlevel/1')
+        deps = self.rddl1.get_dependencies(cpf.expr)
+        names = { str(fluent) for fluent in deps }
+        self.assertIn('rlevel/1', names)
+        self.assertIn('outflow/1', names)
+        self.assertIn('DOWNSTREAM/2', names)
+        self.assertIn('RAIN_SHAPE/1', names)
+        for fluent in deps:
+            self.assertFalse(fluent.is_intermediate_fluent())
+
     def test_dependencies(self):
         self.gamma_shape = Expression(('pvar_expr', ('shape', ['?r'])))
         self.gamma_scale = Expression(('pvar_expr', ('scale', ['?r'])))
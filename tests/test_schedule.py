@@ -0,0 +1,117 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+from pyrddl import schedule
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestSchedule(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+        cls.rddls = [cls.rddl1, cls.rddl2]
+
+        cls.rddl3 = parser.parse(RESERVOIR.replace('inflow(res):     {interm-fluent, real, level=2}', 'inflow(res):     {interm-fluent, real, level=1}'))
+        cls.rddl3.build()
+
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.batch_size = 4
+
+    def initial_state(self, rddl):
+        return {
+            name: np.full((self.batch_size,) + size, rddl.domain.state_fluents[name].default, dtype=codegen.NUMPY_DTYPES[range_type])
+            for name, size, range_type in zip(rddl.domain.state_fluent_ordering, rddl.state_size, rddl.state_range_type)
+        }
+
+    def default_action(self, rddl):
+        return {
+            name: np.full((self.batch_size,) + size, rddl.domain.action_fluents[name].default, dtype=codegen.NUMPY_DTYPES[range_type])
+            for name, size, range_type in zip(rddl.domain.action_fluent_ordering, rddl.action_size, rddl.action_range_type)
+        }
+
+    def test_evaluation_waves(self):
+        waves = schedule.evaluation_waves(self.rddl1)
+        self.assertListEqual(waves, [['evaporated/1', 'overflow/1', 'rainfall/1'], ['inflow/1'], ["rlevel'/1"]])
+        waves = schedule.evaluation_waves(self.rddl2)
+        self.assertEqual(len(waves), 1)
+        self.assertListEqual(sorted(waves[0]), sorted(self.rddl2.domain.next_state_fluent_ordering))
+
+    def test_dependency_levels(self):
+        levels = schedule.dependency_levels(self.rddl1)
+        for name in self.rddl1.domain.intermediate_fluents:
+            self.assertEqual(levels[name], self.rddl1.domain.intermediate_fluents[name].level)
+        self.assertEqual(levels["rlevel'/1"], 3)
+
+    def test_validate_levels(self):
+        for rddl in self.rddls:
+            schedule.validate_levels(rddl)
+        with self.assertRaises(ValueError):
+            schedule.validate_levels(self.rddl3)
+        self.assertListEqual(schedule.evaluation_waves(self.rddl3), schedule.evaluation_waves(self.rddl1))
+
+    def test_scheduled_step(self):
+        rddl = self.rddl1
+        module = codegen.compile_step(rddl, cache_dir=self.cache_dir)
+        state = self.initial_state(rddl)
+        state['rlevel/1'][:] = np.linspace(10.0, 120.0, 8)
+        action = self.default_action(rddl)
+        action['outflow/1'][:] = 5.0
+        interms1, _, _ = module.step(state, action, np.random.default_rng(0))
+
+        with schedule.ScheduledStep(rddl, max_workers=4, cache_dir=self.cache_dir) as step:
+            interms2, next_state2, reward2 = step(state, action, np.random.default_rng(0))
+        for name in ['evaporated/1', 'overflow/1']:
+            np.testing.assert_allclose(interms1[name], interms2[name])
+
+        rlevel = state['rlevel/1']
+        outflow = action['outflow/1']
+        inflow = interms2['inflow/1']
+        expected = np.maximum(0.0, rlevel + interms2['rainfall/1'] - interms2['evaporated/1'] - outflow - interms2['overflow/1'] + inflow)
+        np.testing.assert_allclose(next_state2['rlevel/1'], expected)
+        self.assertEqual(reward2.shape, (self.batch_size,))
+
+    def test_scheduled_step_is_deterministic(self):
+        for rddl in self.rddls:
+            state = self.initial_state(rddl)
+            action = self.default_action(rddl)
+            results = []
+            for max_workers in [1, 4]:
+                with schedule.ScheduledStep(rddl, max_workers=max_workers, cache_dir=self.cache_dir) as step:
+                    results.append(step(state, action, np.random.default_rng(7)))
+            (interms1, next_state1, reward1), (interms2, next_state2, reward2) = results
+            for name in interms1:
+                np.testing.assert_array_equal(interms1[name], interms2[name])
+            for name in next_state1:
+                np.testing.assert_array_equal(next_state1[name], next_state2[name])
+            np.testing.assert_array_equal(reward1, reward2)
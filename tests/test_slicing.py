@@ -0,0 +1,138 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+from pyrddl import slicing
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestSlicing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR)
+        cls.rddl1.build()
+        cls.rddl2 = parser.parse(MARS_ROVER)
+        cls.rddl2.build()
+
+        BOOKKEEPING = RESERVOIR.replace(
+            '\t\t// Action fluents',
+            '\t\ttotal(res): {state-fluent, real, default = 0.0 };\n'
+            '\t\tboost: {state-fluent, real, default = 0.0 };\n'
+            '\t\tdelay: {state-fluent, real, default = 0.0 };\n'
+            '\t\tspill(res): {interm-fluent, real, level=2};\n'
+            '\t\t// Action fluents'
+        ).replace(
+            '\t\tinflow(?r) =',
+            '\t\tspill(?r) = 2 * overflow(?r);\n'
+            "\t\ttotal'(?r) = total(?r) + rainfall(?r) + spill(?r);\n"
+            "\t\tboost' = boost + 1.0;\n"
+            "\t\tdelay' = boost;\n"
+            '\t\tinflow(?r) ='
+        ).replace(
+            '\t\tforall_{?r : res} rlevel(?r) >= 0;',
+            '\t\tforall_{?r : res} rlevel(?r) >= 0;\n'
+            '\t\tdelay >= 0;'
+        ).replace(
+            '\t\trlevel(t1) = 75.0;',
+            '\t\trlevel(t1) = 75.0;\n'
+            '\t\ttotal(t1) = 1.0;'
+        )
+        cls.rddl3 = parser.parse(BOOKKEEPING)
+        cls.rddl3.build()
+
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.batch_size = 4
+
+    def test_relevant_fluents(self):
+        relevant = slicing.relevant_fluents(self.rddl1)
+        self.assertNotIn('SINK_RES/1', relevant)
+        self.assertSetEqual(relevant, set(self.rddl1.dependency_graph.nodes) - set(slicing.root_nodes(self.rddl1)) - {'SINK_RES/1'})
+
+        relevant = slicing.relevant_fluents(self.rddl2)
+        for name in self.rddl2.fluent_table:
+            self.assertIn(name, relevant)
+
+    def test_relevant_fluents_across_timesteps(self):
+        relevant = slicing.relevant_fluents(self.rddl3)
+        self.assertIn('delay/0', relevant)
+        self.assertIn("delay'/0", relevant)
+        self.assertIn('boost/0', relevant)
+        self.assertIn("boost'/0", relevant)
+        self.assertNotIn('total/1', relevant)
+        self.assertNotIn("total'/1", relevant)
+        self.assertNotIn('spill/1', relevant)
+
+    def test_slice_report(self):
+        _, report = slicing.slice_rddl(self.rddl1)
+        self.assertTupleEqual(report.non_fluents, ('SINK_RES/1',))
+        self.assertTupleEqual(report.state_fluents, ())
+        self.assertTupleEqual(report.action_fluents, ())
+        self.assertTupleEqual(report.interm_fluents, ())
+        self.assertTupleEqual(report.cpfs, ())
+
+        _, report = slicing.slice_rddl(self.rddl3)
+        self.assertTupleEqual(report.non_fluents, ('SINK_RES/1',))
+        self.assertTupleEqual(report.state_fluents, ('total/1',))
+        self.assertTupleEqual(report.interm_fluents, ('spill/1',))
+        self.assertTupleEqual(report.cpfs, ('spill/1', "total'/1"))
+
+    def test_sliced_rddl(self):
+        reduced, _ = slicing.slice_rddl(self.rddl3)
+        self.assertListEqual(reduced.domain.state_fluent_ordering, ['boost/0', 'delay/0', 'rlevel/1'])
+        self.assertListEqual(reduced.domain.interm_fluent_ordering, self.rddl1.domain.interm_fluent_ordering)
+        self.assertListEqual(reduced.domain.non_fluent_ordering, [name for name in self.rddl1.domain.non_fluent_ordering if name != 'SINK_RES/1'])
+        self.assertIs(reduced.domain.reward, self.rddl3.domain.reward)
+        self.assertEqual(len(reduced.domain.invariants), len(self.rddl3.domain.invariants))
+        self.assertListEqual(reduced.instance.init_state, [(('rlevel', ['t1']), 75.0)])
+        self.assertNotIn(('SINK_RES', ['t8']), [fluent for fluent, _ in reduced.non_fluents.init_non_fluent])
+        self.assertIn('total/1', self.rddl3.domain.state_fluents)
+        self.assertEqual(len(self.rddl3.instance.init_state), 2)
+
+    def test_sliced_step(self):
+        reduced, _ = slicing.slice_rddl(self.rddl3)
+        module1 = codegen.compile_step(self.rddl3, cache_dir=self.cache_dir)
+        module2 = codegen.compile_step(reduced, cache_dir=self.cache_dir)
+
+        def fluents(fluents, ordering, sizes, range_types):
+            return {
+                name: np.full((self.batch_size,) + size, fluents[name].default, dtype=codegen.NUMPY_DTYPES[range_type])
+                for name, size, range_type in zip(ordering, sizes, range_types)
+            }
+
+        domain = self.rddl3.domain
+        state = fluents(domain.state_fluents, domain.state_fluent_ordering, self.rddl3.state_size, self.rddl3.state_range_type)
+        action = fluents(domain.action_fluents, domain.action_fluent_ordering, self.rddl3.action_size, self.rddl3.action_range_type)
+        reduced_state = { name: state[name] for name in reduced.domain.state_fluent_ordering }
+
+        _, next_state1, reward1 = module1.step(state, action, np.random.default_rng(0))
+        _, next_state2, reward2 = module2.step(reduced_state, action, np.random.default_rng(0))
+        self.assertTrue(np.allclose(reward1, reward2))
+        for name, value in next_state2.items():
+            self.assertTrue(np.allclose(value, next_state1[name]))
@@ -0,0 +1,101 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.state import SimulatorState
+from pyrddl.parser import RDDLParser
+from pyrddl import codegen
+
+import numpy as np
+import tempfile
+import unittest
+
+
+class TestSimulatorState(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Mars_Rover.rddl', mode='r') as file:
+            MARS_ROVER = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl = parser.parse(MARS_ROVER)
+        cls.rddl.build()
+        cls.cache_dir = tempfile.mkdtemp()
+
+    def test_initial_state(self):
+        state = SimulatorState(self.rddl, batch_size=4)
+        self.assertListEqual(list(state), self.rddl.domain.state_fluent_ordering)
+        self.assertEqual(state['picTaken/1'].shape, (4, 3))
+        np.testing.assert_array_equal(state['time/0'], np.zeros(4))
+        with self.assertRaises(ValueError):
+            state.update({ 'time/0': np.zeros(3) })
+
+    def test_snapshot_restore(self):
+        state = SimulatorState(self.rddl, batch_size=2)
+        state.assign('time/0', 0, 1.0)
+        snapshot = state.snapshot()
+        time, pictures = state['time/0'], state['picTaken/1']
+
+        state.assign('time/0', 1, 2.0)
+        self.assertIsNot(state['time/0'], time)
+        self.assertIs(state['picTaken/1'], pictures)
+        self.assertListEqual(time.tolist(), [1.0, 0.0])
+        self.assertListEqual(state['time/0'].tolist(), [1.0, 2.0])
+
+        written = state['time/0']
+        state.assign('time/0', 0, 3.0)
+        self.assertIs(state['time/0'], written)
+
+        state.restore(snapshot)
+        self.assertIs(state['time/0'], time)
+        state.assign('time/0', 0, 5.0)
+        self.assertListEqual(snapshot.tensors[state.names.index('time/0')].tolist(), [1.0, 0.0])
+
+    def test_fork(self):
+        state = SimulatorState(self.rddl, batch_size=3)
+        state.assign('xPos/0', 1, 7.0)
+        children = state.fork(1, 5)
+        self.assertEqual(children.batch_size, 5)
+        np.testing.assert_array_equal(children['xPos/0'], np.full(5, 7.0))
+        children.assign('xPos/0', 2, 1.0)
+        self.assertListEqual(children['xPos/0'].tolist(), [7.0, 7.0, 1.0, 7.0, 7.0])
+        self.assertListEqual(state['xPos/0'].tolist(), [0.0, 7.0, 0.0])
+
+    def test_update_with_step(self):
+        module = codegen.compile_step(self.rddl, cache_dir=self.cache_dir)
+        state = SimulatorState(self.rddl, batch_size=4)
+        action = {
+            'xMove/0': np.ones(4), 'yMove/0': np.zeros(4),
+            'snapPicture/0': np.zeros(4, dtype=bool)
+        }
+        root = state.snapshot()
+        step = module.make_step(4)
+        _, next_state, _ = step(state, action, np.random.default_rng(0))
+        state.update(next_state, copy=True)
+        self.assertIsNot(state['xPos/0'], next_state['xPos/0'])
+        buffer = state['xPos/0']
+        _, next_state, _ = step(state, action, np.random.default_rng(1))
+        state.update(next_state, copy=True)
+        self.assertIs(state['xPos/0'], buffer)
+        np.testing.assert_array_equal(state['time/0'], np.full(4, 2.0))
+
+        state.restore(root)
+        np.testing.assert_array_equal(state['time/0'], np.zeros(4))
+        _, next_state, _ = module.step(state, action, np.random.default_rng(0))
+        state.update(next_state)
+        self.assertIs(state['time/0'], next_state['time/0'])
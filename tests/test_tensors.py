@@ -0,0 +1,87 @@
+# This file is part of pyrddl.
+
+# pyrddl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# pyrddl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with pyrddl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyrddl.objects import ObjectTable, ObjectType
+from pyrddl.parser import RDDLParser
+from pyrddl.pvariable import PVariable
+from pyrddl import tensors
+
+import numpy as np
+import unittest
+
+
+class TestTensors(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open('rddl/Reservoir.rddl', mode='r') as file:
+            RESERVOIR = file.read()
+
+        parser = RDDLParser()
+        parser.build()
+
+        cls.rddl1 = parser.parse(RESERVOIR.replace('res: object;', 'res: object;\n\t\tseason: {@dry, @wet};'))
+        cls.rddl1.build()
+        cls.object_table = cls.rddl1.object_table
+
+    def test_range_dtype(self):
+        self.assertEqual(tensors.range_dtype('bool', self.object_table), np.bool_)
+        self.assertEqual(tensors.range_dtype('int', self.object_table), np.int64)
+        self.assertEqual(tensors.range_dtype('real', self.object_table), np.float64)
+        self.assertEqual(tensors.range_dtype('int', self.object_table, narrow=True), np.int32)
+        self.assertEqual(tensors.range_dtype('real', self.object_table, narrow=True), np.float32)
+        self.assertEqual(tensors.range_dtype('season', self.object_table), np.int64)
+        with self.assertRaises(ValueError):
+            tensors.range_dtype('color', self.object_table)
+
+    def test_initializer_groups(self):
+        initializers = [(('A', ['t1']), 1.0), (('B', None), 2.0), (('A', ['t3']), 3.0)]
+        groups = tensors.initializer_groups(initializers, ['A/1', 'B/0', 'C/2'])
+        self.assertEqual(groups['A/1'], ([['t1'], ['t3']], [1.0, 3.0]))
+        self.assertEqual(groups['B/0'], ([[]], [2.0]))
+        self.assertEqual(groups['C/2'], ([], []))
+        with self.assertRaises(ValueError):
+            tensors.initializer_groups([(('D', None), 0)], ['A/1'])
+
+    def test_enum_fluent_tensor(self):
+        pvar = PVariable('weather', 'state-fluent', 'season', ['res'], '@wet')
+        tensor = tensors.fluent_tensor(pvar, (8,), self.object_table, ([['t2'], ['t5']], ['@dry', '@dry']))
+        self.assertEqual(tensor.dtype, np.int64)
+        self.assertListEqual(tensor.tolist(), [1, 0, 1, 1, 0, 1, 1, 1])
+        with self.assertRaises(ValueError):
+            tensors.fluent_tensor(pvar, (8,), self.object_table, ([['t2']], ['@snow']))
+
+    def test_narrow_overflow(self):
+        pvar = PVariable('count', 'non-fluent', 'int', ['res'], 0)
+        initializers = ([['t1']], [2 ** 40])
+        tensor = tensors.fluent_tensor(pvar, (8,), self.object_table, initializers)
+        self.assertEqual(tensor[0], 2 ** 40)
+        with self.assertRaises(ValueError):
+            tensors.fluent_tensor(pvar, (8,), self.object_table, initializers, narrow=True)
+
+    def test_bulk_initializers(self):
+        objects = ['o{}'.format(i) for i in range(300)]
+        table = ObjectTable([ObjectType('obj', objects)])
+        pvar = PVariable('W', 'non-fluent', 'real', ['obj', 'obj'], 0.0)
+        rng = np.random.default_rng(0)
+        indices = rng.choice(300 * 300, size=5000, replace=False)
+        rows, cols = np.unravel_index(indices, (300, 300))
+        values = rng.normal(size=5000).tolist()
+        params_list = [[objects[i], objects[j]] for i, j in zip(rows, cols)]
+        tensor = tensors.fluent_tensor(pvar, (300, 300), table, (params_list, values))
+        expected = np.zeros((300, 300))
+        expected[rows, cols] = values
+        self.assertTrue(np.array_equal(tensor, expected))